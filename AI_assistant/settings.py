@@ -23,6 +23,137 @@ load_dotenv()
 
 OPENROUTER_API_KEY = config("OPENROUTER_API_KEY")
 
+# OpenRouter HTTP client (alphabot/openrouter.py)
+OPENROUTER_URL = config("OPENROUTER_URL", default="https://openrouter.ai/api/v1/chat/completions")
+OPENROUTER_POOL_SIZE = config("OPENROUTER_POOL_SIZE", default=20, cast=int)
+OPENROUTER_CONNECT_TIMEOUT = config("OPENROUTER_CONNECT_TIMEOUT", default=5, cast=float)
+OPENROUTER_DEFAULT_TIMEOUT = config("OPENROUTER_DEFAULT_TIMEOUT", default=60, cast=float)
+
+# Read timeouts (seconds) per AI feature
+OPENROUTER_TIMEOUTS = {
+    "chat": config("OPENROUTER_TIMEOUT_CHAT", default=60, cast=float),
+    "coder": config("OPENROUTER_TIMEOUT_CODER", default=90, cast=float),
+    "cv": config("OPENROUTER_TIMEOUT_CV", default=180, cast=float),  # Runs on the CV job workers
+    "content": config("OPENROUTER_TIMEOUT_CONTENT", default=60, cast=float),
+    "content_outline": config("OPENROUTER_TIMEOUT_CONTENT_OUTLINE", default=30, cast=float),
+    "content_section": config("OPENROUTER_TIMEOUT_CONTENT_SECTION", default=90, cast=float),
+    "script": config("OPENROUTER_TIMEOUT_SCRIPT", default=60, cast=float),
+    "paraphraser": config("OPENROUTER_TIMEOUT_PARAPHRASER", default=30, cast=float),
+    "summary": config("OPENROUTER_TIMEOUT_SUMMARY", default=60, cast=float),
+}
+
+# Generation caps per AI feature (max_tokens sent to OpenRouter); bounds the latency of
+# a reply, 0 leaves the feature uncapped. Models and prompts live in alphabot/features.py
+OPENROUTER_MAX_TOKENS = {
+    "chat": config("OPENROUTER_MAX_TOKENS_CHAT", default=1024, cast=int),
+    "coder": config("OPENROUTER_MAX_TOKENS_CODER", default=2048, cast=int),
+    "cv": config("OPENROUTER_MAX_TOKENS_CV", default=2048, cast=int),
+    "content": config("OPENROUTER_MAX_TOKENS_CONTENT", default=1500, cast=int),
+    "content_outline": config("OPENROUTER_MAX_TOKENS_CONTENT_OUTLINE", default=300, cast=int),
+    "content_section": config("OPENROUTER_MAX_TOKENS_CONTENT_SECTION", default=1000, cast=int),
+    "script": config("OPENROUTER_MAX_TOKENS_SCRIPT", default=2000, cast=int),
+    "paraphraser": config("OPENROUTER_MAX_TOKENS_PARAPHRASER", default=1024, cast=int),
+    "summary": config("OPENROUTER_MAX_TOKENS_SUMMARY", default=512, cast=int),
+}
+
+# Latency-aware routing (alphabot/routing.py): each request tries the fastest healthy model
+# among a feature's primary model and its OPENROUTER_ROUTING_MODELS peers, judged over a
+# sliding window of recent calls. Fallbacks are never ranked, so paid fallbacks only take
+# traffic when the primary fails
+OPENROUTER_ADAPTIVE_ROUTING = config("OPENROUTER_ADAPTIVE_ROUTING", default=True, cast=bool)
+OPENROUTER_ROUTING_WINDOW = config("OPENROUTER_ROUTING_WINDOW", default=300, cast=float)  # Seconds of history per model
+OPENROUTER_ROUTING_MIN_SAMPLES = config("OPENROUTER_ROUTING_MIN_SAMPLES", default=5, cast=int)  # Before a model is ranked
+OPENROUTER_ROUTING_MAX_ERROR_RATE = config("OPENROUTER_ROUTING_MAX_ERROR_RATE", default=0.2, cast=float)
+OPENROUTER_ROUTING_EXPLORE_RATE = config("OPENROUTER_ROUTING_EXPLORE_RATE", default=0.05, cast=float)  # Share sent to unmeasured models
+# Hedged requests: if the chosen model hasn't answered by its p95, also call the next one
+# and use whichever succeeds first (non-streaming calls only; costs extra upstream calls)
+OPENROUTER_HEDGE_REQUESTS = config("OPENROUTER_HEDGE_REQUESTS", default=False, cast=bool)
+
+# Provider prompt caching: models with these prefixes get cache_control breakpoints on the
+# system prompt and the history prefix; other providers cache repeated prefixes automatically
+OPENROUTER_PROMPT_CACHE = config("OPENROUTER_PROMPT_CACHE", default=True, cast=bool)
+OPENROUTER_CACHE_CONTROL_MODELS = ("anthropic/", "google/gemini")
+
+# Retries, circuit breakers and model fallback (alphabot/resilience.py)
+OPENROUTER_MAX_RETRIES = config("OPENROUTER_MAX_RETRIES", default=2, cast=int)
+OPENROUTER_BACKOFF_BASE = config("OPENROUTER_BACKOFF_BASE", default=0.5, cast=float)
+OPENROUTER_BACKOFF_MAX = config("OPENROUTER_BACKOFF_MAX", default=4, cast=float)
+OPENROUTER_RETRY_DEADLINE = config("OPENROUTER_RETRY_DEADLINE", default=20, cast=float)
+OPENROUTER_BREAKER_THRESHOLD = config("OPENROUTER_BREAKER_THRESHOLD", default=5, cast=int)
+OPENROUTER_BREAKER_COOLDOWN = config("OPENROUTER_BREAKER_COOLDOWN", default=30, cast=float)
+
+# Models tried, in order, after a feature's primary model fails or its breaker is open
+OPENROUTER_FALLBACK_MODELS = {
+    "chat": ["meta-llama/llama-4-maverick"],
+    "coder": ["deepseek/deepseek-chat"],
+    "cv": ["deepseek/deepseek-chat:free"],
+    "content": ["deepseek/deepseek-chat"],
+    "content_outline": ["deepseek/deepseek-chat"],
+    "content_section": ["deepseek/deepseek-chat"],
+    "script": ["deepseek/deepseek-chat"],
+    "paraphraser": ["deepseek/deepseek-chat:free"],
+}
+
+# Models latency routing may send a feature's traffic to instead of its primary model, e.g.
+# "paraphraser": ["deepseek/deepseek-chat:free"]; list only models you are happy to pay for
+# at the same rate as the primary. Empty by default: every feature stays on its primary
+OPENROUTER_ROUTING_MODELS = {}
+
+# CV generation job queue (alphabot/cv_jobs.py, run with `manage.py run_cv_workers`)
+CV_WORKER_PROCESSES = config("CV_WORKER_PROCESSES", default=2, cast=int)
+CV_WORKER_CONCURRENCY = config("CV_WORKER_CONCURRENCY", default=4, cast=int)  # Jobs in flight per process
+CV_WORKER_POLL_INTERVAL = config("CV_WORKER_POLL_INTERVAL", default=1, cast=float)
+CV_JOB_MAX_ATTEMPTS = config("CV_JOB_MAX_ATTEMPTS", default=3, cast=int)
+# Jobs that failed on the upstream wait BASE * 2**(attempts - 1) seconds, at most MAX, before a retry
+CV_JOB_RETRY_BACKOFF_BASE = config("CV_JOB_RETRY_BACKOFF_BASE", default=10, cast=float)
+CV_JOB_RETRY_BACKOFF_MAX = config("CV_JOB_RETRY_BACKOFF_MAX", default=300, cast=float)
+CV_JOB_STALE_AFTER = config("CV_JOB_STALE_AFTER", default=600, cast=float)  # Requeue jobs of workers that died
+CV_JOB_EVENTS_TIMEOUT = config("CV_JOB_EVENTS_TIMEOUT", default=300, cast=float)  # Longest an SSE status stream stays open
+
+# Batch CV generation (/api/cv/batch/)
+CV_BATCH_MAX_ROWS = config("CV_BATCH_MAX_ROWS", default=100, cast=int)
+CV_BATCH_CONCURRENCY = config("CV_BATCH_CONCURRENCY", default=4, cast=int)  # Upstream calls in flight per batch
+
+# Long-form articles (alphabot/articles.py): an outline of CONTENT_LONG_SECTIONS headings,
+# then every section generated in parallel to share CONTENT_LONG_WORDS
+CONTENT_LONG_SECTIONS = config("CONTENT_LONG_SECTIONS", default=6, cast=int)
+CONTENT_LONG_WORDS = config("CONTENT_LONG_WORDS", default=2000, cast=int)
+CONTENT_SECTION_CONCURRENCY = config("CONTENT_SECTION_CONCURRENCY", default=6, cast=int)  # Upstream calls per article
+
+# Long-document paraphrasing (alphabot/paraphrase.py): texts over one chunk are split at
+# paragraph/sentence boundaries and the chunks paraphrased in parallel
+PARAPHRASER_CHUNK_TOKENS = config("PARAPHRASER_CHUNK_TOKENS", default=400, cast=int)
+PARAPHRASER_CHUNK_CONCURRENCY = config("PARAPHRASER_CHUNK_CONCURRENCY", default=4, cast=int)  # Upstream calls per document
+PARAPHRASER_MAX_CHUNKS = config("PARAPHRASER_MAX_CHUNKS", default=40, cast=int)
+
+# Chat/coder prompt history window (alphabot/history.py)
+CHAT_HISTORY_LIMIT = config("CHAT_HISTORY_LIMIT", default=40, cast=int)
+CHAT_HISTORY_TOKEN_BUDGET = config("CHAT_HISTORY_TOKEN_BUDGET", default=3000, cast=int)
+
+# Page sizes for the cursor-paginated history APIs
+CHAT_HISTORY_PAGE_SIZE = config("CHAT_HISTORY_PAGE_SIZE", default=50, cast=int)
+CHAT_HISTORY_MAX_PAGE_SIZE = config("CHAT_HISTORY_MAX_PAGE_SIZE", default=200, cast=int)
+
+# Rolling conversation summaries (alphabot/summaries.py): once more than
+# CHAT_SUMMARY_TRIGGER messages are unsummarized, all but the newest
+# CHAT_SUMMARY_KEEP_RECENT are folded into the stored summary
+CHAT_SUMMARY_TRIGGER = config("CHAT_SUMMARY_TRIGGER", default=30, cast=int)
+CHAT_SUMMARY_KEEP_RECENT = config("CHAT_SUMMARY_KEEP_RECENT", default=10, cast=int)
+CHAT_SUMMARY_MODEL = config("CHAT_SUMMARY_MODEL", default="deepseek/deepseek-chat:free")
+
+# Optional write-behind buffer for chat turns (alphabot/turns.py): messages are
+# inserted in batches after the response. History reads in the same process flush
+# their conversation first; other processes may see a turn up to the interval late
+CHAT_WRITE_BEHIND = config("CHAT_WRITE_BEHIND", default=False, cast=bool)
+CHAT_WRITE_BEHIND_BATCH = config("CHAT_WRITE_BEHIND_BATCH", default=100, cast=int)
+CHAT_WRITE_BEHIND_INTERVAL = config("CHAT_WRITE_BEHIND_INTERVAL", default=1, cast=float)
+
+# Retention (`manage.py chat_retention`): messages older than CHAT_ARCHIVE_AFTER_DAYS
+# move into compressed MessageArchive chunks, and reset chats are purged
+CHAT_ARCHIVE_AFTER_DAYS = config("CHAT_ARCHIVE_AFTER_DAYS", default=90, cast=int)
+CHAT_ARCHIVE_CHUNK_SIZE = config("CHAT_ARCHIVE_CHUNK_SIZE", default=200, cast=int)  # Messages per chunk and archive page
+CHAT_PURGE_BATCH_SIZE = config("CHAT_PURGE_BATCH_SIZE", default=1000, cast=int)
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -53,7 +184,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'alphabot.middleware.AsyncWhiteNoiseMiddleware',
+    'alphabot.middleware.request_metrics_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -68,8 +200,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'alphabot' / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compile each template once per process instead of on every render
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -91,6 +229,75 @@ DATABASES = {
 
 
 
+# Optional bearer token required to scrape /metrics
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+
+# Rate limiting and admission control (alphabot/ratelimit.py). Quotas are token
+# buckets per user (or client IP when anonymous): "30/m" allows bursts of 30 and
+# refills at 30 per minute
+RATELIMIT_ENABLED = config("RATELIMIT_ENABLED", default=True, cast=bool)
+RATELIMIT_CACHE_ALIAS = "ratelimit"
+RATELIMIT_TRUST_X_FORWARDED_FOR = config("RATELIMIT_TRUST_X_FORWARDED_FOR", default=False, cast=bool)
+RATE_LIMITS = {
+    "chat": config("RATE_LIMIT_CHAT", default="30/m"),
+    "coder": config("RATE_LIMIT_CODER", default="30/m"),
+    "cv": config("RATE_LIMIT_CV", default="10/m"),
+    "cv_batch": config("RATE_LIMIT_CV_BATCH", default="5/h"),
+    "content": config("RATE_LIMIT_CONTENT", default="20/m"),
+    "script": config("RATE_LIMIT_SCRIPT", default="20/m"),
+    "paraphraser": config("RATE_LIMIT_PARAPHRASER", default="20/m"),
+}
+# Per worker process: in-flight upstream calls (a fan-out request holds one per call), and how
+# many more calls may wait for a slot (and for how long)
+UPSTREAM_MAX_IN_FLIGHT = config("UPSTREAM_MAX_IN_FLIGHT", default=64, cast=int)
+UPSTREAM_MAX_QUEUE = config("UPSTREAM_MAX_QUEUE", default=128, cast=int)
+UPSTREAM_QUEUE_TIMEOUT = config("UPSTREAM_QUEUE_TIMEOUT", default=10, cast=float)
+
+
+# Caches
+# The "responses" alias stores generated paraphrases/articles/scripts
+# (alphabot/response_cache.py). Any Django backend works, e.g.
+# django.core.cache.backends.filebased.FileBasedCache with a directory
+# LOCATION, or db.DatabaseCache after `manage.py createcachetable`.
+
+RESPONSE_CACHE_ALIAS = "responses"
+RESPONSE_CACHE_TTL = config("RESPONSE_CACHE_TTL", default=60 * 60 * 24, cast=int)
+
+# Rendered pages served to visitors without a session (alphabot/page_cache.py); 0 disables
+PAGE_CACHE_ALIAS = "default"
+PAGE_CACHE_TIMEOUT = config("PAGE_CACHE_TIMEOUT", default=600, cast=int)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # LocMemCache is per process, so each worker would enforce its own quota: with more than one
+    # worker, point RATELIMIT_CACHE_BACKEND/LOCATION at a shared Redis or Memcached
+    RATELIMIT_CACHE_ALIAS: {
+        'BACKEND': config("RATELIMIT_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        'LOCATION': config("RATELIMIT_CACHE_LOCATION", default="alphabot-ratelimit"),
+    },
+    RESPONSE_CACHE_ALIAS: {
+        'BACKEND': config("RESPONSE_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        'LOCATION': config("RESPONSE_CACHE_LOCATION", default="alphabot-responses"),
+        'TIMEOUT': RESPONSE_CACHE_TTL,
+        'OPTIONS': {
+            # LocMemCache evicts least-recently-used entries past this size
+            'MAX_ENTRIES': config("RESPONSE_CACHE_MAX_ENTRIES", default=5000, cast=int),
+        },
+    },
+}
+
+# Near-duplicate (MinHash/LSH) cache for paraphraser and content inputs
+# (alphabot/similarity_cache.py); in-process, per worker
+SIMILARITY_CACHE_ENABLED = config("SIMILARITY_CACHE_ENABLED", default=True, cast=bool)
+SIMILARITY_CACHE_THRESHOLD = config("SIMILARITY_CACHE_THRESHOLD", default=0.85, cast=float)
+SIMILARITY_CACHE_MAX_ENTRIES = config("SIMILARITY_CACHE_MAX_ENTRIES", default=200000, cast=int)
+SIMILARITY_CACHE_NUM_PERM = config("SIMILARITY_CACHE_NUM_PERM", default=64, cast=int)
+SIMILARITY_CACHE_BANDS = config("SIMILARITY_CACHE_BANDS", default=16, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -132,8 +339,16 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_DIRS = [BASE_DIR / 'alphabot' / 'static']
 
-# Recommended for deployment
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Hashed, compressed file names from collectstatic; WhiteNoise serves hashed files
+# with a far-future immutable Cache-Control header
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
 
 
 
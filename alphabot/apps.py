@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class AlphabotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'alphabot'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import features, metrics
+
+        # Time every query so /metrics can split request latency into phases
+        connection_created.connect(metrics.install_query_wrapper)
+
+        # Models, prompts and limits of the AI features are resolved once per process
+        features.load()
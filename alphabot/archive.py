@@ -0,0 +1,139 @@
+import json
+import zlib
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ConversationSummary, Message, MessageArchive
+
+
+# History cursors that point into the archive instead of the hot Message table
+ARCHIVE_CURSOR_PREFIX = "a:"
+
+
+def cleared_through(user_id, chat_type):
+    """Id up to which the conversation was cleared by a reset (0 if never)"""
+    return (
+        ConversationSummary.objects.filter(user_id=user_id, chat_type=chat_type)
+        .values_list("cleared_through_id", flat=True)
+        .first()
+    ) or 0
+
+
+async def acleared_through(user_id, chat_type):
+    return (
+        await ConversationSummary.objects.filter(user_id=user_id, chat_type=chat_type)
+        .values_list("cleared_through_id", flat=True)
+        .afirst()
+    ) or 0
+
+
+async def asoft_reset(user, chat_type):
+    """Clear a conversation in O(1): hide everything up to the newest message id instead of deleting it"""
+    watermark = await Message.objects.order_by("-id").values_list("id", flat=True).afirst() or 0
+    await ConversationSummary.objects.aupdate_or_create(
+        user=user,
+        chat_type=chat_type,
+        defaults={"summary": "", "last_message_id": watermark, "cleared_through_id": watermark},
+    )
+
+
+def compress_messages(messages):
+    rows = [[m.id, m.sender, m.text, m.timestamp.isoformat()] for m in messages]
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode(), 9)
+
+
+def decompress_messages(chunk):
+    """Unsaved Message instances for an archive chunk, oldest first"""
+    rows = json.loads(zlib.decompress(bytes(chunk.data)))
+    return [
+        Message(
+            id=message_id, user_id=chunk.user_id, chat_type=chunk.chat_type,
+            sender=sender, text=text, timestamp=datetime.fromisoformat(timestamp),
+        )
+        for message_id, sender, text, timestamp in rows
+    ]
+
+
+def archive_conversation(user_id, chat_type, cutoff, chunk_size):
+    """Move the conversation's visible messages older than `cutoff` into archive chunks; returns how many moved"""
+    cleared = cleared_through(user_id, chat_type)
+    moved = 0
+    while True:
+        messages = list(
+            Message.objects.filter(user_id=user_id, chat_type=chat_type, timestamp__lt=cutoff, id__gt=cleared)
+            .order_by("timestamp", "id")[:chunk_size]
+        )
+        if not messages:
+            return moved
+        with transaction.atomic():
+            MessageArchive.objects.create(
+                user_id=user_id,
+                chat_type=chat_type,
+                first_message_id=messages[0].id,
+                last_message_id=messages[-1].id,
+                first_timestamp=messages[0].timestamp,
+                last_timestamp=messages[-1].timestamp,
+                message_count=len(messages),
+                data=compress_messages(messages),
+            )
+            Message.objects.filter(id__in=[m.id for m in messages]).delete()
+        moved += len(messages)
+
+
+def purge_conversation(user_id, chat_type, batch_size):
+    """Permanently delete what a reset cleared, hot and archived; returns how many messages went"""
+    cleared = cleared_through(user_id, chat_type)
+    if not cleared:
+        return 0
+    purged = 0
+    while True:
+        ids = list(
+            Message.objects.filter(user_id=user_id, chat_type=chat_type, id__lte=cleared)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        purged += Message.objects.filter(id__in=ids).delete()[0]
+
+    chunks = MessageArchive.objects.filter(user_id=user_id, chat_type=chat_type, last_message_id__lte=cleared)
+    purged += sum(chunks.values_list("message_count", flat=True))
+    chunks.delete()
+    return purged
+
+
+def archive_cutoff(days=None):
+    return timezone.now() - timedelta(days=settings.CHAT_ARCHIVE_AFTER_DAYS if days is None else days)
+
+
+def encode_archive_cursor(chunk_id):
+    return f"{ARCHIVE_CURSOR_PREFIX}{chunk_id}"
+
+
+def is_archive_cursor(cursor):
+    return bool(cursor) and cursor.startswith(ARCHIVE_CURSOR_PREFIX)
+
+
+async def anewest_chunk_cursor(user_id, chat_type, cleared):
+    """Cursor for the newest archived chunk, or None when nothing is archived"""
+    exists = await MessageArchive.objects.filter(
+        user_id=user_id, chat_type=chat_type, last_message_id__gt=cleared
+    ).aexists()
+    # Chunk ids grow with message age order, so "below infinity" starts at the newest
+    return encode_archive_cursor(2 ** 63 - 1) if exists else None
+
+
+async def aarchive_page(user_id, chat_type, cursor, cleared):
+    """The archived chunk just older than `cursor` (oldest first) and the cursor for the one before it"""
+    before_id = int(cursor[len(ARCHIVE_CURSOR_PREFIX):])
+    chunks = MessageArchive.objects.filter(
+        user_id=user_id, chat_type=chat_type, id__lt=before_id, last_message_id__gt=cleared
+    ).order_by("-id")
+    chunk = await chunks.afirst()
+    if chunk is None:
+        return [], None
+    messages = [m for m in decompress_messages(chunk) if m.id > cleared]
+    has_older = await chunks.filter(id__lt=chunk.id).aexists()
+    return messages, encode_archive_cursor(chunk.id) if has_older else None
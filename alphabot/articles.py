@@ -0,0 +1,94 @@
+"""Long-form articles: an outline first, then every section written in parallel"""
+
+import asyncio
+import re
+
+import httpx
+from django.conf import settings
+
+from . import features, openrouter, resilience
+
+
+# Numbering, bullets and Markdown heading marks models put in front of outline lines
+_OUTLINE_PREFIX_RE = re.compile(r"^\s*(?:#+|[-*•]|\d+[.)]|[IVXivx]+[.)])?\s*")
+_LEADING_HEADING_RE = re.compile(r"^\s*#{1,6}\s+.*\n+")
+
+
+class ContentGenerationError(Exception):
+    """The outline could not be generated, so no article can be written"""
+
+
+async def _acomplete(feature, payload, api_key):
+    response = await resilience.achat_completion(feature, payload, api_key)
+    if response.status_code != 200:
+        raise openrouter.OpenRouterError(response.status_code, response.text)
+    return response.json()["choices"][0]["message"]["content"]
+
+
+def parse_outline(text, max_sections):
+    """Section headings from the model's outline, cleaned of numbering and bullets"""
+    headings = []
+    for line in text.splitlines():
+        heading = _OUTLINE_PREFIX_RE.sub("", line).strip().strip("*").strip()
+        if heading and heading not in headings:
+            headings.append(heading)
+    return headings[:max_sections]
+
+
+async def aoutline(topic, api_key):
+    """Section headings for an article on `topic`"""
+    sections = settings.CONTENT_LONG_SECTIONS
+    payload = features.get_feature("content_outline").build(topic=topic, sections=sections)
+    try:
+        text = await _acomplete("content_outline", payload, api_key)
+    except openrouter.OpenRouterError as e:
+        raise ContentGenerationError(f"API Error {e.status_code}: {e.text}")
+    except httpx.HTTPError as e:
+        raise ContentGenerationError(str(e))
+
+    headings = parse_outline(text, sections)
+    if len(headings) < 2:
+        raise ContentGenerationError("The outline came back empty, please try again")
+    return headings
+
+
+async def awrite_sections(topic, headings, api_key):
+    """Yield {"index", "heading", "text"} (or "error") per section in outline order,
+    each as soon as it and every section before it are written
+
+    Sections are generated concurrently (CONTENT_SECTION_CONCURRENCY at a time), so
+    the article takes about as long as its slowest section.
+    """
+    slots = asyncio.Semaphore(settings.CONTENT_SECTION_CONCURRENCY)
+    outline = "\n".join(f"- {heading}" for heading in headings)
+    words = max(50, settings.CONTENT_LONG_WORDS // len(headings))
+    feature = features.get_feature("content_section")
+
+    async def one(index, heading):
+        payload = feature.build(topic=topic, outline=outline, heading=heading, words=words)
+        async with slots:
+            try:
+                text = await _acomplete("content_section", payload, api_key)
+            except openrouter.OpenRouterError as e:
+                return {"index": index, "heading": heading, "error": f"API Error {e.status_code}"}
+            except httpx.HTTPError as e:
+                return {"index": index, "heading": heading, "error": str(e)}
+        # Models sometimes repeat the heading despite being asked not to
+        return {"index": index, "heading": heading, "text": _LEADING_HEADING_RE.sub("", text, count=1).strip()}
+
+    tasks = [asyncio.create_task(one(index, heading)) for index, heading in enumerate(headings)]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        # The client went away mid-stream; stop the remaining upstream calls
+        for task in tasks:
+            task.cancel()
+
+
+def section_markdown(section):
+    return f"## {section['heading']}\n\n{section.get('text', '*This section could not be generated.*')}\n\n"
+
+
+def assemble(topic, sections):
+    return f"# {topic}\n\n" + "".join(section_markdown(section) for section in sections)
@@ -0,0 +1,230 @@
+import re
+
+import httpx
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+
+from . import features, resilience
+from .cv_sections import SECTION_FIELDS, changed_fields, match_rewritten, sections_for_fields, splice, split_sections
+from .features import PromptTemplate
+
+
+class CVGenerationError(Exception):
+    """OpenRouter did not produce a CV; `retryable` is set for transport failures"""
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+REQUIRED_FIELDS = ("fullName", "email", "phone", "summary", "skills", "experience", "education")
+
+
+def validate_uk_phone(phone):
+    phone = phone.strip().replace(" ", "").replace("-", "")
+    if phone.startswith("+44"):
+        phone = "0" + phone[3:]
+
+    if not re.match(r"^07\d{9}$", phone):
+        raise ValidationError("Phone must start with 07 and be 11 digits (UK format)")
+    
+def validate_custom_email(email):
+    validate_email(email)
+    if len(email) > 254:
+        raise ValidationError("Email is too long")
+
+
+def clean_cv_data(data):
+    """Check the submitted CV details; returns the stripped required fields"""
+    if not isinstance(data, dict):
+        raise ValidationError("CV details must be a JSON object")
+
+    fields = {}
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            raise ValidationError(f"Missing required field: {field}")
+        if not isinstance(data[field], str):
+            raise ValidationError(f"Field {field} must be a string")
+        fields[field] = data[field].strip()
+
+    # Validate email and phone
+    validate_custom_email(data['email'])
+    validate_uk_phone(data['phone'])
+    return fields
+
+
+def build_cv_payload(data):
+    """OpenRouter request for a CV built from already validated details"""
+    return features.get_feature("cv").build(
+        fullName=data["fullName"].strip(),
+        email=data["email"].strip(),
+        phone=data["phone"].strip(),
+        summary=data["summary"],
+        skills=data["skills"],
+        experience=data["experience"],
+        education=data["education"],
+        certification=data.get("certification", "N/A"),
+    )
+
+
+FIELD_LABELS = {
+    "summary": "Professional Summary",
+    "skills": "Skills",
+    "experience": "Work Experience",
+    "education": "Education",
+    "certification": "Certifications",
+}
+
+
+SECTION_PROMPT = PromptTemplate("""
+        Some details of {name}'s CV have changed. Rewrite ONLY the CV sections
+        below so they reflect the updated details.
+
+        Updated details:
+        {details}
+
+        Current sections:
+        {current}
+
+        Requirements:
+        - Return exactly these {count} sections, in the same order
+        - Start each section with its original heading line, unchanged
+        - Do not add any other sections, introduction or closing text
+        """)
+
+
+def build_section_payload(data, fields, section_texts):
+    """OpenRouter request rewriting only the given sections of an existing CV"""
+    details = "\n\n".join(
+        f"{FIELD_LABELS[field]}:\n{data.get(field) or 'N/A'}" for field in fields
+    )
+    current = "\n\n".join(text.strip() for text in section_texts)
+    prompt = SECTION_PROMPT.render(
+        name=data["fullName"].strip(), details=details, current=current, count=len(section_texts)
+    )
+    return features.get_feature("cv").payload(prompt)
+
+
+async def _acomplete(payload, referer):
+    headers = {"HTTP-Referer": referer} if referer else None
+    try:
+        response = await resilience.achat_completion("cv", payload, settings.OPENROUTER_API_KEY, extra_headers=headers)
+    except httpx.HTTPError as e:
+        raise CVGenerationError(f"API error: {e}", retryable=True)
+
+    if response.status_code != 200:
+        error_msg = f"API Error {response.status_code}"
+        try:
+            error_details = response.json().get('error', {}).get('message', '')
+            if error_details:
+                error_msg += f": {error_details}"
+        except ValueError:
+            pass
+        # Shed by admission control or still failing after the retries: worth another try later
+        raise CVGenerationError(error_msg, retryable=response.status_code in resilience.RETRYABLE_STATUSES)
+
+    return response.json()["choices"][0]["message"]["content"]
+
+
+def _result(data, content, regenerated):
+    return {
+        "cv": content,
+        "score": calculate_cv_score(data, content),
+        "improvement_suggestions": generate_improvement_suggestions(data, content),
+        "regenerated": regenerated,
+    }
+
+
+async def _aregenerate_sections(data, previous, referer):
+    """Rewrite only the sections whose fields changed since `previous`; None if a full regeneration is needed"""
+    fields = changed_fields(previous.input_data, data)
+    if fields is None:
+        return None
+    if not fields:
+        return _result(data, previous.cv, [])
+
+    sections = split_sections(previous.cv)
+    indexes = sections_for_fields(sections, fields)
+    if indexes is None:
+        return None  # The stored CV has no recognisable section for a changed field
+
+    targets = sorted(set(indexes.values()))
+    headings = [sections[index][0] for index in targets]
+    content = await _acomplete(
+        build_section_payload(data, fields, [sections[index][1] for index in targets]), referer
+    )
+
+    rewritten = match_rewritten(content, headings)
+    if rewritten is None:
+        return None  # The reply did not keep the requested headings
+    markdown = splice(sections, {index: rewritten[sections[index][0]] for index in targets})
+    return _result(data, markdown, fields)
+
+
+async def agenerate_cv(data, referer="", previous=None):
+    """Generate a CV for validated details; returns the cv, score, improvement suggestions
+    and the list of regenerated fields
+
+    With `previous` (a GeneratedCV for the same person), only the sections whose
+    fields changed are rewritten and spliced into the stored markdown.
+    """
+    if previous is not None:
+        result = await _aregenerate_sections(data, previous, referer)
+        if result is not None:
+            return result
+
+    content = await _acomplete(build_cv_payload(data), referer)
+    return _result(data, content, list(SECTION_FIELDS))
+
+
+def calculate_cv_score(data, cv_text):
+    """Calculate a success score (0-100) for the CV"""
+    score = 50  # Base score
+    
+    # Safely get values with defaults
+    summary = data.get('summary', '')
+    experience = data.get('experience', '')
+    education = data.get('education', '')
+    skills = data.get('skills', '')
+    
+    # Length checks
+    if len(summary) > 100:
+        score += 5
+    if len(experience) > 300:
+        score += 10
+    if len(education) > 100:
+        score += 5
+        
+    # Content quality checks
+    cv_text_lower = cv_text.lower()
+    if "achieved" in cv_text_lower or "improved" in cv_text_lower:
+        score += 10
+    if any(word in cv_text_lower for word in ["led", "managed", "developed"]):
+        score += 10
+        
+    # Skills check - safely handle missing or empty skills
+    skills_count = len([s for s in skills.split(',') if s.strip()]) if skills else 0
+    score += min(skills_count * 2, 10)  # Max 10 points for skills
+        
+    return min(score, 100)  # Cap at 100
+
+def generate_improvement_suggestions(data, cv_text):
+    """Generate AI-powered improvement suggestions"""
+    suggestions = []
+    
+    # Check for common issues
+    if len(data['summary']) < 50:
+        suggestions.append("Your professional summary could be more detailed")
+    if not any(char.isdigit() for char in data['experience']):
+        suggestions.append("Add quantifiable achievements (e.g., 'Increased sales by 20%')")
+    if "http" not in data.get('linkedin', '') and "http" not in data.get('github', ''):
+        suggestions.append("Consider adding links to your professional profiles")
+        
+    # Formatting suggestions
+    if "\n\n" not in cv_text:
+        suggestions.append("Add more spacing between sections for better readability")
+    if "**" not in cv_text and "*" not in cv_text:
+        suggestions.append("Use bold/italic formatting to highlight key achievements")
+        
+    return suggestions[:5]  # Return top 5 suggestions
@@ -0,0 +1,117 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from .cv import REQUIRED_FIELDS, CVGenerationError, agenerate_cv, clean_cv_data
+from .models import GeneratedCV
+
+
+logger = logging.getLogger(__name__)
+
+# Columns besides the required ones that feed the prompt or the suggestions
+OPTIONAL_FIELDS = ("certification", "linkedin", "github")
+
+
+def _from_csv(text):
+    rows = []
+    for index, row in enumerate(csv.DictReader(io.StringIO(text))):
+        # DictReader files cells beyond the header under the None key
+        if None in row:
+            raise ValidationError(f"CSV row {index} has more cells than the header")
+        # Short rows get None for the missing cells; blank optional cells mean
+        # "not given", like a missing JSON key
+        cells = {key.strip(): (value or "").strip() for key, value in row.items()}
+        rows.append({
+            key: value
+            for key, value in cells.items()
+            if key in REQUIRED_FIELDS or (key in OPTIONAL_FIELDS and value)
+        })
+    return rows
+
+
+def _read_csv(data):
+    try:
+        return _from_csv(data.decode("utf-8-sig"))
+    except (UnicodeDecodeError, csv.Error):
+        raise ValidationError("Invalid CSV data: expected UTF-8 comma-separated values")
+
+
+def parse_batch(request):
+    """Candidate rows from a JSON body (a list or {"candidates": [...]}) or a CSV upload/body"""
+    if request.content_type == "multipart/form-data":
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError("Upload a CSV file in the 'file' field")
+        rows = _read_csv(upload.read())
+    elif request.content_type == "text/csv":
+        rows = _read_csv(request.body)
+    else:
+        try:
+            data = json.loads(request.body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ValidationError("Invalid JSON data")
+        rows = data.get("candidates") if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise ValidationError("Expected a list of candidates")
+
+    if not rows:
+        raise ValidationError("No candidates given")
+    if len(rows) > settings.CV_BATCH_MAX_ROWS:
+        raise ValidationError(f"At most {settings.CV_BATCH_MAX_ROWS} candidates per batch")
+    return rows
+
+
+def _clean_optional_fields(row):
+    # null means "not given", like a blank CSV cell; anything else must be text
+    for field in OPTIONAL_FIELDS:
+        if row.get(field) is None:
+            row.pop(field, None)
+        elif not isinstance(row[field], str):
+            raise ValidationError(f"Field {field} must be a string")
+
+
+def validate_batch(rows):
+    """Validate every row before any upstream call (dropping null optional fields); returns a list of per-row errors"""
+    errors = []
+    for index, row in enumerate(rows):
+        try:
+            clean_cv_data(row)
+            _clean_optional_fields(row)
+        except ValidationError as e:
+            errors.append({"row": index, "error": e.messages[0]})
+    return errors
+
+
+async def agenerate_batch(user, rows, referer=""):
+    """Yield {"row": index, ...} results in completion order, at most CV_BATCH_CONCURRENCY upstream calls at once"""
+    slots = asyncio.Semaphore(settings.CV_BATCH_CONCURRENCY)
+
+    async def one(index, row):
+        try:
+            async with slots:
+                result = await agenerate_cv(row, referer)
+            generated = await GeneratedCV.objects.acreate(
+                user=user, input_data=row, cv=result["cv"], score=result["score"],
+                suggestions=result["improvement_suggestions"],
+            )
+        except CVGenerationError as e:
+            return {"row": index, "error": str(e)}
+        except Exception:
+            # A failure in one row is reported in that row's result, not for the whole batch
+            logger.exception("CV batch row %s failed", index)
+            return {"row": index, "error": "Server error"}
+        return {"row": index, "cv_id": generated.id, **result}
+
+    tasks = [asyncio.create_task(one(index, row)) for index, row in enumerate(rows)]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        # The client went away mid-stream; stop the remaining upstream calls
+        for task in tasks:
+            task.cancel()
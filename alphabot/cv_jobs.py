@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import signal
+import socket
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cv import CVGenerationError, agenerate_cv
+from .models import CVJob, GeneratedCV
+
+
+logger = logging.getLogger(__name__)
+
+FINISHED = (CVJob.DONE, CVJob.FAILED)
+
+
+def job_json(job):
+    """Client-facing view of a job; the CV fields are only filled in once it is done"""
+    data = {"job_id": job.id, "status": job.status}
+    if job.status == CVJob.DONE:
+        data.update(
+            cv_id=job.generated_cv_id, cv=job.cv, score=job.score, improvement_suggestions=job.suggestions
+        )
+    elif job.status == CVJob.FAILED:
+        data["error"] = job.error
+    return data
+
+
+async def aenqueue(user, data, referer="", generated_cv=None):
+    """Queue a generation; with `generated_cv` the job regenerates only that CV's changed sections"""
+    return await CVJob.objects.acreate(
+        user=user, input_data=data, referer=referer[:200], generated_cv=generated_cv
+    )
+
+
+def requeue_stale_jobs():
+    """Put jobs back in the queue whose worker stopped without finishing them"""
+    cutoff = timezone.now() - timedelta(seconds=settings.CV_JOB_STALE_AFTER)
+    stale = CVJob.objects.filter(status=CVJob.RUNNING, started_at__lt=cutoff)
+    stale.filter(attempts__lt=settings.CV_JOB_MAX_ATTEMPTS).update(status=CVJob.QUEUED, worker="")
+    stale.update(status=CVJob.FAILED, error="CV generation did not finish", finished_at=timezone.now())
+
+
+def retry_delay(attempts):
+    """Seconds a job waits before its next attempt: exponential in the attempts so far, capped"""
+    return min(settings.CV_JOB_RETRY_BACKOFF_MAX, settings.CV_JOB_RETRY_BACKOFF_BASE * 2 ** (attempts - 1))
+
+
+def claim_job(worker_id):
+    """Atomically take the oldest queued job that is due, or None when there is none
+
+    The conditional UPDATE only succeeds for one worker per row, so this works the
+    same on PostgreSQL and SQLite without row locks.
+    """
+    candidates = CVJob.objects.filter(status=CVJob.QUEUED, available_at__lte=timezone.now()).order_by("id").values_list("id", flat=True)[:10]
+    for job_id in candidates:
+        claimed = CVJob.objects.filter(id=job_id, status=CVJob.QUEUED).update(
+            status=CVJob.RUNNING, worker=worker_id, started_at=timezone.now(), attempts=F("attempts") + 1
+        )
+        if claimed:
+            return CVJob.objects.select_related("generated_cv").get(id=job_id)
+    return None
+
+
+def _finish(job, **fields):
+    CVJob.objects.filter(id=job.id).update(finished_at=timezone.now(), **fields)
+
+
+def _store_result(job, result):
+    """Save the CV (updating the regenerated one in place) and mark the job done"""
+    with transaction.atomic():
+        generated = job.generated_cv or GeneratedCV(user_id=job.user_id)
+        generated.input_data = job.input_data
+        generated.cv = result["cv"]
+        generated.score = result["score"]
+        generated.suggestions = result["improvement_suggestions"]
+        generated.save()
+        _finish(
+            job,
+            status=CVJob.DONE,
+            generated_cv=generated,
+            cv=result["cv"],
+            score=result["score"],
+            suggestions=result["improvement_suggestions"],
+        )
+
+
+async def run_job(job):
+    """Generate, score and store the CV for one claimed job"""
+    try:
+        result = await agenerate_cv(job.input_data, job.referer, previous=job.generated_cv)
+    except CVGenerationError as e:
+        # Transport failures survive the retries in resilience; try the job again once
+        # the upstream has had time to recover rather than hitting it straight away
+        if e.retryable and job.attempts < settings.CV_JOB_MAX_ATTEMPTS:
+            available_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+            await sync_to_async(CVJob.objects.filter(id=job.id).update)(
+                status=CVJob.QUEUED, worker="", available_at=available_at
+            )
+        else:
+            await sync_to_async(_finish)(job, status=CVJob.FAILED, error=str(e))
+        return
+
+    await sync_to_async(_store_result)(job, result)
+
+
+def _claim(worker_id):
+    try:
+        requeue_stale_jobs()
+        return claim_job(worker_id)
+    finally:
+        close_old_connections()
+
+
+async def _work(worker_id, concurrency, poll_interval, stopping):
+    slots = asyncio.Semaphore(concurrency)
+    running = set()
+
+    async def run(job):
+        try:
+            await run_job(job)
+        except Exception:
+            logger.exception("CV job %s failed", job.id)
+            await sync_to_async(_finish)(job, status=CVJob.FAILED, error="Server error")
+        finally:
+            slots.release()
+
+    while not stopping.is_set():
+        await slots.acquire()
+        job = await sync_to_async(_claim)(worker_id)
+        if job is None:
+            slots.release()
+            try:
+                await asyncio.wait_for(stopping.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        task = asyncio.create_task(run(job))
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+    # Let in-flight jobs finish on shutdown instead of leaving them to go stale
+    if running:
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+def run_worker(concurrency=None, poll_interval=None, stop=None):
+    """Worker loop for one process: claims queued jobs and runs up to `concurrency` at a time
+
+    Stops on SIGTERM/SIGINT, or once the threading.Event `stop` is set when the
+    worker runs on a thread (signals only reach the main thread).
+    """
+    concurrency = concurrency or settings.CV_WORKER_CONCURRENCY
+    poll_interval = poll_interval or settings.CV_WORKER_POLL_INTERVAL
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def watch(stopping):
+        while not stop.is_set():
+            await asyncio.sleep(poll_interval)
+        stopping.set()
+
+    async def main():
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, stopping.set)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass  # Not supported on this platform/thread
+        watcher = asyncio.create_task(watch(stopping)) if stop is not None else None
+        logger.info("CV worker %s started", worker_id)
+        try:
+            await _work(worker_id, concurrency, poll_interval, stopping)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""Batch version of cv.calculate_cv_score and cv.generate_improvement_suggestions
+
+Scores a whole list of CVs at once: each CV is lowered once and checked against
+the keyword table, and the length/skill features and the score arithmetic are
+NumPy arrays. Results are identical to the reference functions.
+
+The keyword checks use CPython's substring search, one scan per keyword. A
+single-pass automaton (a combined overlapping regex) gives the same flags but
+was measured about 10x slower on CV-sized text.
+"""
+
+import re
+
+import numpy as np
+
+
+# Keyword groups of calculate_cv_score, each worth 10 points
+KEYWORD_GROUPS = (
+    ("achieved", "improved"),
+    ("led", "managed", "developed"),
+)
+
+_ASCII_DIGIT_RE = re.compile(r"[0-9]")
+
+
+def _keyword_flags(texts):
+    """Boolean matrix: CV x keyword group, True when any keyword of the group occurs"""
+    flags = np.zeros((len(texts), len(KEYWORD_GROUPS)), dtype=bool)
+    for column, keywords in enumerate(KEYWORD_GROUPS):
+        flags[:, column] = [any(keyword in text for keyword in keywords) for text in texts]
+    return flags
+
+
+def _has_digit(text):
+    # For ASCII text str.isdigit() only accepts 0-9, which a compiled class finds fastest
+    if text.isascii():
+        return _ASCII_DIGIT_RE.search(text) is not None
+    return any(char.isdigit() for char in text)
+
+
+def _lengths(rows, field):
+    return np.fromiter((len(row.get(field, '')) for row in rows), dtype=np.int64, count=len(rows))
+
+
+def _skill_counts(rows):
+    return np.fromiter(
+        (sum(1 for s in row['skills'].split(',') if s.strip()) if row.get('skills') else 0 for row in rows),
+        dtype=np.int64,
+        count=len(rows),
+    )
+
+
+def score_batch(rows, cv_texts):
+    """calculate_cv_score for every (row, cv_text) pair; returns an int array"""
+    flags = _keyword_flags([text.lower() for text in cv_texts])
+
+    scores = np.full(len(rows), 50, dtype=np.int64)
+    scores += 5 * (_lengths(rows, 'summary') > 100)
+    scores += 10 * (_lengths(rows, 'experience') > 300)
+    scores += 5 * (_lengths(rows, 'education') > 100)
+    scores += 10 * flags.sum(axis=1)
+    scores += np.minimum(_skill_counts(rows) * 2, 10)
+    return np.minimum(scores, 100)
+
+
+def suggestions_batch(rows, cv_texts):
+    """generate_improvement_suggestions for every (row, cv_text) pair"""
+    short_summary = _lengths(rows, 'summary') < 50
+
+    results = []
+    for index, (row, cv_text) in enumerate(zip(rows, cv_texts)):
+        suggestions = []
+        if short_summary[index]:
+            suggestions.append("Your professional summary could be more detailed")
+        if not _has_digit(row.get('experience', '')):
+            suggestions.append("Add quantifiable achievements (e.g., 'Increased sales by 20%')")
+        if "http" not in row.get('linkedin', '') and "http" not in row.get('github', ''):
+            suggestions.append("Consider adding links to your professional profiles")
+        if "\n\n" not in cv_text:
+            suggestions.append("Add more spacing between sections for better readability")
+        if "*" not in cv_text:  # Also covers the "**" check
+            suggestions.append("Use bold/italic formatting to highlight key achievements")
+        results.append(suggestions[:5])
+    return results
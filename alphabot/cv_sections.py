@@ -0,0 +1,116 @@
+"""Section-level diffing and splicing of generated CV markdown
+
+Used for incremental regeneration: when a user edits some fields of a CV they
+already generated, only the matching markdown sections are rewritten by the
+model and spliced back into the stored CV.
+"""
+
+import re
+
+
+# Input fields that map onto one section of the generated CV, with words that
+# identify that section's heading
+SECTION_FIELDS = {
+    "summary": ("summary", "profile", "objective", "about"),
+    "skills": ("skill", "competenc"),
+    "experience": ("experience", "employment", "work history", "career history"),
+    "education": ("education", "qualification"),
+    "certification": ("certification", "certificate", "licen"),
+}
+
+# Fields that appear throughout the CV (header, contact lines), so any change
+# to them needs a full regeneration
+GLOBAL_FIELDS = ("fullName", "email", "phone")
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+
+
+def _value(data, field):
+    # Optional fields may be stored as JSON null
+    return str(data.get(field) or "").strip()
+
+
+def changed_fields(old_data, new_data):
+    """Fields whose submitted value differs; None when only a full regeneration will do"""
+    if any(_value(old_data, field) != _value(new_data, field) for field in GLOBAL_FIELDS):
+        return None
+    return [field for field in SECTION_FIELDS if _value(old_data, field) != _value(new_data, field)]
+
+
+def field_for_heading(heading):
+    heading = heading.casefold()
+    for field, words in SECTION_FIELDS.items():
+        if any(word in heading for word in words):
+            return field
+    return None
+
+
+def split_sections(markdown, level=None):
+    """Split markdown into [heading or None, text] blocks at headings of `level` or above
+
+    Without a level, the level of the first heading that names a known section is
+    used, so job-title subheadings inside Work Experience stay in their section.
+    """
+    lines = markdown.splitlines(keepends=True)
+    if level is None:
+        for line in lines:
+            match = _HEADING_RE.match(line)
+            if match and field_for_heading(match.group(2)):
+                level = len(match.group(1))
+                break
+        else:
+            return [[None, markdown]]
+
+    sections = [[None, ""]]
+    for line in lines:
+        match = _HEADING_RE.match(line)
+        if match and len(match.group(1)) <= level:
+            sections.append([match.group(2), line])
+        else:
+            sections[-1][1] += line
+    return sections
+
+
+def sections_for_fields(sections, fields):
+    """Index of the section holding each field; None if any field has no section"""
+    found = {}
+    for field in fields:
+        for index, (heading, _) in enumerate(sections):
+            if heading and field_for_heading(heading) == field:
+                found[field] = index
+                break
+        else:
+            return None
+    return found
+
+
+def splice(sections, replacements):
+    """Markdown with the sections at the given indexes replaced by new text"""
+    parts = []
+    for index, (_, text) in enumerate(sections):
+        if index in replacements:
+            new_text = replacements[index].strip("\n")
+            # Keep the blank-line spacing that separated the old section from the next
+            trailing = text[len(text.rstrip("\n")):] or "\n"
+            parts.append(new_text + trailing)
+        else:
+            parts.append(text)
+    return "".join(parts)
+
+
+def match_rewritten(text, headings):
+    """Map each requested heading to its rewritten section in the model's reply; None if any is missing"""
+    rewritten = {}
+    for heading, section_text in split_sections(text):
+        if heading is None:
+            continue
+        field = field_for_heading(heading)
+        for wanted in headings:
+            if wanted not in rewritten and (
+                heading.casefold() == wanted.casefold() or (field and field == field_for_heading(wanted))
+            ):
+                rewritten[wanted] = section_text
+                break
+    if len(rewritten) != len(headings):
+        return None
+    return rewritten
@@ -0,0 +1,222 @@
+"""Registry of the AI features: model, fallbacks, prompts and generation limits
+
+Every OpenRouter request is built from its feature here. The registry is built
+once per process from the definitions below and the per-feature settings
+(OPENROUTER_FALLBACK_MODELS, OPENROUTER_ROUTING_MODELS, OPENROUTER_TIMEOUTS,
+OPENROUTER_MAX_TOKENS), so a
+request only fills the prompt's slots.
+"""
+
+import threading
+from string import Formatter
+
+from django.conf import settings
+
+
+class PromptTemplate:
+    """A str.format-style template parsed once; render() only joins the literal parts with slot values"""
+
+    def __init__(self, template):
+        self.template = template
+        self._parts = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if spec or conversion:
+                raise ValueError(f"Unsupported format spec in prompt slot {{{field}}}")
+            self._parts.append((literal, field))
+        self.fields = tuple(field for _, field in self._parts if field is not None)
+
+    def render(self, **slots):
+        parts = []
+        for literal, field in self._parts:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(slots[field]))
+        return "".join(parts)
+
+
+class Feature:
+    """One AI tool and everything needed to build its OpenRouter requests"""
+
+    def __init__(self, name, model, system_prompt, prompt="{message}", temperature=None):
+        self.name = name
+        self.model = model
+        self.system_prompt = system_prompt
+        self.prompt = PromptTemplate(prompt)
+        self.temperature = temperature
+        self.fallback_models = tuple(settings.OPENROUTER_FALLBACK_MODELS.get(name, ()))
+        self.routing_models = tuple(settings.OPENROUTER_ROUTING_MODELS.get(name, ()))
+        self.timeout = settings.OPENROUTER_TIMEOUTS.get(name, settings.OPENROUTER_DEFAULT_TIMEOUT)
+        self.max_tokens = settings.OPENROUTER_MAX_TOKENS.get(name) or None
+
+        # Static parts of every payload, built once and shared by all requests
+        self._system_message = {"role": "system", "content": system_prompt}
+        self._options = {"model": model}
+        if temperature is not None:
+            self._options["temperature"] = temperature
+        if self.max_tokens:
+            self._options["max_tokens"] = self.max_tokens
+
+    def candidate_models(self, model=None):
+        """The requested (or primary) model followed by the fallbacks"""
+        model = model or self.model
+        return [model] + [m for m in self.fallback_models if m != model]
+
+    def routed_models(self, model=None):
+        """The requested (or primary) model and the peers latency routing may pick instead of it"""
+        model = model or self.model
+        return [model] + [m for m in self.routing_models if m != model]
+
+    def payload(self, user_content, history=()):
+        """Chat completion payload for an already rendered user message"""
+        return {
+            **self._options,
+            "messages": [self._system_message, *history, {"role": "user", "content": user_content}],
+        }
+
+    def build(self, history=(), **slots):
+        """Chat completion payload with the feature's prompt filled from `slots`"""
+        return self.payload(self.prompt.render(**slots), history)
+
+
+CV_SYSTEM_PROMPT = """You are a professional career advisor. 
+ALWAYS respond ONLY in Markdown (do NOT use any HTML tags).
+Use:
+- `#` for headings
+- `**bold**` for job titles, company names, and degrees
+- `*italic*` for dates or locations
+- Bullet points for lists
+
+Example:
+# Professional Summary
+Motivated professional with 5+ years of experience...
+
+# Work Experience
+**Software Engineer** – *Jan 2020 – Present*, **TechCorp**
+- Developed new features for the main product
+- Improved system performance by 30%
+
+# Skills
+- **Python**
+- **Project Management**
+
+Now, generate the CV using the provided details, following this Markdown style strictly.
+"""
+
+CV_PROMPT = """
+        Generate a professional CV with these details:
+        
+        Name: {fullName}
+        Email: {email}
+        Phone: {phone}
+        
+        Professional Summary:
+        {summary}
+        
+        Skills:
+        {skills}
+        
+        Work Experience:
+        {experience}
+        
+        Education:
+        {education}
+        
+        Certifications:
+        {certification}
+        
+        Requirements:
+        - Use Markdown formatting
+        - Include section headings
+        - Use bullet points for lists
+        - Keep it concise (1-2 pages)
+        - Optimize for ATS systems
+        - Add professional spacing
+        """
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a user and AlphaBot. "
+    "Keep facts, decisions, names, code details and open questions. Be concise."
+)
+
+
+def _definitions():
+    return {
+        "chat": dict(
+            model="meta-llama/llama-4-maverick:free",
+            system_prompt="You are AlphaBot, a friendly assistant who helps with anything. You were created by Alphin a single person",
+        ),
+        "coder": dict(
+            model="deepseek/deepseek-chat:free",
+            system_prompt="You are AlphaBot, a coding genius who helps with anything related to coding in python, javascript or something else.",
+        ),
+        "cv": dict(
+            model="deepseek/deepseek-chat",
+            system_prompt=CV_SYSTEM_PROMPT,
+            prompt=CV_PROMPT,
+            temperature=0.3,  # Less creative, more factual
+        ),
+        "content": dict(
+            model="deepseek/deepseek-chat:free",
+            system_prompt="You are a helpful writing assistant.",
+            prompt="Write a short, informative article on: {topic}",
+        ),
+        # Long-form pipeline (alphabot/articles.py): an outline, then each section in parallel
+        "content_outline": dict(
+            model="deepseek/deepseek-chat:free",
+            system_prompt="You are a helpful writing assistant who plans well-structured long-form articles.",
+            prompt=(
+                "Plan a long-form article on: {topic}\n\n"
+                "Return only the section headings, one per line, {sections} in total. "
+                "No numbering, no title, no other text."
+            ),
+            temperature=0.3,
+        ),
+        "content_section": dict(
+            model="deepseek/deepseek-chat:free",
+            system_prompt="You are a helpful writing assistant.",
+            prompt=(
+                "You are writing one section of a long-form article on: {topic}\n\n"
+                "Article outline:\n{outline}\n\n"
+                "Write the section \"{heading}\" in about {words} words of Markdown. "
+                "Do not repeat the section heading and do not write any other section."
+            ),
+        ),
+        "script": dict(
+            model="deepseek/deepseek-chat:free",
+            system_prompt="You are a professional scriptwriter for YouTube videos and short films.",
+            prompt="{prompt}",
+        ),
+        "paraphraser": dict(
+            model="qwen/qwen2.5-vl-3b-instruct:free",
+            system_prompt="You are AlphaBot, a helpful paraphrasing assistant.",
+            prompt="Paraphrase the following text clearly and concisely without emojis:\n\n{text}",
+        ),
+        "summary": dict(
+            model=settings.CHAT_SUMMARY_MODEL,
+            system_prompt=SUMMARY_SYSTEM_PROMPT,
+            prompt="Current summary:\n{summary}\n\nNew messages:\n{transcript}\n\nWrite the updated summary.",
+            temperature=0.2,
+        ),
+    }
+
+
+_features = None
+_features_lock = threading.Lock()
+
+
+def load():
+    """Build the registry (once per process; called from AppConfig.ready)"""
+    global _features
+    with _features_lock:
+        if _features is None:
+            _features = {name: Feature(name, **definition) for name, definition in _definitions().items()}
+    return _features
+
+
+def get_feature(name):
+    return (_features or load())[name]
+
+
+def find_feature(name):
+    """The registered feature, or None for names outside the registry"""
+    return (_features or load()).get(name)
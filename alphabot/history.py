@@ -0,0 +1,105 @@
+import base64
+import re
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+from . import archive
+from .models import ConversationSummary, Message
+from .turns import aflush_conversation
+
+
+# Rough BPE approximation: words are split into pieces of up to 4 characters and
+# every punctuation mark counts as its own token
+_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+
+# Per-message overhead for the role/separator tokens the provider adds
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    """Local estimate of how many tokens a piece of text costs"""
+    return len(_TOKEN_RE.findall(text))
+
+
+def to_chat_message(message):
+    """Convert a stored Message row into an OpenRouter chat message"""
+    role = "assistant" if message.sender == "AlphaBot" else "user"
+    return {"role": role, "content": message.text}
+
+
+async def build_history(user, chat_type, limit=None, token_budget=None):
+    """Stored conversation summary plus the newest unsummarized messages that fit the token budget"""
+    limit = limit or settings.CHAT_HISTORY_LIMIT
+    token_budget = token_budget or settings.CHAT_HISTORY_TOKEN_BUDGET
+
+    await aflush_conversation(user.id, chat_type)
+    summary = await ConversationSummary.objects.filter(user=user, chat_type=chat_type).afirst()
+    # Skip both summarized messages and those hidden by a chat reset
+    after_id = max(summary.last_message_id, summary.cleared_through_id) if summary else 0
+
+    rows = (
+        Message.objects.filter(user=user, chat_type=chat_type, id__gt=after_id)
+        .order_by("-timestamp", "-id")[:limit]
+    )
+
+    history = []
+    used = 0
+    async for message in rows:
+        cost = estimate_tokens(message.text) + MESSAGE_OVERHEAD_TOKENS
+        if used + cost > token_budget:
+            break
+        used += cost
+        history.append(to_chat_message(message))
+
+    history.reverse()
+    if summary and summary.summary:
+        history.insert(0, {"role": "system", "content": f"Summary of the earlier conversation:\n{summary.summary}"})
+    return history
+
+
+def encode_cursor(message):
+    """Opaque `before=` cursor pointing just past a message in newest-first order"""
+    raw = f"{message.timestamp.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, id) from a cursor, raising ValueError if it is malformed"""
+    # Decoding and parsing errors are all ValueError subclasses
+    timestamp, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(timestamp), int(message_id)
+
+
+async def history_page(user, chat_type, before=None, limit=None):
+    """One page of messages older than the `before` cursor, oldest first, plus the cursor for the next page
+
+    Once the hot Message rows run out, the cursor moves on to archived chunks.
+    """
+    if limit and limit < 0:
+        raise ValueError("limit must be positive")
+    limit = min(limit or settings.CHAT_HISTORY_PAGE_SIZE, settings.CHAT_HISTORY_MAX_PAGE_SIZE)
+
+    await aflush_conversation(user.id, chat_type)
+    cleared = await archive.acleared_through(user.id, chat_type)
+    if archive.is_archive_cursor(before):
+        return await archive.aarchive_page(user.id, chat_type, before, cleared)
+
+    rows = Message.objects.filter(user=user, chat_type=chat_type, id__gt=cleared)
+    if before:
+        timestamp, message_id = decode_cursor(before)
+        rows = rows.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=message_id))
+
+    # Fetch one extra row to learn whether an older page exists
+    page = [m async for m in rows.order_by("-timestamp", "-id")[:limit + 1]]
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    if has_more:
+        next_before = encode_cursor(page[-1])
+    else:
+        # Older messages continue in the archive, one chunk per page
+        next_before = await archive.anewest_chunk_cursor(user.id, chat_type, cleared)
+    page.reverse()
+    return page, next_before
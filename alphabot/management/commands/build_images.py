@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from PIL import Image, features
+
+
+# Source images (relative to alphabot/static/) and the widths they are shown at:
+# both logos render 80px wide, so 1x/2x/3x variants cover common screens
+IMAGES = {
+    "alphabot/login_logo.png": (80, 160, 240),
+    "alphabot/register_logo.png": (80, 160, 240),
+}
+
+# Output folder for the variants, next to the sources
+OUTPUT_DIR = "alphabot/img"
+
+QUALITY = {"webp": 80, "avif": 60}
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/AVIF (and PNG fallback) variants of the static images"
+
+    def handle(self, *args, **options):
+        static_dir = Path(apps.get_app_config("alphabot").path) / "static"
+        output_dir = static_dir / OUTPUT_DIR
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        formats = ["webp"]
+        if features.check("avif"):
+            formats.append("avif")
+        else:
+            self.stderr.write("This Pillow build has no AVIF support; generating WebP and PNG only")
+
+        for source, widths in IMAGES.items():
+            image = Image.open(static_dir / source)
+            stem = Path(source).stem
+            for width in widths:
+                height = round(image.height * width / image.width)
+                resized = image.resize((width, height), Image.LANCZOS)
+                resized.save(output_dir / f"{stem}-{width}.png", optimize=True)
+                for fmt in formats:
+                    resized.save(output_dir / f"{stem}-{width}.{fmt}", quality=QUALITY[fmt])
+            self.stdout.write(f"{source}: {len(widths)} widths in {', '.join(['png'] + formats)}")
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from alphabot import archive
+from alphabot.models import ConversationSummary, Message
+
+
+class Command(BaseCommand):
+    help = "Purge reset chat history and move old messages into compressed archive chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int, default=settings.CHAT_ARCHIVE_AFTER_DAYS)
+        parser.add_argument("--chunk-size", type=int, default=settings.CHAT_ARCHIVE_CHUNK_SIZE)
+        parser.add_argument("--batch-size", type=int, default=settings.CHAT_PURGE_BATCH_SIZE,
+                            help="rows per DELETE when purging reset chats")
+        parser.add_argument("--skip-purge", action="store_true")
+        parser.add_argument("--skip-archive", action="store_true")
+
+    def handle(self, *args, **options):
+        if not options["skip_purge"]:
+            purged = 0
+            resets = ConversationSummary.objects.filter(cleared_through_id__gt=0).values_list("user_id", "chat_type")
+            for user_id, chat_type in resets.iterator():
+                purged += archive.purge_conversation(user_id, chat_type, options["batch_size"])
+            self.stdout.write(f"Purged {purged} messages of reset chats")
+
+        if not options["skip_archive"]:
+            cutoff = archive.archive_cutoff(options["older_than_days"])
+            conversations = (
+                Message.objects.filter(timestamp__lt=cutoff)
+                .values_list("user_id", "chat_type")
+                .distinct()
+            )
+            moved = 0
+            for user_id, chat_type in list(conversations):
+                moved += archive.archive_conversation(user_id, chat_type, cutoff, options["chunk_size"])
+            self.stdout.write(f"Archived {moved} messages older than {cutoff:%Y-%m-%d}")
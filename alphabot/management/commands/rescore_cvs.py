@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from alphabot.cv_scoring import score_batch, suggestions_batch
+from alphabot.models import GeneratedCV
+
+
+class Command(BaseCommand):
+    help = "Recompute the score and improvement suggestions of every stored CV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--dry-run", action="store_true", help="count changes without saving them")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        seen = changed = 0
+        last_id = 0
+
+        # Keyset pagination keeps each batch query cheap on a large archive
+        while True:
+            cvs = list(
+                GeneratedCV.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .only("id", "input_data", "cv", "score", "suggestions")[:batch_size]
+            )
+            if not cvs:
+                break
+            last_id = cvs[-1].id
+
+            rows = [cv.input_data for cv in cvs]
+            texts = [cv.cv for cv in cvs]
+            updates = []
+            for cv, score, suggestions in zip(cvs, score_batch(rows, texts).tolist(), suggestions_batch(rows, texts)):
+                if cv.score != score or cv.suggestions != suggestions:
+                    cv.score, cv.suggestions = score, suggestions
+                    updates.append(cv)
+
+            if updates and not options["dry_run"]:
+                GeneratedCV.objects.bulk_update(updates, ["score", "suggestions"])
+            seen += len(cvs)
+            changed += len(updates)
+
+        verb = "would change" if options["dry_run"] else "changed"
+        self.stdout.write(f"Rescored {seen} CVs, {verb} {changed}")
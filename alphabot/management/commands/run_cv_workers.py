@@ -0,0 +1,52 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _worker_main(concurrency, poll_interval):
+    import django
+
+    django.setup()
+    from alphabot import cv_jobs
+
+    cv_jobs.run_worker(concurrency, poll_interval)
+
+
+class Command(BaseCommand):
+    help = "Run local worker processes that execute queued CV generation jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=settings.CV_WORKER_PROCESSES)
+        parser.add_argument("--concurrency", type=int, default=settings.CV_WORKER_CONCURRENCY,
+                            help="jobs each process runs at once")
+        parser.add_argument("--poll-interval", type=float, default=settings.CV_WORKER_POLL_INTERVAL)
+
+    def handle(self, *args, **options):
+        # Workers must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=_worker_main, args=(options["concurrency"], options["poll_interval"]),
+                            name=f"cv-worker-{i}")
+            for i in range(options["processes"])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} CV workers")
+
+        def stop(signum, frame):
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()  # SIGTERM: workers finish their in-flight jobs
+
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            # Ctrl+C already reached the whole process group; wait for in-flight jobs
+            for worker in workers:
+                worker.join()
@@ -0,0 +1,238 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Timing breakdown of the request being handled; sync_to_async copies the
+# context into ORM threads, so DB time lands on the right request
+current_request = contextvars.ContextVar("alphabot_request_stats", default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.upstream_seconds = 0.0
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[label] for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        """Snapshot of the counts by label values"""
+        with self._lock:
+            return dict(self._values)
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[label] for label in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+request_duration = Histogram(
+    "alphabot_request_duration_seconds", "Total time spent handling a request", ("endpoint",)
+)
+request_phase = Histogram(
+    "alphabot_request_phase_seconds",
+    "Request time by phase: db, upstream (OpenRouter) and app (JSON/template/Python work)",
+    ("endpoint", "phase"),
+)
+db_queries = Counter("alphabot_db_queries_total", "Database queries executed", ("endpoint",))
+requests_total = Counter("alphabot_requests_total", "Requests handled", ("endpoint", "status"))
+upstream_duration = Histogram(
+    "alphabot_upstream_duration_seconds", "OpenRouter call duration", ("feature",)
+)
+upstream_requests = Counter("alphabot_upstream_requests_total", "OpenRouter calls", ("feature", "status"))
+upstream_tokens = Counter(
+    "alphabot_upstream_tokens_total", "Tokens reported in OpenRouter usage", ("feature", "type")
+)
+rate_limited = Counter(
+    "alphabot_rate_limited_total", "Requests rejected by the rate limiter or admission control", ("feature", "reason")
+)
+hedged_requests = Counter(
+    "alphabot_hedged_requests_total", "Hedged OpenRouter calls by which model answered first", ("feature", "winner")
+)
+page_cache = Counter("alphabot_page_cache_requests_total", "Anonymous page renders served from cache", ("view", "result"))
+
+REGISTRY = [
+    request_duration, request_phase, requests_total, db_queries,
+    upstream_duration, upstream_requests, upstream_tokens, rate_limited, hedged_requests, page_cache,
+]
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding query time to the current request"""
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_seconds += time.perf_counter() - started
+        stats.db_queries += 1
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_upstream(feature, seconds, status, usage=None):
+    """Called by the OpenRouter client after every upstream call"""
+    stats = current_request.get()
+    if stats is not None:
+        stats.upstream_seconds += seconds
+    upstream_duration.observe(seconds, feature=feature)
+    upstream_requests.inc(feature=feature, status=status)
+    if usage:
+        for token_type in ("prompt_tokens", "completion_tokens"):
+            if usage.get(token_type):
+                upstream_tokens.inc(usage[token_type], feature=feature, type=token_type.split("_")[0])
+        # Prompt tokens the provider served from its prompt cache
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        if cached:
+            upstream_tokens.inc(cached, feature=feature, type="cached")
+
+
+def finish_request(stats, endpoint, status):
+    total = time.perf_counter() - stats.started
+    request_duration.observe(total, endpoint=endpoint)
+    requests_total.inc(endpoint=endpoint, status=status)
+    db_queries.inc(stats.db_queries, endpoint=endpoint)
+    request_phase.observe(stats.db_seconds, endpoint=endpoint, phase="db")
+    request_phase.observe(stats.upstream_seconds, endpoint=endpoint, phase="upstream")
+    app_seconds = max(0.0, total - stats.db_seconds - stats.upstream_seconds)
+    request_phase.observe(app_seconds, endpoint=endpoint, phase="app")
+
+
+def _cache_lines():
+    """Counters kept by the response caches and request coalescing, read at scrape time"""
+    from . import response_cache, similarity_cache, singleflight
+
+    lines = ["# TYPE alphabot_response_cache_requests_total counter"]
+    for feature, counts in response_cache.stats().items():
+        lines.append(f'alphabot_response_cache_requests_total{{feature="{feature}",result="hit"}} {counts["hits"]}')
+        lines.append(f'alphabot_response_cache_requests_total{{feature="{feature}",result="miss"}} {counts["misses"]}')
+
+    cache = similarity_cache.get_similarity_cache()
+    lines.append("# TYPE alphabot_similarity_cache_requests_total counter")
+    lines.append(f'alphabot_similarity_cache_requests_total{{result="hit"}} {cache.hits}')
+    lines.append(f'alphabot_similarity_cache_requests_total{{result="miss"}} {cache.misses}')
+    lines.append("# TYPE alphabot_similarity_cache_entries gauge")
+    lines.append(f"alphabot_similarity_cache_entries {len(cache)}")
+
+    lines.append("# TYPE alphabot_coalesced_requests_total counter")
+    for feature, counts in singleflight.stats().items():
+        lines.append(f'alphabot_coalesced_requests_total{{feature="{feature}",result="upstream"}} {counts["calls"]}')
+        lines.append(f'alphabot_coalesced_requests_total{{feature="{feature}",result="collapsed"}} {counts["collapsed"]}')
+    return lines
+
+
+def prompt_cache_ratios():
+    """Share of each feature's prompt tokens that were served from the provider's prompt cache"""
+    totals = upstream_tokens.values()
+    return {
+        feature: totals.get((feature, "cached"), 0) / prompt
+        for (feature, token_type), prompt in sorted(totals.items())
+        if token_type == "prompt" and prompt
+    }
+
+
+def _prompt_cache_lines():
+    lines = [
+        "# HELP alphabot_prompt_cache_hit_ratio Share of prompt tokens served from the provider's prompt cache",
+        "# TYPE alphabot_prompt_cache_hit_ratio gauge",
+    ]
+    for feature, ratio in prompt_cache_ratios().items():
+        lines.append(f'alphabot_prompt_cache_hit_ratio{{feature="{feature}"}} {ratio:.4f}')
+    return lines
+
+
+def _routing_lines():
+    """Sliding-window latency and error rate per model, as seen by the router (alphabot/routing.py)"""
+    from . import routing
+
+    lines = [
+        "# TYPE alphabot_model_latency_seconds gauge",
+        "# TYPE alphabot_model_error_rate gauge",
+    ]
+    for (route, model), (count, error_rate, p50, p95) in routing.snapshot().items():
+        if not count:
+            continue
+        labels = f'route="{_escape(route)}",model="{_escape(model)}"'
+        for quantile, value in (("0.5", p50), ("0.95", p95)):
+            if value is not None:
+                lines.append(f'alphabot_model_latency_seconds{{{labels},quantile="{quantile}"}} {value:.4f}')
+        lines.append(f"alphabot_model_error_rate{{{labels}}} {error_rate:.4f}")
+    return lines
+
+
+def expose():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.expose())
+    lines.extend(_prompt_cache_lines())
+    lines.extend(_routing_lines())
+    lines.extend(_cache_lines())
+    return "\n".join(lines) + "\n"
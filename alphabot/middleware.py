@@ -0,0 +1,77 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.utils.decorators import sync_and_async_middleware
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that also runs natively under ASGI
+
+    Stock WhiteNoiseMiddleware is sync-only, which makes Django run the whole
+    request (including our async views) on its single sync thread and so
+    serializes every in-flight OpenRouter call.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    """Time every request and split it into db, upstream and app phases (see alphabot/metrics.py)"""
+
+    def _endpoint(request):
+        match = getattr(request, "resolver_match", None)
+        return match.url_name if match and match.url_name else "unmatched"
+
+    def _finish(request, response, stats):
+        if response.streaming and response.is_async:
+            # SSE responses keep calling OpenRouter after the view returns
+            content = response.streaming_content
+
+            async def measured():
+                try:
+                    async for chunk in content:
+                        yield chunk
+                finally:
+                    metrics.finish_request(stats, _endpoint(request), response.status_code)
+
+            response.streaming_content = measured()
+        else:
+            metrics.finish_request(stats, _endpoint(request), response.status_code)
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats = metrics.RequestStats()
+            metrics.current_request.set(stats)
+            response = await get_response(request)
+            return _finish(request, response, stats)
+    else:
+        def middleware(request):
+            stats = metrics.RequestStats()
+            metrics.current_request.set(stats)
+            response = get_response(request)
+            return _finish(request, response, stats)
+
+    return middleware
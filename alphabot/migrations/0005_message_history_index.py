@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alphabot', '0004_conversationsummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['user', 'chat_type', 'timestamp', 'id'], name='alphabot_msg_user_chat_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def store_finished_jobs(apps, schema_editor):
+    """Keep the CVs produced by jobs that finished before GeneratedCV existed"""
+    CVJob = apps.get_model('alphabot', 'CVJob')
+    GeneratedCV = apps.get_model('alphabot', 'GeneratedCV')
+    for job in CVJob.objects.filter(status='done', generated_cv__isnull=True).iterator():
+        job.generated_cv = GeneratedCV.objects.create(
+            user_id=job.user_id, input_data=job.input_data, cv=job.cv, score=job.score or 0, suggestions=job.suggestions
+        )
+        job.save(update_fields=['generated_cv'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alphabot', '0006_cvjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneratedCV',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('input_data', models.JSONField()),
+                ('cv', models.TextField()),
+                ('score', models.IntegerField()),
+                ('suggestions', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cvjob',
+            name='generated_cv',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='alphabot.generatedcv'),
+        ),
+        migrations.RunPython(store_finished_jobs, migrations.RunPython.noop),
+    ]
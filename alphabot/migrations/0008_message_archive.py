@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alphabot', '0007_generatedcv'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationsummary',
+            name='cleared_through_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='MessageArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_type', models.CharField(default='chat', max_length=20)),
+                ('first_message_id', models.BigIntegerField()),
+                ('last_message_id', models.BigIntegerField()),
+                ('first_timestamp', models.DateTimeField()),
+                ('last_timestamp', models.DateTimeField()),
+                ('message_count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'chat_type', 'id'], name='alphabot_msgarchive_conv_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alphabot', '0008_message_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cvjob',
+            name='available_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -25,5 +26,97 @@ class Message(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     chat_type = models.CharField(max_length=20, default="chat")  # Add this line
 
+    class Meta:
+        indexes = [
+            # Covers the per-conversation history reads and keyset pagination
+            models.Index(fields=["user", "chat_type", "timestamp", "id"], name="alphabot_msg_user_chat_ts_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} ({self.chat_type}) - {self.sender}: {self.text[:30]}"
+
+class ConversationSummary(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    chat_type = models.CharField(max_length=20, default="chat")
+    summary = models.TextField()
+    last_message_id = models.BigIntegerField(default=0)  # Newest Message folded into the summary
+    # Soft delete: messages up to this id were cleared by a chat reset and are
+    # hidden until `manage.py chat_retention` purges them
+    cleared_through_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "chat_type")
+
+    def __str__(self):
+        return f"{self.user} ({self.chat_type}) summary up to message {self.last_message_id}"
+
+
+class MessageArchive(models.Model):
+    """A chunk of old messages of one conversation, moved out of Message as compressed JSON"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    chat_type = models.CharField(max_length=20, default="chat")
+    first_message_id = models.BigIntegerField()
+    last_message_id = models.BigIntegerField()
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    message_count = models.PositiveIntegerField()
+    data = models.BinaryField()  # zlib-compressed JSON list of messages, oldest first
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "chat_type", "id"], name="alphabot_msgarchive_conv_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} ({self.chat_type}) archive of {self.message_count} messages"
+
+
+class GeneratedCV(models.Model):
+    """A generated CV; regenerations update it in place"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    input_data = models.JSONField()  # The form fields the current markdown was generated from
+    cv = models.TextField()
+    score = models.IntegerField()
+    suggestions = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"CV {self.id} for {self.user} ({self.input_data.get('fullName', '')})"
+
+
+class CVJob(models.Model):
+    """A queued CV generation, executed by `manage.py run_cv_workers`"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    input_data = models.JSONField()  # The validated form fields
+    # The CV to update: set on regeneration requests, and to the stored result once done
+    generated_cv = models.ForeignKey(GeneratedCV, null=True, blank=True, on_delete=models.SET_NULL)
+    referer = models.CharField(max_length=200, blank=True)  # Sent to OpenRouter as HTTP-Referer
+    cv = models.TextField(blank=True)
+    score = models.IntegerField(null=True, blank=True)
+    suggestions = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)  # Retried jobs wait out their backoff
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest queued job
+            models.Index(fields=["status", "id"], name="alphabot_cvjob_status_idx"),
+        ]
+
     def __str__(self):
-        return f"{self.user} ({self.chat_type}) - {self.sender}: {self.text[:30]}"
\ No newline at end of file
+        return f"CV job {self.id} for {self.user} ({self.status})"
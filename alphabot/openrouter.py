@@ -0,0 +1,180 @@
+import asyncio
+import json
+import time
+import weakref
+
+import httpx
+from django.conf import settings
+
+from . import features, metrics
+
+
+class OpenRouterError(Exception):
+    """Non-200 response from OpenRouter"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+# httpx pools are bound to an event loop, so keep one async client per running loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Return the keep-alive httpx client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client, _ = _async_clients.get(loop, (None, None))
+    if client is None:
+        pool_size = settings.OPENROUTER_POOL_SIZE
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        client = httpx.AsyncClient(limits=limits)
+        _async_clients[loop] = client, _close_with_loop(client)
+    return client
+
+
+def _close_with_loop(client):
+    """Async generator parked at its yield that closes the client when the loop finalizes it
+
+    asyncio.run() (used by uvicorn workers, the CV worker and async_to_sync) calls
+    loop.shutdown_asyncgens() on the way out, so each pool is closed before its loop.
+    """
+    async def lifetime():
+        try:
+            yield
+        finally:
+            await client.aclose()
+
+    generator = lifetime()
+    # Stepping it once registers it with the running loop; it never awaits before the yield
+    try:
+        generator.asend(None).send(None)
+    except StopIteration:
+        pass
+    return generator
+
+
+def _read_timeout(feature):
+    registered = features.find_feature(feature)
+    return registered.timeout if registered else settings.OPENROUTER_DEFAULT_TIMEOUT
+
+
+def get_async_timeout(feature):
+    return httpx.Timeout(_read_timeout(feature), connect=settings.OPENROUTER_CONNECT_TIMEOUT)
+
+
+def _headers(api_key, extra_headers=None):
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    if extra_headers:
+        headers.update(extra_headers)
+    return headers
+
+
+def _usage(response):
+    if response.status_code != 200:
+        return None
+    try:
+        return response.json().get("usage")
+    except ValueError:
+        return None
+
+
+async def achat_completion(feature, payload, api_key, extra_headers=None):
+    """POST a chat completion payload to OpenRouter and return the raw httpx response"""
+    started = time.perf_counter()
+    try:
+        response = await get_async_client().post(
+            settings.OPENROUTER_URL,
+            headers=_headers(api_key, extra_headers),
+            json=_wire_payload(payload),
+            timeout=get_async_timeout(feature),
+        )
+    except httpx.TransportError:
+        metrics.record_upstream(feature, time.perf_counter() - started, "error")
+        raise
+    metrics.record_upstream(feature, time.perf_counter() - started, response.status_code, _usage(response))
+    return response
+
+
+async def astream_chat_completion(feature, payload, api_key, extra_headers=None):
+    """Yield content deltas from a streamed (`stream: true`) chat completion"""
+    started = time.perf_counter()
+    usage = None
+    async with get_async_client().stream(
+        "POST",
+        settings.OPENROUTER_URL,
+        headers=_headers(api_key, extra_headers),
+        json=_stream_payload(payload),
+        timeout=get_async_timeout(feature),
+    ) as response:
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                raise OpenRouterError(response.status_code, response.text)
+
+            async for line in response.aiter_lines():
+                done, delta, chunk_usage = _parse_stream_line(line)
+                usage = chunk_usage or usage
+                if done:
+                    break
+                if delta:
+                    yield delta
+        finally:
+            metrics.record_upstream(feature, time.perf_counter() - started, response.status_code, usage)
+
+
+def uses_cache_control(model):
+    """True for models whose providers only cache prompts at explicit cache_control breakpoints
+
+    Other providers (OpenAI, DeepSeek, ...) cache repeated prompt prefixes on their
+    own, which only needs the stable parts to come first: system prompt, then history.
+    """
+    return settings.OPENROUTER_PROMPT_CACHE and model.startswith(settings.OPENROUTER_CACHE_CONTROL_MODELS)
+
+
+def _cached_message(message):
+    return {
+        "role": message["role"],
+        "content": [{"type": "text", "text": message["content"], "cache_control": {"type": "ephemeral"}}],
+    }
+
+
+def mark_cache_breakpoints(messages):
+    """Messages with breakpoints after the system prompt and after the history before the new user message"""
+    breakpoints = {0, len(messages) - 2} if len(messages) > 2 else {0}
+    return [
+        _cached_message(message) if index in breakpoints and isinstance(message["content"], str) else message
+        for index, message in enumerate(messages)
+    ]
+
+
+def _wire_payload(payload):
+    """The payload as sent: callers build plain-text messages, breakpoints are added per model here
+    (fallbacks may switch to a model that needs them)"""
+    if not uses_cache_control(payload["model"]):
+        return payload
+    return dict(payload, messages=mark_cache_breakpoints(payload["messages"]))
+
+
+def _stream_payload(payload):
+    # Ask OpenRouter to append token usage to the final chunk
+    return dict(_wire_payload(payload), stream=True, usage={"include": True})
+
+
+def _parse_stream_line(line):
+    """Return (done, delta, usage) for one line of an OpenRouter SSE stream"""
+    # Skip blank lines and keep-alive comments such as ": OPENROUTER PROCESSING"
+    if not line.startswith("data:"):
+        return False, None, None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return True, None, None
+
+    chunk = json.loads(data)
+    choices = chunk.get("choices") or []
+    delta = choices[0].get("delta", {}).get("content") if choices else None
+    return False, delta, chunk.get("usage")
@@ -0,0 +1,49 @@
+import functools
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import metrics
+
+
+def get_cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def cache_anonymous_page(view):
+    """Serve the rendered page from the cache to visitors without a session
+
+    Without a session cookie the visitor is anonymous, so the page is the same for
+    everyone and neither the session nor the user needs loading. Logged-in users and
+    responses that set cookies (e.g. a CSRF token) always render fresh.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            not settings.PAGE_CACHE_TIMEOUT
+            or request.method not in ("GET", "HEAD")
+            or settings.SESSION_COOKIE_NAME in request.COOKIES
+        ):
+            return view(request, *args, **kwargs)
+
+        cache = get_cache()
+        # The pages ignore the query string, so it stays out of the key
+        key = f"page:{request.path}"
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.page_cache.inc(view=view.__name__, result="hit")
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            metrics.page_cache.inc(view=view.__name__, result="miss")
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.cookies:
+                cache.set(key, (response.content, response["Content-Type"]), settings.PAGE_CACHE_TIMEOUT)
+        # Shared caches must not hand the anonymous page to logged-in users
+        patch_vary_headers(response, ("Cookie",))
+        return response
+
+    return wrapper
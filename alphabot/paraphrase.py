@@ -0,0 +1,127 @@
+"""Paraphrasing, including long documents split into chunks paraphrased in parallel"""
+
+import asyncio
+import re
+
+import httpx
+from django.conf import settings
+
+from . import features, openrouter, resilience, response_cache, similarity_cache, singleflight
+from .history import estimate_tokens
+
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _pieces(text, max_tokens):
+    """(separator, piece, tokens) in order: paragraphs, or their sentences (or word runs) when too long"""
+    for paragraph in _PARAGRAPH_RE.split(text.strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        separator = "\n\n"
+        tokens = estimate_tokens(paragraph)
+        if tokens <= max_tokens:
+            yield separator, paragraph, tokens
+            continue
+
+        for sentence in _SENTENCE_RE.split(paragraph):
+            tokens = estimate_tokens(sentence)
+            if tokens <= max_tokens:
+                yield separator, sentence, tokens
+                separator = " "
+                continue
+            # A single overlong sentence is cut between words
+            words, size = [], 0
+            for word in sentence.split():
+                word_tokens = estimate_tokens(word)
+                if words and size + word_tokens > max_tokens:
+                    yield separator, " ".join(words), size
+                    separator = " "
+                    words, size = [], 0
+                words.append(word)
+                size += word_tokens
+            if words:
+                yield separator, " ".join(words), size
+                separator = " "
+
+
+def split_chunks(text, max_tokens):
+    """[(separator, chunk)] of at most about `max_tokens` each, cut at paragraph, then sentence, then word boundaries
+
+    Joining every separator and chunk in order gives back the text with its
+    paragraph breaks (whitespace inside paragraphs is normalised to one space).
+    """
+    chunks = []
+    size = 0
+    for separator, piece, tokens in _pieces(text, max_tokens):
+        if chunks and size + tokens <= max_tokens:
+            chunks[-1][1] += separator + piece
+            size += tokens
+        else:
+            chunks.append([separator, piece])
+            size = tokens
+    if chunks:
+        chunks[0][0] = ""
+    return [tuple(chunk) for chunk in chunks]
+
+
+def assemble(chunks, results):
+    """Paraphrased document in the original order; chunks that failed keep their original text"""
+    return "".join(
+        separator + results.get(index, {}).get("text", chunk)
+        for index, (separator, chunk) in enumerate(chunks)
+    )
+
+
+async def aparaphrase(text, api_key):
+    """Paraphrase one text through the response cache, the near-duplicate cache and request coalescing
+
+    Raises openrouter.OpenRouterError when OpenRouter answers with an error.
+    """
+    payload = features.get_feature("paraphraser").build(text=text)
+
+    cache_key = response_cache.make_key("paraphraser", payload)
+    cached = await response_cache.aget("paraphraser", cache_key)
+    if cached is not None:
+        return cached
+
+    similar = similarity_cache.lookup("paraphraser", payload, text)
+    if similar is not None:
+        return similar
+
+    response = await singleflight.do(
+        "paraphraser", cache_key, lambda: resilience.achat_completion("paraphraser", payload, api_key)
+    )
+    if response.status_code != 200:
+        raise openrouter.OpenRouterError(response.status_code, response.text)
+
+    paraphrased = response.json()["choices"][0]["message"]["content"]
+    await response_cache.aset(cache_key, paraphrased)
+    similarity_cache.store("paraphraser", payload, text, paraphrased)
+    return paraphrased
+
+
+async def aparaphrase_chunks(chunks, api_key):
+    """Yield {"index", "separator", "text"} (or "error") per chunk in completion order,
+    at most PARAPHRASER_CHUNK_CONCURRENCY upstream calls at once"""
+    slots = asyncio.Semaphore(settings.PARAPHRASER_CHUNK_CONCURRENCY)
+
+    async def one(index, separator, chunk):
+        async with slots:
+            try:
+                return {"index": index, "separator": separator, "text": await aparaphrase(chunk, api_key)}
+            except openrouter.OpenRouterError as e:
+                return {"index": index, "separator": separator, "error": f"API Error: {e.status_code}"}
+            except httpx.HTTPError as e:
+                return {"index": index, "separator": separator, "error": str(e)}
+
+    tasks = [asyncio.create_task(one(index, *chunk)) for index, chunk in enumerate(chunks)]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        # The client went away mid-stream; stop the remaining upstream calls
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,214 @@
+import asyncio
+import contextlib
+import functools
+import math
+import time
+import weakref
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+from . import metrics
+
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# How long a bucket's lock may be held before another process takes over
+LOCK_TIMEOUT = 2
+LOCK_ATTEMPTS = 20
+
+
+def parse_rate(rate):
+    """'30/m' -> (capacity 30, refill 0.5 tokens per second)"""
+    count, period = rate.split("/")
+    return int(count), int(count) / PERIODS[period]
+
+
+def get_cache():
+    return caches[settings.RATELIMIT_CACHE_ALIAS]
+
+
+def client_key(request, user):
+    """Bucket owner: the user when logged in, otherwise the client IP"""
+    if user.is_authenticated:
+        return f"user:{user.id}"
+    if settings.RATELIMIT_TRUST_X_FORWARDED_FOR and request.headers.get("X-Forwarded-For"):
+        return "ip:" + request.headers["X-Forwarded-For"].split(",")[0].strip()
+    return "ip:" + request.META.get("REMOTE_ADDR", "")
+
+
+async def atake_token(feature, key):
+    """Take one token from the feature's bucket for `key`; returns 0 if allowed, else seconds until a token is free
+
+    The bucket (tokens, last refill time) lives in the `ratelimit` cache; a short cache.add
+    lock makes the read-modify-write atomic. The default LocMemCache is per process, so
+    each worker counts on its own: quotas only hold across workers when the alias points
+    at a shared backend such as Redis. If the lock stays busy the request is let through
+    rather than failing on limiter contention.
+    """
+    rate = settings.RATE_LIMITS.get(feature)
+    if not rate:
+        return 0
+    capacity, refill = parse_rate(rate)
+    cache = get_cache()
+    bucket_key = f"rl:{feature}:{key}"
+    lock_key = f"{bucket_key}:lock"
+
+    for _ in range(LOCK_ATTEMPTS):
+        if await cache.aadd(lock_key, 1, LOCK_TIMEOUT):
+            break
+        await asyncio.sleep(0.005)
+    else:
+        return 0
+
+    try:
+        now = time.time()
+        tokens, updated = await cache.aget(bucket_key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        if tokens < 1:
+            return (1 - tokens) / refill
+        # Idle buckets expire once they would have refilled completely
+        await cache.aset(bucket_key, (tokens - 1, now), math.ceil(capacity / refill) + 1)
+        return 0
+    finally:
+        await cache.adelete(lock_key)
+
+
+class AdmissionControl:
+    """Caps in-flight upstream calls per process; a bounded number of calls may wait for a slot
+
+    A released slot is handed straight to the oldest waiter, so waiters are served
+    in order and newcomers cannot jump the queue.
+    """
+
+    def __init__(self, loop, max_in_flight, max_queue, queue_timeout):
+        self.loop = loop
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = deque()
+
+    def try_acquire(self):
+        """Take a slot only if one is free right now"""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return True
+        return False
+
+    def saturated(self):
+        """True when a new call would be turned away: every slot busy and the queue full"""
+        return self.in_flight >= self.max_in_flight and len(self._waiters) >= self.max_queue
+
+    async def acquire(self):
+        """True once a slot is held; False if the queue is full or the wait timed out"""
+        if self.try_acquire():
+            return True
+        if len(self._waiters) >= self.max_queue:
+            return False
+
+        waiter = self.loop.create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                self.release()  # A slot arrived just as we gave up; pass it on
+            return False
+
+    def release(self):
+        """Free a slot; safe to call from any thread"""
+        try:
+            on_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            on_loop = False
+        if not on_loop:
+            self.loop.call_soon_threadsafe(self.release)
+            return
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # The slot moves to the waiter; in_flight is unchanged
+                return
+        self.in_flight -= 1
+
+
+_admission = weakref.WeakKeyDictionary()
+
+
+def get_admission():
+    """AdmissionControl for the running event loop (asyncio primitives are loop-bound)"""
+    loop = asyncio.get_running_loop()
+    admission = _admission.get(loop)
+    if admission is None:
+        admission = AdmissionControl(
+            loop, settings.UPSTREAM_MAX_IN_FLIGHT, settings.UPSTREAM_MAX_QUEUE, settings.UPSTREAM_QUEUE_TIMEOUT
+        )
+        _admission[loop] = admission
+    return admission
+
+
+class Overloaded(Exception):
+    """No upstream slot came free in time"""
+
+
+@contextlib.asynccontextmanager
+async def upstream_slot(wait=True):
+    """Hold one of the process's upstream slots for one OpenRouter call (its retries included)
+
+    Raises Overloaded when the queue is full or the wait times out, or at once
+    without `wait` when no slot is free.
+    """
+    if not settings.RATELIMIT_ENABLED:
+        yield
+        return
+    admission = get_admission()
+    if not (await admission.acquire() if wait else admission.try_acquire()):
+        raise Overloaded
+    try:
+        yield
+    finally:
+        admission.release()
+
+
+def _too_many(feature, reason, message, retry_after):
+    metrics.rate_limited.inc(feature=feature, reason=reason)
+    response = JsonResponse({"error": message}, status=429)
+    response["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def rate_limit(feature, admission_control=True):
+    """Per-client token bucket for `feature`; with admission control, also turn the request away
+    up front when this process has no upstream capacity left
+
+    The slots themselves are taken per upstream call (see upstream_slot), so a
+    request that fans out into many calls holds as many slots. Only POSTs are
+    charged: the wrapped views turn other methods away without calling upstream.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not settings.RATELIMIT_ENABLED or request.method != "POST":
+                return await view(request, *args, **kwargs)
+
+            user = await request.auser()
+            wait = await atake_token(feature, client_key(request, user))
+            if wait:
+                return _too_many(feature, "quota", "Rate limit exceeded, please slow down", wait)
+
+            if admission_control and get_admission().saturated():
+                return _too_many(
+                    feature, "overload", "AlphaBot is busy, please retry shortly", settings.UPSTREAM_QUEUE_TIMEOUT
+                )
+            return await view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,323 @@
+import asyncio
+import random
+import time
+
+import httpx
+from django.conf import settings
+
+from . import features, metrics, openrouter, ratelimit, routing
+
+
+# Rate limits and upstream/provider failures are worth retrying; other 4xx are not
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """Per-model breaker: opens after consecutive failures, lets one trial call through after the cooldown"""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_cancelled(self):
+        """The call was abandoned before an outcome; free the half-open trial slot"""
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.failures >= self.threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+
+_breakers = {}
+
+
+def get_breaker(model):
+    breaker = _breakers.get(model)
+    if breaker is None:
+        breaker = CircuitBreaker(settings.OPENROUTER_BREAKER_THRESHOLD, settings.OPENROUTER_BREAKER_COOLDOWN)
+        _breakers[model] = breaker
+    return breaker
+
+
+def candidate_models(feature, model, route=None):
+    """(routed, fallbacks): the requested model and its routing peers, fastest healthy first,
+    then the remaining fallbacks in their configured order
+
+    Only the routing peers (OPENROUTER_ROUTING_MODELS) ever take traffic from the
+    requested model while it is healthy; fallbacks, which may be paid models, are
+    only tried after it fails.
+    """
+    registered = features.find_feature(feature)
+    if registered is None:
+        return [model], []
+    routed = routing.rank(route or feature, registered.routed_models(model))
+    return routed, [m for m in registered.candidate_models(model) if m not in routed]
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, honouring a Retry-After header when it fits the cap"""
+    cap = settings.OPENROUTER_BACKOFF_MAX
+    if retry_after:
+        try:
+            return min(float(retry_after), cap)
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, settings.OPENROUTER_BACKOFF_BASE * 2 ** attempt))
+
+
+# Upstream calls shed by admission control (ratelimit.upstream_slot) answer like a provider 429
+OVERLOADED_MESSAGE = "AlphaBot is busy, please retry shortly"
+
+
+def _unavailable_message(feature):
+    return f"All models for {feature} are temporarily unavailable"
+
+
+async def _wait_before_retry(attempt, response, deadline):
+    """Sleep before the next attempt; False if that would overrun the request's retry deadline"""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    delay = backoff_delay(attempt, retry_after)
+    if time.monotonic() + delay > deadline:
+        return False
+    await asyncio.sleep(delay)
+    return True
+
+
+async def _attempt(feature, payload, model, api_key, extra_headers):
+    """One upstream call to `model`, timed into the routing window; returns the response or raises"""
+    started = time.monotonic()
+    ok = False
+    try:
+        response = await openrouter.achat_completion(feature, dict(payload, model=model), api_key, extra_headers)
+        ok = response.status_code not in RETRYABLE_STATUSES
+        return response
+    except asyncio.CancelledError:
+        # A hedge that lost the race or a client that went away: the call has no
+        # outcome, and its cut-short time would flatter a slow model
+        ok = None
+        raise
+    finally:
+        if ok is not None:
+            routing.record(feature, model, time.monotonic() - started, ok)
+
+
+async def _acall(feature, payload, model, api_key, extra_headers):
+    """_attempt() behind the model's breaker; None when the model is unavailable or failed retryably"""
+    breaker = get_breaker(model)
+    if not breaker.allow():
+        return None
+    try:
+        response = await _attempt(feature, payload, model, api_key, extra_headers)
+    except httpx.TransportError:
+        breaker.record_failure()
+        return None
+    except asyncio.CancelledError:
+        breaker.record_cancelled()
+        raise
+    if response.status_code in RETRYABLE_STATUSES:
+        breaker.record_failure()
+        return None
+    breaker.record_success()
+    return response
+
+
+async def _ahedged(feature, payload, api_key, extra_headers, models):
+    """Call the best model and, if it hasn't answered by its p95 latency, race the next one too
+
+    Returns the first usable response, or None when hedging doesn't apply or both
+    calls failed (the caller then goes through the normal retry loop). The second
+    call needs an upstream slot of its own; without a free one the first call is
+    simply awaited.
+    """
+    delay = routing.hedge_delay(feature, models[0])
+    if delay is None or len(models) < 2:
+        return None
+
+    first = asyncio.create_task(_acall(feature, payload, models[0], api_key, extra_headers))
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        try:
+            async with ratelimit.upstream_slot(wait=False):
+                return await _arace(feature, payload, api_key, extra_headers, models, first)
+        except ratelimit.Overloaded:
+            return await first
+    finally:
+        first.cancel()
+
+
+async def _arace(feature, payload, api_key, extra_headers, models, first):
+    """The first usable response of `first` and a hedged call to the next model"""
+    second = asyncio.create_task(_acall(feature, payload, models[1], api_key, extra_headers))
+    pending = {first, second}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.result() is not None:
+                    metrics.hedged_requests.inc(feature=feature, winner="primary" if task is first else "hedge")
+                    return task.result()
+        metrics.hedged_requests.inc(feature=feature, winner="none")
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def achat_completion(feature, payload, api_key, extra_headers=None):
+    """openrouter.achat_completion() with latency-aware model routing, optional hedging,
+    retries, per-model circuit breakers and model fallback
+
+    Each call holds an upstream slot; when none comes free the answer is a 429.
+    """
+    try:
+        async with ratelimit.upstream_slot():
+            return await _achat_completion(feature, payload, api_key, extra_headers)
+    except ratelimit.Overloaded:
+        metrics.rate_limited.inc(feature=feature, reason="overload")
+        return httpx.Response(429, json={"error": {"message": OVERLOADED_MESSAGE}})
+
+
+async def _achat_completion(feature, payload, api_key, extra_headers):
+    deadline = time.monotonic() + settings.OPENROUTER_RETRY_DEADLINE
+    last_response = None
+    last_error = None
+    routed, fallbacks = candidate_models(feature, payload["model"])
+
+    if settings.OPENROUTER_HEDGE_REQUESTS:
+        # Hedges only go to routing peers, never to a fallback
+        response = await _ahedged(feature, payload, api_key, extra_headers, routed)
+        if response is not None:
+            return response
+
+    for model in routed + fallbacks:
+        breaker = get_breaker(model)
+        for attempt in range(settings.OPENROUTER_MAX_RETRIES + 1):
+            if not breaker.allow():
+                break  # Fail fast to the next model
+
+            response = None
+            try:
+                response = await _attempt(feature, payload, model, api_key, extra_headers)
+            except httpx.TransportError as e:
+                last_error = e
+            except asyncio.CancelledError:
+                breaker.record_cancelled()
+                raise
+            else:
+                last_response, last_error = response, None
+                if response.status_code not in RETRYABLE_STATUSES:
+                    breaker.record_success()  # The model answered; a 4xx is our request's fault
+                    return response
+
+            breaker.record_failure()
+            if attempt == settings.OPENROUTER_MAX_RETRIES:
+                break
+            if not await _wait_before_retry(attempt, response, deadline):
+                return _give_up(feature, last_response, last_error)
+
+    return _give_up(feature, last_response, last_error)
+
+
+def _give_up(feature, last_response, last_error):
+    if last_error is not None:
+        raise last_error
+    if last_response is not None:
+        return last_response
+    return httpx.Response(503, json={"error": {"message": _unavailable_message(feature)}})
+
+
+async def astream_chat_completion(feature, payload, api_key, extra_headers=None):
+    """Streaming variant: retries and falls back only until the first delta has arrived
+
+    The upstream slot is held until the stream ends.
+    """
+    try:
+        async with ratelimit.upstream_slot():
+            async for delta in _astream_chat_completion(feature, payload, api_key, extra_headers):
+                yield delta
+    except ratelimit.Overloaded:
+        metrics.rate_limited.inc(feature=feature, reason="overload")
+        raise openrouter.OpenRouterError(429, OVERLOADED_MESSAGE)
+
+
+async def _astream_chat_completion(feature, payload, api_key, extra_headers):
+    deadline = time.monotonic() + settings.OPENROUTER_RETRY_DEADLINE
+    last_error = openrouter.OpenRouterError(503, _unavailable_message(feature))
+
+    # Streams are ranked by time to first delta, kept apart from full-reply latencies
+    route = f"{feature}/stream"
+
+    routed, fallbacks = candidate_models(feature, payload["model"], route)
+    for model in routed + fallbacks:
+        breaker = get_breaker(model)
+        for attempt in range(settings.OPENROUTER_MAX_RETRIES + 1):
+            if not breaker.allow():
+                break
+
+            response = None
+            started = time.monotonic()
+            stream = openrouter.astream_chat_completion(feature, dict(payload, model=model), api_key, extra_headers)
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                routing.record(route, model, time.monotonic() - started, True)
+                breaker.record_success()
+                return
+            except openrouter.OpenRouterError as e:
+                last_error = e
+                routing.record(route, model, time.monotonic() - started, e.status_code not in RETRYABLE_STATUSES)
+                if e.status_code not in RETRYABLE_STATUSES:
+                    breaker.record_success()
+                    raise
+                response = httpx.Response(e.status_code, text=e.text)
+            except httpx.TransportError as e:
+                last_error = e
+                routing.record(route, model, time.monotonic() - started, False)
+            except asyncio.CancelledError:
+                breaker.record_cancelled()
+                raise
+            else:
+                # Once output has reached the client, later failures are not retried
+                routing.record(route, model, time.monotonic() - started, True)
+                breaker.record_success()
+                yield first
+                async for delta in stream:
+                    yield delta
+                return
+
+            breaker.record_failure()
+            if attempt == settings.OPENROUTER_MAX_RETRIES:
+                break
+            if not await _wait_before_retry(attempt, response, deadline):
+                raise last_error
+
+    raise last_error
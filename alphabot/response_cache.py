@@ -0,0 +1,64 @@
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def get_cache():
+    """The Django cache alias that stores generated responses (see CACHES["responses"])"""
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def normalize(text, casefold=False):
+    """Collapse whitespace (and optionally case) so trivially different inputs share a key"""
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return text.casefold() if casefold else text
+
+
+def make_key(feature, payload, casefold=False):
+    """Hash of the model, sampling options and normalized messages of an OpenRouter payload"""
+    normalized = dict(payload)
+    normalized["messages"] = [
+        {"role": m["role"], "content": normalize(m["content"], casefold)}
+        for m in payload["messages"]
+    ]
+    digest = hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+    return f"response:{feature}:{digest}"
+
+
+async def aget(feature, key):
+    """Return the cached response text or None, counting the hit or miss"""
+    cache = get_cache()
+    value = await cache.aget(key)
+    await _incr(cache, f"stats:{feature}:{'hit' if value is not None else 'miss'}")
+    return value
+
+
+async def aset(key, value):
+    await get_cache().aset(key, value, timeout=settings.RESPONSE_CACHE_TTL)
+
+
+async def _incr(cache, counter):
+    # add() is a no-op when the counter exists, so concurrent first hits don't reset it
+    await cache.aadd(counter, 0, timeout=None)
+    try:
+        await cache.aincr(counter)
+    except ValueError:
+        # Counter was evicted between add() and incr()
+        await cache.aset(counter, 1, timeout=None)
+
+
+def stats(features=("paraphraser", "content", "script")):
+    """Hit/miss counters per feature"""
+    cache = get_cache()
+    result = {}
+    for feature in features:
+        hits = cache.get(f"stats:{feature}:hit", 0)
+        misses = cache.get(f"stats:{feature}:miss", 0)
+        result[feature] = {"hits": hits, "misses": misses}
+    return result
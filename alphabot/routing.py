@@ -0,0 +1,108 @@
+"""Latency-aware model routing
+
+Every upstream attempt records its latency and outcome in a sliding window per
+route (feature, or feature/stream) and model. rank() orders a feature's primary
+model and its routing peers (OPENROUTER_ROUTING_MODELS) so the fastest healthy
+one is tried first; hedge_delay() gives the p95 after which a hedged request
+fires. Fallback models are not ranked: they keep their configured order.
+"""
+
+import math
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+class ModelWindow:
+    """Latency and outcome of a model's recent calls, kept for `window` seconds"""
+
+    def __init__(self, window, max_samples=1000):
+        self.window = window
+        self._samples = deque(maxlen=max_samples)  # (finished at, seconds, ok)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds, ok))
+
+    def stats(self):
+        """(sample count, error rate, p50, p95) over the window; percentiles of successful calls, None without any"""
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            samples = list(self._samples)
+        if not samples:
+            return 0, 0.0, None, None
+        latencies = sorted(seconds for _, seconds, ok in samples if ok)
+        error_rate = 1 - len(latencies) / len(samples)
+        return len(samples), error_rate, percentile(latencies, 50), percentile(latencies, 95)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list; None when empty"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+_windows = {}
+_windows_lock = threading.Lock()
+
+
+def get_window(route, model):
+    window = _windows.get((route, model))
+    if window is None:
+        with _windows_lock:
+            window = _windows.setdefault((route, model), ModelWindow(settings.OPENROUTER_ROUTING_WINDOW))
+    return window
+
+
+def record(route, model, seconds, ok):
+    get_window(route, model).record(seconds, ok)
+
+
+def rank(route, models):
+    """`models` reordered fastest healthy first
+
+    Models with too few recent samples keep their configured order after the
+    measured healthy ones, and one of them is occasionally moved to the front so
+    it gets measured. Models over the error-rate limit go last.
+    """
+    if not settings.OPENROUTER_ADAPTIVE_ROUTING or len(models) < 2:
+        return list(models)
+
+    healthy, unknown, unhealthy = [], [], []
+    for model in models:
+        count, error_rate, p50, _ = get_window(route, model).stats()
+        if count < settings.OPENROUTER_ROUTING_MIN_SAMPLES:
+            unknown.append(model)
+        elif error_rate > settings.OPENROUTER_ROUTING_MAX_ERROR_RATE or p50 is None:
+            unhealthy.append((error_rate, model))
+        else:
+            healthy.append((p50, model))
+
+    ranked = [model for _, model in sorted(healthy, key=lambda item: item[0])]
+    if ranked and unknown and random.random() < settings.OPENROUTER_ROUTING_EXPLORE_RATE:
+        ranked.insert(0, unknown.pop(0))
+    ranked.extend(unknown)
+    ranked.extend(model for _, model in sorted(unhealthy, key=lambda item: item[0]))
+    return ranked
+
+
+def hedge_delay(route, model):
+    """Seconds to wait for `model` before hedging: its p95, or None until enough calls are measured"""
+    count, _, _, p95 = get_window(route, model).stats()
+    if count < settings.OPENROUTER_ROUTING_MIN_SAMPLES:
+        return None
+    return p95
+
+
+def snapshot():
+    """{(route, model): (count, error rate, p50, p95)} for /metrics"""
+    with _windows_lock:
+        windows = dict(_windows)
+    return {key: window.stats() for key, window in sorted(windows.items())}
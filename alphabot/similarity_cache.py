@@ -0,0 +1,175 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .response_cache import normalize
+
+
+SHINGLE_SIZE = 5  # Character n-gram length (on UTF-8 bytes)
+_PRIME = (1 << 31) - 1
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHINGLE_POWERS = np.array([pow(257, i, 1 << 32) for i in range(SHINGLE_SIZE)], dtype=np.uint64)
+
+
+class SimilarityCache:
+    """In-process MinHash/LSH index serving stored responses for near-duplicate inputs"""
+
+    def __init__(self, num_perm=64, bands=16, max_entries=200_000, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)[:, None]
+
+        # Signatures live in one growable array indexed by slot; freed slots are reused
+        self._signatures = np.zeros((1024, num_perm), dtype=np.uint32)
+        self._values = []
+        self._slot_keys = []
+        self._free_slots = []
+        self._lru = OrderedDict()  # (namespace, fingerprint digest) -> slot, oldest first
+        # LSH buckets: lookups only compare against entries sharing at least one band
+        self._buckets = {}  # (namespace, band, band bytes) -> set of slots
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def signature(self, text):
+        """MinHash signature (uint32 array of length num_perm) of a normalized text"""
+        data = np.frombuffer(normalize(text, casefold=True).encode(), dtype=np.uint8).astype(np.uint64)
+        if len(data) < SHINGLE_SIZE:
+            data = np.pad(data, (0, SHINGLE_SIZE - len(data)))
+
+        windows = np.lib.stride_tricks.sliding_window_view(data, SHINGLE_SIZE)
+        shingles = np.unique((windows * _SHINGLE_POWERS).sum(axis=1) & _MASK32)
+        return ((self._a * shingles[None, :] + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, namespace, signature):
+        return [
+            (namespace, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def lookup(self, namespace, text, threshold):
+        """Stored value for the most similar input above the threshold, or None"""
+        signature = self.signature(text)
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(namespace, signature):
+                candidates.update(self._buckets.get(key, ()))
+
+            if not candidates:
+                self.misses += 1
+                return None
+
+            slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarity = (self._signatures[slots] == signature).mean(axis=1)
+            best = int(similarity.argmax())
+            if similarity[best] < threshold:
+                self.misses += 1
+                return None
+
+            slot = int(slots[best])
+            self._lru.move_to_end(self._slot_keys[slot])
+            self.hits += 1
+            return self._values[slot]
+
+    def store(self, namespace, text, value):
+        signature = self.signature(text)
+        key = (namespace, hashlib.sha256(signature.tobytes()).digest())
+        with self._lock:
+            if key in self._lru:
+                slot = self._lru[key]
+                self._values[slot] = value
+                self._lru.move_to_end(key)
+                return
+
+            if len(self._lru) >= self.max_entries:
+                self._evict_oldest()
+            slot = self._allocate_slot()
+
+            self._signatures[slot] = signature
+            self._values[slot] = value
+            self._slot_keys[slot] = key
+            self._lru[key] = slot
+            for band_key in self._band_keys(namespace, signature):
+                self._buckets.setdefault(band_key, set()).add(slot)
+
+    def _allocate_slot(self):
+        if self._free_slots:
+            return self._free_slots.pop()
+
+        slot = len(self._values)
+        if slot >= len(self._signatures):
+            grown = np.zeros((len(self._signatures) * 2, self.num_perm), dtype=np.uint32)
+            grown[:slot] = self._signatures
+            self._signatures = grown
+        self._values.append(None)
+        self._slot_keys.append(None)
+        return slot
+
+    def _evict_oldest(self):
+        key, slot = self._lru.popitem(last=False)
+        for band_key in self._band_keys(key[0], self._signatures[slot]):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(slot)
+                if not bucket:
+                    del self._buckets[band_key]
+        self._values[slot] = None
+        self._slot_keys[slot] = None
+        self._free_slots.append(slot)
+
+    def __len__(self):
+        return len(self._lru)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_similarity_cache():
+    """Process-wide similarity cache built from settings on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SimilarityCache(
+                    num_perm=settings.SIMILARITY_CACHE_NUM_PERM,
+                    bands=settings.SIMILARITY_CACHE_BANDS,
+                    max_entries=settings.SIMILARITY_CACHE_MAX_ENTRIES,
+                )
+    return _cache
+
+
+def namespace(feature, payload, user_content):
+    """Entries are only shared between requests with the same model, options and prompt template"""
+    template = dict(payload)
+    template["messages"] = [
+        {"role": m["role"], "content": m["content"].replace(user_content, "")}
+        for m in payload["messages"]
+    ]
+    digest = hashlib.sha256(json.dumps(template, sort_keys=True).encode()).hexdigest()
+    return f"{feature}:{digest}"
+
+
+def lookup(feature, payload, user_content):
+    if not settings.SIMILARITY_CACHE_ENABLED:
+        return None
+    return get_similarity_cache().lookup(
+        namespace(feature, payload, user_content), user_content, settings.SIMILARITY_CACHE_THRESHOLD
+    )
+
+
+def store(feature, payload, user_content, value):
+    if settings.SIMILARITY_CACHE_ENABLED:
+        get_similarity_cache().store(namespace(feature, payload, user_content), user_content, value)
@@ -0,0 +1,34 @@
+import asyncio
+import weakref
+from collections import Counter
+
+
+# Tasks can only be awaited on their own event loop, so in-flight calls are tracked per loop
+_in_flight = weakref.WeakKeyDictionary()
+
+# Per-feature counts of upstream calls made and of requests that joined one already in flight
+calls = Counter()
+collapsed = Counter()
+
+
+async def do(feature, key, func):
+    """Await func() once for all concurrent callers with the same key and share its result"""
+    tasks = _in_flight.setdefault(asyncio.get_running_loop(), {})
+    task = tasks.get(key)
+    if task is None:
+        # Run as its own task so a disconnecting first caller doesn't cancel it for the rest
+        task = asyncio.ensure_future(func())
+        tasks[key] = task
+        task.add_done_callback(lambda _: tasks.pop(key, None))
+        calls[feature] += 1
+    else:
+        collapsed[feature] += 1
+    return await asyncio.shield(task)
+
+
+def stats():
+    """Upstream calls made and requests collapsed into them, per feature"""
+    return {
+        feature: {"calls": calls[feature], "collapsed": collapsed[feature]}
+        for feature in calls.keys() | collapsed.keys()
+    }
@@ -4,7 +4,7 @@ document.addEventListener("DOMContentLoaded", async () => {
     const userMessageInput = document.getElementById("chat-user-message");
     const resetBtn = document.getElementById("reset-btn");
   
-    function appendMessage(sender, text, isMarkdown = false) {
+    function buildMessage(sender, text, isMarkdown = false) {
         const div = document.createElement("div");
         div.className = `mb-2 ${sender === "user" ? "text-end" : "text-start"}`;
         if (isMarkdown && sender === "AlphaBot") {
@@ -12,7 +12,11 @@ document.addEventListener("DOMContentLoaded", async () => {
         } else {
             div.innerHTML = `<span class="badge bg-${sender === "user" ? "primary" : "secondary"}">${sender}:</span> ${text}`;
         }
-        chatBox.appendChild(div);
+        return div;
+    }
+
+    function appendMessage(sender, text, isMarkdown = false) {
+        chatBox.appendChild(buildMessage(sender, text, isMarkdown));
         chatBox.scrollTop = chatBox.scrollHeight;
     }
   
@@ -33,17 +37,44 @@ document.addEventListener("DOMContentLoaded", async () => {
     // Greet the user
     appendMessage("AlphaBot", "👋 Hi there! I'm AlphaBot. How can I help you today?", false);
   
-    try {
-        const response = await fetch("/api/chat/history/");
-        const data = await response.json();
-        if (data.history) {
-            data.history.forEach(entry => {
-                appendMessage(entry.sender, entry.text, entry.sender === "AlphaBot");
-            });
+    // History is paginated newest-first; older pages load when scrolled to the top
+    let nextBefore = null;
+    let oldestNode = null;
+    let loadingHistory = false;
+
+    async function loadHistoryPage(before = null) {
+        loadingHistory = true;
+        try {
+            const url = before ? `/api/chat/history/?before=${encodeURIComponent(before)}` : "/api/chat/history/";
+            const response = await fetch(url);
+            const data = await response.json();
+            if (!data.history) return;
+
+            const previousHeight = chatBox.scrollHeight;
+            const nodes = data.history.map(entry => buildMessage(entry.sender, entry.text, entry.sender === "AlphaBot"));
+            nodes.forEach(node => chatBox.insertBefore(node, oldestNode));
+            if (nodes.length) oldestNode = nodes[0];
+            nextBefore = data.next_before;
+
+            if (before) {
+                chatBox.scrollTop += chatBox.scrollHeight - previousHeight;  // Keep the view anchored
+            } else {
+                chatBox.scrollTop = chatBox.scrollHeight;
+            }
+        } catch (err) {
+            console.error("Failed to load chat history:", err);
+        } finally {
+            loadingHistory = false;
         }
-    } catch (err) {
-        console.error("Failed to load chat history:", err);
     }
+
+    await loadHistoryPage();
+
+    chatBox.addEventListener("scroll", () => {
+        if (chatBox.scrollTop < 50 && nextBefore && !loadingHistory) {
+            loadHistoryPage(nextBefore);
+        }
+    });
   
     chatForm.addEventListener("submit", async (e) => {
         e.preventDefault();
@@ -58,17 +89,24 @@ document.addEventListener("DOMContentLoaded", async () => {
             const response = await fetch("/api/chat/", {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ message }),
+                body: JSON.stringify({ message, stream: true }),
             });
-  
-            const data = await response.json();
-            removeTypingIndicator();
-  
-            if (data.response) {
-                appendMessage("AlphaBot", data.response, true);
-            } else {
-                appendMessage("AlphaBot", "Login to use AlphaBot.");
+
+            if (!(response.headers.get("Content-Type") || "").startsWith("text/event-stream")) {
+                const data = await response.json();
+                removeTypingIndicator();
+                appendMessage("AlphaBot", data.response || data.error || "Login to use AlphaBot.", Boolean(data.response));
+                return;
             }
+
+            // Render tokens into the typing bubble as they arrive
+            const typingDiv = document.getElementById("typing-indicator-general");
+            const reply = await readStream(response, (text) => {
+                typingDiv.innerHTML = `<span class="badge bg-secondary">AlphaBot:</span> <div class="markdown">${marked.parse(text)}</div>`;
+                chatBox.scrollTop = chatBox.scrollHeight;
+            });
+            removeTypingIndicator();
+            appendMessage("AlphaBot", reply, true);
         } catch (err) {
             console.error(err);
             removeTypingIndicator();
@@ -82,6 +120,8 @@ document.addEventListener("DOMContentLoaded", async () => {
             const data = await response.json();
             if (data.status) {
                 chatBox.innerHTML = "";
+                nextBefore = null;
+                oldestNode = null;
                 appendMessage("AlphaBot", "Chat memory cleared! ✨ Let's start fresh.");
             }
         } catch (err) {
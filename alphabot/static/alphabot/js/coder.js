@@ -4,7 +4,7 @@ document.addEventListener("DOMContentLoaded", async () => {
   const userMessageInput = document.getElementById("coder-user-message");
   const resetBtn = document.getElementById("reset-btn-coder");
 
-  function appendMessage(sender, text, isMarkdown = false) {
+  function buildMessage(sender, text, isMarkdown = false) {
   const div = document.createElement("div");
   div.className = `mb-3 ${sender === "user" ? "text-end" : "text-start"}`;
 
@@ -41,10 +41,14 @@ document.addEventListener("DOMContentLoaded", async () => {
     div.innerHTML = `<span class="badge bg-${sender === "user" ? "primary" : "secondary"}">${sender}:</span> ${text}`;
   }
 
-  chatBox.appendChild(div);
-  chatBox.scrollTop = chatBox.scrollHeight;
+  return div;
 }
 
+  function appendMessage(sender, text, isMarkdown = false) {
+    chatBox.appendChild(buildMessage(sender, text, isMarkdown));
+    chatBox.scrollTop = chatBox.scrollHeight;
+  }
+
 
   function showTypingIndicator() {
     const typingDiv = document.createElement("div");
@@ -60,18 +64,49 @@ document.addEventListener("DOMContentLoaded", async () => {
     if (typingDiv) typingDiv.remove();
   }
 
-  try {
-    const response = await fetch("/api/coder/chat/history/");
-    const data = await response.json();
-    if (data.history) {
-      data.history.forEach((entry) => {
-        appendMessage(entry.sender, entry.text, entry.sender === "AlphaBot");
-      });
+  // History is paginated newest-first; older pages load when scrolled to the top
+  let nextBefore = null;
+  let oldestNode = null;
+  let loadingHistory = false;
+
+  async function loadHistoryPage(before = null) {
+    loadingHistory = true;
+    try {
+      const url = before
+        ? `/api/coder/chat/history/?before=${encodeURIComponent(before)}`
+        : "/api/coder/chat/history/";
+      const response = await fetch(url);
+      const data = await response.json();
+      if (!data.history) return;
+
+      const previousHeight = chatBox.scrollHeight;
+      const nodes = data.history.map((entry) =>
+        buildMessage(entry.sender, entry.text, entry.sender === "AlphaBot")
+      );
+      nodes.forEach((node) => chatBox.insertBefore(node, oldestNode));
+      if (nodes.length) oldestNode = nodes[0];
+      nextBefore = data.next_before;
+
+      if (before) {
+        chatBox.scrollTop += chatBox.scrollHeight - previousHeight; // Keep the view anchored
+      } else {
+        chatBox.scrollTop = chatBox.scrollHeight;
+      }
+    } catch (err) {
+      console.error("Failed to load chat history:", err);
+    } finally {
+      loadingHistory = false;
     }
-  } catch (err) {
-    console.error("Failed to load chat history:", err);
   }
 
+  await loadHistoryPage();
+
+  chatBox.addEventListener("scroll", () => {
+    if (chatBox.scrollTop < 50 && nextBefore && !loadingHistory) {
+      loadHistoryPage(nextBefore);
+    }
+  });
+
   chatForm.addEventListener("submit", async (e) => {
     e.preventDefault();
     const message = userMessageInput.value.trim();
@@ -88,17 +123,24 @@ document.addEventListener("DOMContentLoaded", async () => {
         headers: {
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ message }),
+        body: JSON.stringify({ message, stream: true }),
       });
 
-      const data = await response.json();
-      removeTypingIndicator();
-
-      if (data.response) {
-        appendMessage("AlphaBot", data.response, true);
-      } else {
-        appendMessage("AlphaBot", "❌ Login required.");
+      if (!(response.headers.get("Content-Type") || "").startsWith("text/event-stream")) {
+        const data = await response.json();
+        removeTypingIndicator();
+        appendMessage("AlphaBot", data.response || data.error || "❌ Login required.", Boolean(data.response));
+        return;
       }
+
+      // Render tokens into the typing bubble; copy buttons are added once complete
+      const typingDiv = document.getElementById("typing-indicator-coder");
+      const reply = await readStream(response, (text) => {
+        typingDiv.innerHTML = `<span class="badge bg-secondary">AlphaBot:</span> <div>${marked.parse(text)}</div>`;
+        chatBox.scrollTop = chatBox.scrollHeight;
+      });
+      removeTypingIndicator();
+      appendMessage("AlphaBot", reply, true);
     } catch (err) {
       console.error(err);
       removeTypingIndicator();
@@ -114,6 +156,8 @@ document.addEventListener("DOMContentLoaded", async () => {
       const data = await response.json();
       if (data.status) {
         chatBox.innerHTML = "";
+        nextBefore = null;
+        oldestNode = null;
         appendMessage("AlphaBot", "🧹 Chat reset. Let’s start fresh!");
       }
     } catch (err) {
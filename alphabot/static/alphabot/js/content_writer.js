@@ -1,5 +1,27 @@
+// Long-form articles stream as SSE: the outline first, then each section in order
+async function readArticle(response, outputBox, loading) {
+  let markdown = "";
+
+  await readEvents(response, (event, data) => {
+      if (event === "outline") {
+          markdown = `# ${data.title}\n\n`;
+          const outline = data.sections.map(heading => `- ${heading}`).join("\n");
+          outputBox.innerHTML = marked.parse(markdown + outline);
+      } else if (event === "section") {
+          loading.style.display = "none";
+          markdown += data.markdown;
+          outputBox.innerHTML = marked.parse(markdown);
+      } else if (event === "done") {
+          outputBox.innerHTML = marked.parse(data.response);
+      } else if (event === "error") {
+          throw new Error(data.error);
+      }
+  });
+}
+
 document.getElementById("generate-content").addEventListener("click", () => {
   const topic = document.getElementById("topic-input").value.trim();
+  const longForm = document.getElementById("long-form").checked;
   const outputBox = document.getElementById("generated-content");
   const loading = document.getElementById("loading");
 
@@ -17,11 +39,17 @@ document.getElementById("generate-content").addEventListener("click", () => {
           "Content-Type": "application/json",
           "X-CSRFToken": getCookie("csrftoken")
       },
-      body: JSON.stringify({ topic: topic })
+      body: JSON.stringify(longForm ? { topic: topic, long: true, stream: true } : { topic: topic })
+  })
+  .then(res => {
+      if ((res.headers.get("Content-Type") || "").startsWith("text/event-stream")) {
+          return readArticle(res, outputBox, loading).then(() => null);
+      }
+      return res.json();
   })
-  .then(res => res.json())
   .then(data => {
       loading.style.display = "none";
+      if (data === null) return;
       if (data.response) {
           outputBox.innerHTML = marked.parse(data.response);
 
@@ -5,6 +5,8 @@ document.addEventListener("DOMContentLoaded", () => {
   const output = document.getElementById("cv-output");
   const progressBar = document.getElementById("progress-bar");
   let currentStep = 0;
+  // Stored CV from the last generation; resubmitting edits only rewrites the changed sections
+  let currentCvId = null;
 
   // Initialize animation library
   function animateStep(direction) {
@@ -124,6 +126,76 @@ document.addEventListener("DOMContentLoaded", () => {
       }
   }
 
+  // Resolve with the finished job: SSE push first, polling if the stream is unavailable
+  function waitForJob(job) {
+      return new Promise((resolve, reject) => {
+          if (!window.EventSource) {
+              pollJob(job.status_url).then(resolve, reject);
+              return;
+          }
+
+          const source = new EventSource(job.events_url);
+          const finish = (e) => {
+              source.close();
+              resolve(JSON.parse(e.data));
+          };
+          source.addEventListener("done", finish);
+          source.addEventListener("failed", finish);
+          source.addEventListener("status", (e) => {
+              if (JSON.parse(e.data).status === "running") {
+                  output.innerHTML = `<div class="alert alert-info">
+                      <i class="fas fa-spinner fa-spin"></i> Writing your CV...
+                  </div>`;
+              }
+          });
+          const fallBack = () => {
+              source.close();
+              pollJob(job.status_url).then(resolve, reject);
+          };
+          source.addEventListener("timeout", fallBack);
+          source.onerror = fallBack;
+      });
+  }
+
+  async function pollJob(statusUrl) {
+      while (true) {
+          const response = await fetch(statusUrl);
+          const result = await response.json();
+          if (!response.ok) {
+              throw new Error(result.error || `HTTP error! status: ${response.status}`);
+          }
+          if (result.status === "done" || result.status === "failed") {
+              return result;
+          }
+          await new Promise(resolve => setTimeout(resolve, 2000));
+      }
+  }
+
+  function showResult(result) {
+      // Display AI-optimized CV
+      if (result.cv) {
+          // If it looks like HTML, render as HTML, else parse as Markdown
+          if (result.cv.trim().startsWith("<")) {
+              output.innerHTML = result.cv;
+          } else {
+              output.innerHTML = marked.parse(result.cv);
+          }
+          document.getElementById("cv-action").style.display = "block";
+      } else {
+          output.innerHTML = `<div class="alert alert-danger">
+              <i class="fas fa-times-circle"></i> Error: CV content is missing from the server response.
+          </div>`;
+      }
+      
+      // Update score with AI-enhanced value
+      document.getElementById("score-value").textContent = result.score || "85";
+      document.getElementById("score-feedback").innerHTML = `
+          <p>AI optimized your CV to <strong>${result.score || "85"}%</strong> effectiveness!</p>
+          <div class="progress">
+              <div class="progress-bar bg-success" style="width: ${result.score || "85"}%"></div>
+          </div>`;
+  }
+
   // Form submission
   form.addEventListener("submit", async (e) => {
       e.preventDefault();
@@ -161,6 +233,9 @@ document.addEventListener("DOMContentLoaded", () => {
               experience: document.getElementById("experience").value.trim(),
               education: document.getElementById("education").value.trim()
           };
+          if (currentCvId) {
+              formData.cv_id = currentCvId;
+          }
 
           // Send to backend for AI optimization
           const response = await fetch("/api/cv/generate/", {
@@ -172,38 +247,21 @@ document.addEventListener("DOMContentLoaded", () => {
               body: JSON.stringify(formData)
           });
 
-          if (!response.ok) {
-              throw new Error(`HTTP error! status: ${response.status}`);
+          const job = await response.json();
+
+          if (!response.ok || job.error) {
+              throw new Error(job.error || `HTTP error! status: ${response.status}`);
           }
 
-          const result = await response.json();
-          
+          // Generation runs on a background worker; wait for the finished job
+          const result = await waitForJob(job);
+
           if (result.error) {
               throw new Error(result.error);
           }
 
-          // Display AI-optimized CV
-          if (result.cv) {
-              // If it looks like HTML, render as HTML, else parse as Markdown
-              if (result.cv.trim().startsWith("<")) {
-                  output.innerHTML = result.cv;
-              } else {
-                  output.innerHTML = marked.parse(result.cv);
-              }
-              document.getElementById("cv-action").style.display = "block";
-          } else {
-              output.innerHTML = `<div class="alert alert-danger">
-                  <i class="fas fa-times-circle"></i> Error: CV content is missing from the server response.
-              </div>`;
-          }
-          
-          // Update score with AI-enhanced value
-          document.getElementById("score-value").textContent = result.score || "85";
-          document.getElementById("score-feedback").innerHTML = `
-              <p>AI optimized your CV to <strong>${result.score || "85"}%</strong> effectiveness!</p>
-              <div class="progress">
-                  <div class="progress-bar bg-success" style="width: ${result.score || "85"}%"></div>
-              </div>`;
+          currentCvId = result.cv_id;
+          showResult(result);
           
       } catch (error) {
           output.innerHTML = `<div class="alert alert-danger">
@@ -5,6 +5,24 @@ document.addEventListener("DOMContentLoaded", function () {
   const resultBox = document.getElementById("paraphrased_result");
   const loadingSpinner = document.getElementById("loading-spinner");
 
+  // Long texts come back as an SSE stream of chunks in completion order;
+  // each one is placed in its slot so the result fills in as chunks finish
+  async function readChunks(response) {
+      let parts = [];
+
+      await readEvents(response, (event, data) => {
+          if (event === "start") {
+              parts = new Array(data.chunks).fill(null);
+          } else if (event === "chunk") {
+              loadingSpinner.style.display = "none";
+              parts[data.index] = data.separator + (data.text || "[This part could not be paraphrased]");
+              resultBox.innerText = parts.map(part => part === null ? " … " : part).join("");
+          } else if (event === "done") {
+              resultBox.innerText = data.response;
+          }
+      });
+  }
+
   form.addEventListener("submit", function (e) {
       e.preventDefault();
 
@@ -20,11 +38,17 @@ document.addEventListener("DOMContentLoaded", function () {
       fetch("/api/paraphraser/", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ message: originalText })
+          body: JSON.stringify({ message: originalText, stream: true })
+      })
+      .then(response => {
+          if ((response.headers.get("Content-Type") || "").startsWith("text/event-stream")) {
+              return readChunks(response).then(() => null);
+          }
+          return response.json();
       })
-      .then(response => response.json())
       .then(data => {
           loadingSpinner.style.display = "none";
+          if (data === null) return;
           if (data.response) {
               resultBox.innerText = data.response;
           } else {
@@ -37,4 +61,4 @@ document.addEventListener("DOMContentLoaded", function () {
           resultBox.innerText = "Something went wrong!";
       });
   });
-});
\ No newline at end of file
+});
@@ -0,0 +1,40 @@
+// Server-Sent Events from the AlphaBot API, shared by the chat, coder, content and paraphraser pages
+
+// Calls onEvent(event, data) for each frame. Resolves with the first value onEvent
+// returns, or undefined once the stream ends; an error thrown by onEvent rejects it
+async function readEvents(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const frames = buffer.split("\n\n");
+    buffer = frames.pop();
+    for (const frame of frames) {
+      const event = (frame.match(/^event: (.*)$/m) || [])[1];
+      const data = JSON.parse((frame.match(/^data: (.*)$/m) || [])[1] || "{}");
+      const result = onEvent(event, data);
+      if (result !== undefined) return result;
+    }
+  }
+}
+
+// Reads a streamed chat reply, calling onDelta with the text so far; resolves with the full reply
+async function readStream(response, onDelta) {
+  let text = "";
+  const reply = await readEvents(response, (event, data) => {
+    if (event === "delta") {
+      text += data.text;
+      onDelta(text);
+    } else if (event === "done") {
+      return data.response;
+    } else if (event === "error") {
+      throw new Error(data.error);
+    }
+  });
+  return reply === undefined ? text : reply;
+}
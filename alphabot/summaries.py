@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import threading
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import OperationalError
+
+from . import archive, features, resilience
+from .models import ConversationSummary, Message
+
+
+logger = logging.getLogger(__name__)
+
+# Attempts at storing a summary while the database is busy (e.g. SQLite's "database is locked")
+SAVE_ATTEMPTS = 3
+SAVE_RETRY_DELAY = 0.2
+
+# Compaction runs as a task on the request's event loop, so the summary request goes
+# through the same client, admission control, retries and fallbacks as every other call
+_tasks = set()
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def schedule_compaction(user_id, chat_type):
+    """Queue a background compaction unless one is already running for this conversation
+
+    Must be called from async code (the AI views); the task outlives the request.
+    """
+    key = (user_id, chat_type)
+    with _in_flight_lock:
+        if key in _in_flight:
+            return
+        _in_flight.add(key)
+    task = asyncio.get_running_loop().create_task(_run_compaction(key))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _run_compaction(key):
+    try:
+        await acompact_conversation(*key)
+    except Exception:
+        logger.exception("Conversation compaction failed for %s", key)
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(key)
+
+
+def _pending(user_id, chat_type):
+    """(stored summary or None, unsummarized (id, sender, text) rows oldest first)"""
+    summary = ConversationSummary.objects.filter(user_id=user_id, chat_type=chat_type).first()
+    after_id = max(summary.last_message_id, summary.cleared_through_id) if summary else 0
+    pending = list(
+        Message.objects.filter(user_id=user_id, chat_type=chat_type, id__gt=after_id)
+        .order_by("id")
+        .values_list("id", "sender", "text")
+    )
+    return summary, pending
+
+
+def _save_summary(user_id, chat_type, text, last_id):
+    # The chat may have been reset while the summary was being written
+    if last_id <= archive.cleared_through(user_id, chat_type) or not Message.objects.filter(id=last_id).exists():
+        return
+    ConversationSummary.objects.update_or_create(
+        user_id=user_id,
+        chat_type=chat_type,
+        defaults={"summary": text, "last_message_id": last_id},
+    )
+
+
+async def acompact_conversation(user_id, chat_type):
+    """Fold the older unsummarized messages into the stored summary once past the threshold"""
+    summary, pending = await sync_to_async(_pending)(user_id, chat_type)
+    if len(pending) <= settings.CHAT_SUMMARY_TRIGGER:
+        return
+
+    # Keep the recent tail verbatim, summarize everything before it
+    older = pending[:-settings.CHAT_SUMMARY_KEEP_RECENT]
+    transcript = "\n".join(f"{sender}: {text}" for _, sender, text in older)
+    previous = summary.summary if summary and summary.summary else "(none)"
+
+    payload = features.get_feature("summary").build(summary=previous, transcript=transcript)
+    try:
+        response = await resilience.achat_completion("summary", payload, settings.OPENROUTER_API_KEY)
+    except httpx.HTTPError as e:
+        logger.warning("Summary request failed: %s", e)
+        return
+    if response.status_code != 200:
+        # Left unsummarized; the next turn schedules another attempt
+        logger.warning("Summary request failed: %s - %s", response.status_code, response.text)
+        return
+
+    text = response.json()["choices"][0]["message"]["content"]
+    for attempt in range(SAVE_ATTEMPTS):
+        try:
+            await sync_to_async(_save_summary)(user_id, chat_type, text, older[-1][0])
+            return
+        except OperationalError:
+            if attempt == SAVE_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(SAVE_RETRY_DELAY * 2 ** attempt)
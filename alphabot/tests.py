@@ -1,3 +1,1022 @@
-from django.test import TestCase
+import asyncio
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import OperationalError
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import (
+    archive, articles, cv_batch, cv_jobs, cv_scoring, cv_sections, features, history, metrics, openrouter, page_cache,
+    paraphrase, ratelimit, resilience, response_cache, routing, similarity_cache, singleflight, summaries, turns,
+)
+from .cv import CVGenerationError, calculate_cv_score, generate_improvement_suggestions
+from .middleware import AsyncWhiteNoiseMiddleware
+from .models import ConversationSummary, CVJob, Message
+
+
+CSV_HEADER = "fullName,email,phone,summary,skills,experience,education,certification\n"
+CSV_ROW = "Ada Lovelace,ada@example.com,07123456789,Analyst,Maths,Engines,Self-taught,AWS\n"
+
+
+class CVBatchCSVTests(SimpleTestCase):
+    def test_valid_rows(self):
+        rows = cv_batch._from_csv(CSV_HEADER + CSV_ROW)
+        self.assertEqual(rows[0]["fullName"], "Ada Lovelace")
+        self.assertEqual(rows[0]["certification"], "AWS")
+
+    def test_blank_optional_cell_is_dropped(self):
+        rows = cv_batch._from_csv(CSV_HEADER + CSV_ROW.replace(",AWS", ", "))
+        self.assertNotIn("certification", rows[0])
+
+    def test_short_row_is_normalised(self):
+        rows = cv_batch._from_csv(CSV_HEADER + "Ada Lovelace,ada@example.com,07123456789\n")
+        self.assertEqual(rows[0]["education"], "")
+        self.assertNotIn("certification", rows[0])
+
+    def test_extra_cells_name_the_row(self):
+        with self.assertRaisesMessage(ValidationError, "CSV row 1"):
+            cv_batch._from_csv(CSV_HEADER + CSV_ROW + CSV_ROW.strip() + ",extra\n")
+
+
+@override_settings(RATELIMIT_ENABLED=False)
+class CVBatchEndpointTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("ada", password="pw"))
+
+    def post_csv(self, body):
+        return self.client.post("/api/cv/batch/", body, content_type="text/csv")
+
+    def test_short_row_is_a_validation_error(self):
+        response = self.post_csv(CSV_HEADER + CSV_ROW + "Ada Lovelace,ada@example.com\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][0]["row"], 1)
+
+    def test_extra_cells_are_rejected(self):
+        response = self.post_csv(CSV_HEADER + CSV_ROW.strip() + ",extra\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("CSV row 0", response.json()["error"])
+
+    def test_non_utf8_csv_is_rejected(self):
+        response = self.post_csv((CSV_HEADER + CSV_ROW.replace("Ada", "Ad\xe9")).encode("latin-1"))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Invalid CSV", response.json()["error"])
+
+    def test_optional_fields_must_be_text_or_null(self):
+        row = dict(zip(CSV_HEADER.strip().split(","), CSV_ROW.strip().split(",")))
+        rows = [{**row, "linkedin": None}, {**row, "github": 5}]
+        self.assertEqual(cv_batch.validate_batch(rows), [{"row": 1, "error": "Field github must be a string"}])
+        self.assertNotIn("linkedin", rows[0])
+
+    def test_a_failing_row_does_not_fail_the_batch(self):
+        result = {"cv": "# Ada", "score": 70, "improvement_suggestions": []}
+        generate = mock.AsyncMock(side_effect=[result, TypeError("boom")])
+        with mock.patch("alphabot.cv_batch.agenerate_cv", generate), self.assertLogs("alphabot.cv_batch", "ERROR"):
+            response = self.post_csv(CSV_HEADER + CSV_ROW + CSV_ROW)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(results[0]["cv"], "# Ada")
+        self.assertEqual(results[1], {"row": 1, "error": "Server error"})
+
+
+@override_settings(CV_JOB_MAX_ATTEMPTS=3, CV_JOB_RETRY_BACKOFF_BASE=10, CV_JOB_RETRY_BACKOFF_MAX=60)
+class CVJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ada", password="pw")
+        self.job = CVJob.objects.create(user=self.user, input_data={"fullName": "Ada"})
+
+    def run_claimed(self, **generate):
+        job = cv_jobs.claim_job("test")
+        with mock.patch("alphabot.cv_jobs.agenerate_cv", **generate):
+            async_to_sync(cv_jobs.run_job)(job)
+        return CVJob.objects.get(id=job.id)
+
+    def test_retry_delay_is_exponential_and_capped(self):
+        self.assertEqual([cv_jobs.retry_delay(n) for n in (1, 2, 3, 4)], [10, 20, 40, 60])
+
+    def test_success_stores_the_cv(self):
+        result = {"cv": "# Ada", "score": 80, "improvement_suggestions": []}
+        job = self.run_claimed(return_value=result)
+        self.assertEqual(job.status, CVJob.DONE)
+        self.assertEqual(job.generated_cv.cv, "# Ada")
+
+    def test_retryable_failure_requeues_with_backoff(self):
+        job = self.run_claimed(side_effect=CVGenerationError("timeout", retryable=True))
+        self.assertEqual(job.status, CVJob.QUEUED)
+        self.assertGreater(job.available_at, timezone.now() + timedelta(seconds=5))
+        # Not due yet, so no worker picks it up again
+        self.assertIsNone(cv_jobs.claim_job("test"))
+
+        CVJob.objects.filter(id=job.id).update(available_at=timezone.now())
+        self.assertEqual(cv_jobs.claim_job("test").attempts, 2)
+
+    def test_retries_stop_at_max_attempts(self):
+        CVJob.objects.filter(id=self.job.id).update(attempts=2)
+        job = self.run_claimed(side_effect=CVGenerationError("timeout", retryable=True))
+        self.assertEqual(job.status, CVJob.FAILED)
+
+    def test_non_retryable_failure_fails_the_job(self):
+        job = self.run_claimed(side_effect=CVGenerationError("bad reply"))
+        self.assertEqual(job.status, CVJob.FAILED)
+        self.assertEqual(job.error, "bad reply")
+
+    @override_settings(CV_JOB_STALE_AFTER=60)
+    def test_stale_jobs_are_requeued(self):
+        cv_jobs.claim_job("test")
+        CVJob.objects.filter(id=self.job.id).update(started_at=timezone.now() - timedelta(seconds=120))
+        cv_jobs.requeue_stale_jobs()
+        self.assertEqual(CVJob.objects.get(id=self.job.id).status, CVJob.QUEUED)
+
+
+class CVScoringTests(SimpleTestCase):
+    ROWS = [
+        {"summary": "s" * 120, "experience": "Ran 3 teams" + "x" * 300, "education": "", "skills": "a, b,,c"},
+        {"summary": "short", "experience": "no numbers", "linkedin": "http://x", "skills": ""},
+        {"summary": "", "experience": "٣ years", "education": "e" * 101},
+    ]
+    TEXTS = ["Achieved targets, LED the team\n\n**Skills**", "I mana ged nothing", "achievedeveloped *x*"]
+
+    def test_batch_matches_the_reference_functions(self):
+        self.assertEqual(
+            cv_scoring.score_batch(self.ROWS, self.TEXTS).tolist(),
+            [calculate_cv_score(row, text) for row, text in zip(self.ROWS, self.TEXTS)],
+        )
+        self.assertEqual(
+            cv_scoring.suggestions_batch(self.ROWS, self.TEXTS),
+            [generate_improvement_suggestions(row, text) for row, text in zip(self.ROWS, self.TEXTS)],
+        )
+
+
+CV_MARKDOWN = """# Ada Lovelace
+ada@example.com
+
+## Professional Summary
+Analyst.
+
+## Work Experience
+### Engineer, Babbage & Co
+Built engines.
+
+## Education
+Self-taught.
+"""
+
+
+class CVSectionsTests(SimpleTestCase):
+    def test_split_sections_keeps_subheadings_in_their_section(self):
+        sections = cv_sections.split_sections(CV_MARKDOWN)
+        self.assertEqual(
+            [heading for heading, _ in sections],
+            [None, "Ada Lovelace", "Professional Summary", "Work Experience", "Education"],
+        )
+        self.assertIn("### Engineer", sections[3][1])
+        self.assertEqual("".join(text for _, text in sections), CV_MARKDOWN)
+
+    def test_split_sections_without_known_headings(self):
+        self.assertEqual(cv_sections.split_sections("# Notes\nhi\n"), [[None, "# Notes\nhi\n"]])
+
+    def test_splice_replaces_only_the_given_sections(self):
+        sections = cv_sections.split_sections(CV_MARKDOWN)
+        spliced = cv_sections.splice(sections, {2: "## Professional Summary\nSenior analyst.\n"})
+        self.assertIn("Senior analyst.\n\n## Work Experience", spliced)
+        self.assertEqual(spliced.replace("Senior analyst.", "Analyst."), CV_MARKDOWN)
+
+    def test_match_rewritten_by_heading_or_field(self):
+        reply = "Here you go:\n\n## Summary\nNew.\n\n## Education & Training\nNew too.\n"
+        rewritten = cv_sections.match_rewritten(reply, ["Professional Summary", "Education"])
+        self.assertEqual(rewritten["Professional Summary"], "## Summary\nNew.\n\n")
+        self.assertTrue(rewritten["Education"].startswith("## Education & Training"))
+
+    def test_match_rewritten_missing_section(self):
+        self.assertIsNone(cv_sections.match_rewritten("## Summary\nNew.\n", ["Summary", "Education"]))
+
+    def test_changed_fields(self):
+        old = {"fullName": "Ada", "summary": "A", "skills": "x", "certification": None}
+        self.assertEqual(cv_sections.changed_fields(old, {**old, "summary": " B "}), ["summary"])
+        self.assertEqual(cv_sections.changed_fields(old, {**old, "certification": "AWS"}), ["certification"])
+        self.assertEqual(cv_sections.changed_fields(old, {**old, "certification": ""}), [])
+        self.assertIsNone(cv_sections.changed_fields(old, {**old, "fullName": "Ada L."}))
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        page_cache.get_cache().clear()
+
+    def page_cache_counts(self):
+        counts = metrics.page_cache.values()
+        return counts.get(("index", "hit"), 0), counts.get(("index", "miss"), 0)
+
+    def test_anonymous_renders_are_cached(self):
+        hits, misses = self.page_cache_counts()
+        first = self.client.get("/")
+        second = self.client.get("/?utm_source=x")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(self.page_cache_counts(), (hits + 1, misses + 1))
+        self.assertIn("Cookie", second["Vary"])
+
+    def test_logged_in_users_skip_the_cache(self):
+        self.client.get("/")
+        hits, misses = self.page_cache_counts()
+        self.client.force_login(User.objects.create_user("ada", password="pw"))
+        response = self.client.get("/")
+        self.assertContains(response, "ada")
+        self.assertEqual(self.page_cache_counts(), (hits, misses))
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        hits, misses = self.page_cache_counts()
+        self.client.get("/")
+        self.client.get("/")
+        self.assertEqual(self.page_cache_counts(), (hits, misses))
+
+
+class AsyncWhiteNoiseTests(SimpleTestCase):
+    @override_settings(WHITENOISE_AUTOREFRESH=True, WHITENOISE_USE_FINDERS=True)
+    async def test_runs_natively_under_asgi(self):
+        async def view(request):
+            return HttpResponse("from the view")
+
+        middleware = AsyncWhiteNoiseMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        factory = AsyncRequestFactory()
+        response = await middleware(factory.get("/api/chat/history/"))
+        self.assertEqual(response.content, b"from the view")
+        response = await middleware(factory.get(settings.STATIC_URL + "alphabot/js/sse.js"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("javascript", response["Content-Type"])
+
+
+class HistoryWindowTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ada", password="pw")
+        self.messages = [
+            Message.objects.create(user=self.user, chat_type="chat", sender=sender, text=f"m{i}")
+            for i, sender in enumerate(["user", "AlphaBot"] * 3)
+        ]
+
+    def test_token_estimate(self):
+        self.assertEqual(history.estimate_tokens("Hello, world!"), 6)
+        self.assertEqual(history.estimate_tokens(""), 0)
+
+    async def test_newest_messages_that_fit_the_budget_oldest_first(self):
+        # "m4" costs one token plus the per-message overhead
+        cost = 1 + history.MESSAGE_OVERHEAD_TOKENS
+        window = await history.build_history(self.user, "chat", token_budget=2 * cost + 1)
+        self.assertEqual(window, [{"role": "user", "content": "m4"}, {"role": "assistant", "content": "m5"}])
+
+    async def test_message_limit(self):
+        window = await history.build_history(self.user, "chat", limit=3, token_budget=1000)
+        self.assertEqual([message["content"] for message in window], ["m3", "m4", "m5"])
+
+    async def test_summary_replaces_the_summarized_messages(self):
+        await ConversationSummary.objects.acreate(
+            user=self.user, chat_type="chat", summary="Earlier", last_message_id=self.messages[3].id
+        )
+        window = await history.build_history(self.user, "chat", token_budget=1000)
+        self.assertEqual(window[0], {"role": "system", "content": "Summary of the earlier conversation:\nEarlier"})
+        self.assertEqual([message["content"] for message in window[1:]], ["m4", "m5"])
+
+
+class WriteBehindTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ada", password="pw")
+
+    def turn(self, chat_type="chat", text="hi"):
+        return turns._turn_messages(self.user, chat_type, text, "reply")
+
+    def wait_for(self, insert, timeout=1):
+        """Give the buffer's background thread time to call the mocked insert"""
+        deadline = time.monotonic() + timeout
+        while not insert.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_flushes_once_the_batch_is_full(self):
+        buffer = turns.WriteBehindBuffer(max_batch=4, interval=3600)
+        with mock.patch("alphabot.turns._insert") as insert:
+            buffer.add(self.turn(text="a"))
+            time.sleep(0.1)
+            insert.assert_not_called()
+            buffer.add(self.turn(text="b"))
+            self.wait_for(insert)
+        insert.assert_called_once()
+        self.assertEqual([message.text for message in insert.call_args.args[0]], ["a", "reply", "b", "reply"])
+
+    def test_flushes_after_the_interval(self):
+        buffer = turns.WriteBehindBuffer(max_batch=100, interval=0.05)
+        with mock.patch("alphabot.turns._insert") as insert:
+            buffer.add(self.turn())
+            self.wait_for(insert)
+        self.assertEqual(len(insert.call_args.args[0]), 2)
+
+    @override_settings(CHAT_WRITE_BEHIND=True)
+    async def test_history_reads_see_buffered_turns(self):
+        buffer = turns.WriteBehindBuffer(max_batch=100, interval=3600)
+        with mock.patch("alphabot.turns._buffer", buffer):
+            await turns.asave_turn(self.user, "chat", "hi", "reply")
+            await turns.asave_turn(self.user, "coder", "other", "reply")
+            self.assertTrue(buffer.has_pending(self.user.id, "chat"))
+            window = await history.build_history(self.user, "chat")
+        self.assertEqual([message["content"] for message in window], ["hi", "reply"])
+        # Only the conversation being read was flushed
+        self.assertTrue(buffer.has_pending(self.user.id, "coder"))
+        self.assertFalse(await Message.objects.filter(chat_type="coder").aexists())
+
+    def test_discard_drops_a_reset_conversation(self):
+        buffer = turns.WriteBehindBuffer(max_batch=100, interval=3600)
+        buffer.add(self.turn("chat"))
+        buffer.add(self.turn("coder"))
+        buffer.discard(self.user.id, "chat")
+        self.assertFalse(buffer.has_pending(self.user.id, "chat"))
+        self.assertTrue(buffer.has_pending(self.user.id, "coder"))
+
+
+class HistoryPagingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ada", password="pw")
+        self.client.force_login(self.user)
+        start = timezone.now() - timedelta(days=10)
+        for i in range(10):
+            message = Message.objects.create(user=self.user, chat_type="chat", sender="user", text=f"m{i}")
+            Message.objects.filter(id=message.id).update(timestamp=start + timedelta(days=i))
+
+    def page(self, before=None, limit=3):
+        params = {"limit": limit}
+        if before:
+            params["before"] = before
+        return self.client.get("/api/chat/history/", params)
+
+    def test_pages_continue_from_hot_rows_into_the_archive(self):
+        archive.archive_conversation(self.user.id, "chat", timezone.now() - timedelta(days=5), chunk_size=4)
+        self.assertEqual(Message.objects.count(), 4)
+
+        texts, before = [], None
+        for _ in range(5):
+            data = self.page(before).json()
+            texts.append([message["text"] for message in data["history"]])
+            before = data["next_before"]
+            if before is None:
+                break
+        # Hot rows by `limit`, then one archive chunk per page, newest first
+        self.assertEqual(texts, [["m7", "m8", "m9"], ["m6"], ["m4", "m5"], ["m0", "m1", "m2", "m3"]])
+
+    def test_soft_reset_hides_hot_and_archived_messages(self):
+        archive.archive_conversation(self.user.id, "chat", timezone.now() - timedelta(days=5), chunk_size=4)
+        self.client.post("/api/chat/reset/")
+        self.assertEqual(self.page().json(), {"history": [], "next_before": None})
+
+    def test_bad_cursors_and_limits(self):
+        for params in ({"before": "not a cursor"}, {"before": "bm9waXBl"}, {"before": "a:latest"}, {"limit": -1}):
+            with self.subTest(params=params):
+                response = self.client.get("/api/chat/history/", params)
+                self.assertEqual(response.status_code, 400)
+
+
+class ChatStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ada", password="pw")
+
+    async def stream(self, deltas):
+        async def fake_stream(feature, payload, api_key, extra_headers=None):
+            for delta in deltas:
+                if isinstance(delta, Exception):
+                    raise delta
+                yield delta
+
+        await self.async_client.aforce_login(self.user)
+        with mock.patch("alphabot.resilience.astream_chat_completion", fake_stream):
+            response = await self.async_client.post(
+                "/api/chat/", {"message": "hi", "stream": True}, content_type="application/json"
+            )
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            return b"".join([chunk async for chunk in response.streaming_content]).decode()
+
+    async def test_deltas_are_forwarded_and_the_turn_saved_when_done(self):
+        body = await self.stream(["Hel", "lo"])
+        self.assertEqual(
+            body,
+            'event: delta\ndata: {"text": "Hel"}\n\n'
+            'event: delta\ndata: {"text": "lo"}\n\n'
+            'event: done\ndata: {"response": "Hello"}\n\n',
+        )
+        messages = Message.objects.filter(user=self.user).order_by("id")
+        texts = [text async for text in messages.values_list("text", flat=True)]
+        self.assertEqual(texts, ["hi", "Hello"])
+
+    async def test_upstream_error_ends_the_stream_without_saving(self):
+        body = await self.stream(["Hel", openrouter.OpenRouterError(503, "down")])
+        self.assertTrue(body.endswith('event: error\ndata: {"error": "Error: 503 - down"}\n\n'))
+        self.assertFalse(await Message.objects.filter(user=self.user).aexists())
+
+
+@override_settings(CHAT_SUMMARY_TRIGGER=4, CHAT_SUMMARY_KEEP_RECENT=2)
+class SummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ada", password="pw")
+        self.messages = [
+            Message.objects.create(user=self.user, chat_type="chat", sender="user", text=f"m{i}") for i in range(6)
+        ]
+
+    async def test_older_messages_are_summarized_through_the_resilience_layer(self):
+        reply = httpx.Response(200, json={"choices": [{"message": {"content": "S"}}]})
+        with mock.patch("alphabot.resilience.achat_completion", return_value=reply) as call:
+            await summaries.acompact_conversation(self.user.id, "chat")
+        self.assertEqual(call.call_args.args[0], "summary")
+        self.assertIn("user: m3", call.call_args.args[1]["messages"][-1]["content"])
+        summary = await ConversationSummary.objects.aget(user=self.user, chat_type="chat")
+        self.assertEqual((summary.summary, summary.last_message_id), ("S", self.messages[3].id))
+
+    async def test_locked_database_is_retried(self):
+        reply = httpx.Response(200, json={"choices": [{"message": {"content": "S"}}]})
+        save = summaries._save_summary
+        failures = [OperationalError("database is locked")]
+
+        def flaky_save(*args):
+            if failures:
+                raise failures.pop()
+            save(*args)
+
+        with (
+            mock.patch("alphabot.resilience.achat_completion", return_value=reply),
+            mock.patch("alphabot.summaries._save_summary", flaky_save),
+            mock.patch("alphabot.summaries.SAVE_RETRY_DELAY", 0),
+        ):
+            await summaries.acompact_conversation(self.user.id, "chat")
+        self.assertTrue(await ConversationSummary.objects.filter(user=self.user, summary="S").aexists())
+
+
+@override_settings(RATELIMIT_ENABLED=True, RATE_LIMITS={"paraphraser": "2/m"})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        caches[settings.RATELIMIT_CACHE_ALIAS].clear()
+
+    def test_token_bucket_refills(self):
+        take = async_to_sync(ratelimit.atake_token)
+        with mock.patch("alphabot.ratelimit.time.time", return_value=1000.0) as now:
+            self.assertEqual([take("paraphraser", "ip:1"), take("paraphraser", "ip:1")], [0, 0])
+            self.assertAlmostEqual(take("paraphraser", "ip:1"), 30)
+            now.return_value = 1015.0  # Half a token back
+            self.assertAlmostEqual(take("paraphraser", "ip:1"), 15)
+            now.return_value = 1030.0
+            self.assertEqual(take("paraphraser", "ip:1"), 0)
+        # Other clients have their own bucket
+        self.assertEqual(take("paraphraser", "ip:2"), 0)
+
+    def test_over_quota_requests_get_retry_after(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post("/api/paraphraser/", {}, content_type="application/json").status_code, 400)
+        response = self.client.post("/api/paraphraser/", {}, content_type="application/json")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+
+    def test_wrong_method_is_not_charged(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get("/api/paraphraser/").status_code, 405)
+        self.assertEqual(self.client.post("/api/paraphraser/", {}, content_type="application/json").status_code, 400)
+
+
+def _fake_upstream(delay=0.05, delays=None):
+    """Stand-in for openrouter.achat_completion that records its peak concurrency;
+    `delays` sets the latency per model and the reply names the model"""
+    state = {"in_flight": 0, "peak": 0}
+
+    async def call(feature, payload, api_key, extra_headers=None):
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        try:
+            await asyncio.sleep((delays or {}).get(payload.get("model"), delay))
+        finally:
+            state["in_flight"] -= 1
+        return httpx.Response(200, json={"choices": [{"message": {"content": payload.get("model")}}]})
+
+    return call, state
+
+
+@override_settings(RATELIMIT_ENABLED=True, OPENROUTER_HEDGE_REQUESTS=False)
+class MetricsTests(TestCase):
+    def test_histogram_exposition(self):
+        histogram = metrics.Histogram("test_seconds", "Test", ("name",), buckets=(1, 2))
+        for value in (0.5, 1.5, 5):
+            histogram.observe(value, name='a"b')
+        self.assertEqual(histogram.expose()[2:], [
+            'test_seconds_bucket{name="a\\"b",le="1"} 1',
+            'test_seconds_bucket{name="a\\"b",le="2"} 2',
+            'test_seconds_bucket{name="a\\"b",le="+Inf"} 3',
+            'test_seconds_sum{name="a\\"b"} 7.0',
+            'test_seconds_count{name="a\\"b"} 3',
+        ])
+
+    def test_upstream_calls_are_charged_to_the_current_request(self):
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        try:
+            usage = {"prompt_tokens": 10, "completion_tokens": 5, "prompt_tokens_details": {"cached_tokens": 4}}
+            metrics.record_upstream("metrics_test", 0.25, 200, usage)
+        finally:
+            metrics.current_request.reset(token)
+        self.assertEqual(stats.upstream_seconds, 0.25)
+        tokens = metrics.upstream_tokens.values()
+        self.assertEqual(
+            [tokens[("metrics_test", kind)] for kind in ("prompt", "completion", "cached")], [10, 5, 4]
+        )
+        self.assertEqual(metrics.upstream_requests.values()[("metrics_test", 200)], 1)
+
+    def test_middleware_records_requests_and_their_queries(self):
+        user = User.objects.create_user("ada", password="pw")
+        self.client.force_login(user)
+        requests_before = metrics.requests_total.values().get(("chat_history", 200), 0)
+        queries_before = metrics.db_queries.values().get(("chat_history",), 0)
+        self.assertEqual(self.client.get("/api/chat/history/").status_code, 200)
+        self.assertEqual(metrics.requests_total.values()[("chat_history", 200)], requests_before + 1)
+        self.assertGreater(metrics.db_queries.values()[("chat_history",)], queries_before)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_endpoint_needs_the_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        response = self.client.get("/metrics", headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"# TYPE alphabot_requests_total counter", response.content)
+
+
+class OpenRouterClientTests(SimpleTestCase):
+    def test_one_client_per_loop_closed_with_its_loop(self):
+        async def clients():
+            return openrouter.get_async_client(), openrouter.get_async_client()
+
+        first, again = asyncio.run(clients())
+        self.assertIs(first, again)
+        self.assertTrue(first.is_closed)
+        second, _ = asyncio.run(clients())
+        self.assertIsNot(second, first)
+        self.assertTrue(second.is_closed)
+
+    def test_calls_on_a_loop_share_one_pooled_client(self):
+        sent = []
+
+        def handler(request):
+            sent.append(request)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "hi"}}]})
+
+        async def calls():
+            payload = {"model": "m", "messages": [{"role": "user", "content": "hello"}]}
+            return await asyncio.gather(*(openrouter.achat_completion("chat", payload, "key") for _ in range(3)))
+
+        client_class = httpx.AsyncClient
+        with mock.patch(
+            "alphabot.openrouter.httpx.AsyncClient",
+            side_effect=lambda **kwargs: client_class(transport=httpx.MockTransport(handler), **kwargs),
+        ) as make_client:
+            responses = asyncio.run(calls())
+        make_client.assert_called_once()
+        self.assertEqual(make_client.call_args.kwargs["limits"].max_connections, settings.OPENROUTER_POOL_SIZE)
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200])
+        self.assertEqual(sent[0].headers["Authorization"], "Bearer key")
+        self.assertEqual(sent[0].url, settings.OPENROUTER_URL)
+
+
+class AdmissionControlTests(SimpleTestCase):
+    async def test_waiters_get_released_slots_in_order(self):
+        admission = ratelimit.AdmissionControl(asyncio.get_running_loop(), 1, 1, 1)
+        self.assertTrue(await admission.acquire())
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        self.assertTrue(admission.saturated())
+        self.assertFalse(await admission.acquire())  # Queue full
+
+        admission.release()
+        self.assertTrue(await waiter)
+        self.assertEqual(admission.in_flight, 1)
+        admission.release()
+        self.assertEqual(admission.in_flight, 0)
+
+    @override_settings(UPSTREAM_MAX_IN_FLIGHT=2, UPSTREAM_MAX_QUEUE=10)
+    async def test_fan_out_takes_one_slot_per_upstream_call(self):
+        call, state = _fake_upstream()
+        payload = {"model": "test/model", "messages": []}
+        with mock.patch("alphabot.openrouter.achat_completion", call):
+            responses = await asyncio.gather(
+                *(resilience.achat_completion("paraphraser", payload, "key") for _ in range(6))
+            )
+        self.assertEqual([response.status_code for response in responses], [200] * 6)
+        self.assertEqual(state["peak"], 2)
+
+    @override_settings(UPSTREAM_MAX_IN_FLIGHT=1, UPSTREAM_MAX_QUEUE=0)
+    async def test_shed_calls_answer_429(self):
+        call, _ = _fake_upstream()
+        with mock.patch("alphabot.openrouter.achat_completion", call):
+            async with ratelimit.upstream_slot():
+                response = await resilience.achat_completion("paraphraser", {"model": "test/model"}, "key")
+        self.assertEqual(response.status_code, 429)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_then_half_opens_for_one_trial(self):
+        breaker = resilience.CircuitBreaker(threshold=2, cooldown=10)
+        with mock.patch("alphabot.resilience.time.monotonic", return_value=100.0) as now:
+            breaker.record_failure()
+            self.assertEqual(breaker.state, "closed")
+            breaker.record_failure()
+            self.assertEqual(breaker.state, "open")
+            self.assertFalse(breaker.allow())
+
+            now.return_value = 110.0
+            self.assertEqual(breaker.state, "half-open")
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())  # Only one trial at a time
+            breaker.record_cancelled()
+            self.assertTrue(breaker.allow())  # An abandoned trial frees the slot
+
+            breaker.record_failure()  # A failed trial reopens at once
+            self.assertEqual(breaker.state, "open")
+
+            now.return_value = 120.0
+            self.assertTrue(breaker.allow())
+            breaker.record_success()
+            self.assertEqual(breaker.state, "closed")
+
+
+@override_settings(
+    OPENROUTER_MAX_RETRIES=1, OPENROUTER_BACKOFF_BASE=0, OPENROUTER_ADAPTIVE_ROUTING=False,
+    OPENROUTER_HEDGE_REQUESTS=False, RATELIMIT_ENABLED=False,
+)
+class RetryFallbackTests(SimpleTestCase):
+    def setUp(self):
+        resilience._breakers.clear()
+        routing._windows.clear()
+        self.feature = features.get_feature("chat")
+        self.models = [self.feature.model, *self.feature.fallback_models]
+
+    async def call(self, outcomes):
+        """achat_completion() against a fake upstream answering each model with `outcomes[model]`"""
+        attempts = []
+
+        async def upstream(feature, payload, api_key, extra_headers=None):
+            attempts.append(payload["model"])
+            outcome = outcomes.get(payload["model"], 503)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return httpx.Response(outcome, json={"choices": [{"message": {"content": payload["model"]}}]})
+
+        with mock.patch("alphabot.openrouter.achat_completion", upstream):
+            response = await resilience.achat_completion("chat", {"model": self.feature.model, "messages": []}, "key")
+        return response, attempts
+
+    def test_backoff_delay(self):
+        with override_settings(OPENROUTER_BACKOFF_BASE=0.5, OPENROUTER_BACKOFF_MAX=4):
+            self.assertEqual(resilience.backoff_delay(0, retry_after="2"), 2)
+            self.assertEqual(resilience.backoff_delay(0, retry_after="120"), 4)
+            for attempt in range(6):
+                delay = resilience.backoff_delay(attempt, retry_after="soon")  # Unparseable: jitter instead
+                self.assertLessEqual(delay, min(4, 0.5 * 2 ** attempt))
+
+    async def test_retryable_failures_are_retried_then_fall_back(self):
+        response, attempts = await self.call({self.models[1]: 200})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(attempts, [self.models[0], self.models[0], self.models[1]])
+
+    async def test_transport_errors_are_retried(self):
+        response, attempts = await self.call({self.models[0]: httpx.ConnectError("refused"), self.models[1]: 200})
+        self.assertEqual(response.json()["choices"][0]["message"]["content"], self.models[1])
+        self.assertEqual(attempts, [self.models[0], self.models[0], self.models[1]])
+
+    async def test_client_errors_are_returned_at_once(self):
+        response, attempts = await self.call({self.models[0]: 400})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(attempts, [self.models[0]])
+
+    async def test_last_failure_is_returned_when_every_model_fails(self):
+        response, attempts = await self.call({})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(attempts, [model for model in self.models for _ in range(2)])
+
+    async def test_open_breaker_skips_the_model(self):
+        breaker = resilience.get_breaker(self.models[0])
+        for _ in range(settings.OPENROUTER_BREAKER_THRESHOLD):
+            breaker.record_failure()
+        response, attempts = await self.call({self.models[1]: 200})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(attempts, [self.models[1]])
+
+    @override_settings(OPENROUTER_BACKOFF_BASE=10, OPENROUTER_BACKOFF_MAX=10, OPENROUTER_RETRY_DEADLINE=1)
+    async def test_retries_stop_at_the_deadline(self):
+        with mock.patch("alphabot.resilience.random.uniform", return_value=10):
+            response, attempts = await self.call({})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(attempts, [self.models[0]])
+
+
+@override_settings(
+    OPENROUTER_ADAPTIVE_ROUTING=True, OPENROUTER_ROUTING_MIN_SAMPLES=3,
+    OPENROUTER_ROUTING_MAX_ERROR_RATE=0.2, OPENROUTER_ROUTING_EXPLORE_RATE=0,
+)
+class RoutingTests(SimpleTestCase):
+    def setUp(self):
+        routing._windows.clear()
+
+    def test_rank_puts_the_fastest_healthy_model_first(self):
+        for _ in range(3):
+            routing.record("route", "slow", 1.0, True)
+            routing.record("route", "fast", 0.1, True)
+            routing.record("route", "failing", 0.1, False)
+        routing.record("route", "new", 0.1, True)
+        self.assertEqual(
+            routing.rank("route", ["slow", "failing", "new", "fast"]), ["fast", "slow", "new", "failing"]
+        )
+
+    def test_fallbacks_are_never_ranked_ahead_of_the_primary(self):
+        feature = features.get_feature("chat")
+        primary, fallback = feature.model, feature.fallback_models[0]
+        for _ in range(3):
+            routing.record("chat", primary, 2.0, True)
+            routing.record("chat", fallback, 0.1, True)
+        self.assertEqual(resilience.candidate_models("chat", primary), ([primary], list(feature.fallback_models)))
+
+    def test_routing_peers_are_ranked(self):
+        feature = features.get_feature("chat")
+        for _ in range(3):
+            routing.record("chat", feature.model, 2.0, True)
+            routing.record("chat", "peer/free", 0.1, True)
+        with mock.patch.object(feature, "routing_models", ("peer/free",)):
+            routed, fallbacks = resilience.candidate_models("chat", feature.model)
+        self.assertEqual(routed, ["peer/free", feature.model])
+        self.assertEqual(fallbacks, list(feature.fallback_models))
+
+    def test_hedge_delay_is_p95_once_measured(self):
+        routing.record("route", "model", 0.1, True)
+        self.assertIsNone(routing.hedge_delay("route", "model"))
+        for seconds in (0.2, 0.3, 0.4):
+            routing.record("route", "model", seconds, True)
+        self.assertEqual(routing.hedge_delay("route", "model"), 0.4)
+
+    async def test_cancelled_attempts_are_not_recorded(self):
+        call, _ = _fake_upstream(delay=1)
+        with mock.patch("alphabot.openrouter.achat_completion", call):
+            attempt = asyncio.create_task(resilience._attempt("route", {}, "model", "key", None))
+            await asyncio.sleep(0.01)
+            attempt.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await attempt
+        self.assertEqual(routing.get_window("route", "model").stats()[0], 0)
+
+    async def test_hedge_races_the_next_model_after_p95(self):
+        for _ in range(3):
+            routing.record("hedged", "slow", 0.02, True)
+        call, _ = _fake_upstream(delays={"slow": 1, "fast": 0.01})
+        with mock.patch("alphabot.openrouter.achat_completion", call):
+            response = await resilience._ahedged("hedged", {}, "key", None, ["slow", "fast"])
+        self.assertEqual(response.json()["choices"][0]["message"]["content"], "fast")
+        # The abandoned call to the slow model leaves its window untouched
+        self.assertEqual(routing.get_window("hedged", "slow").stats()[0], 3)
+
+
+class FeatureRegistryTests(SimpleTestCase):
+    def test_prompt_template(self):
+        template = features.PromptTemplate("Q: {question} ({lang}) {{literal}}")
+        self.assertEqual(template.fields, ("question", "lang"))
+        self.assertEqual(template.render(question="why?", lang=3), "Q: why? (3) {literal}")
+        with self.assertRaises(KeyError):
+            template.render(question="why?")
+        with self.assertRaises(ValueError):
+            features.PromptTemplate("{count:>5}")
+
+    @override_settings(
+        OPENROUTER_FALLBACK_MODELS={"test": ["backup", "primary"]}, OPENROUTER_ROUTING_MODELS={"test": ["peer"]},
+        OPENROUTER_TIMEOUTS={"test": 5}, OPENROUTER_MAX_TOKENS={"test": 100},
+    )
+    def test_feature_payloads_and_models(self):
+        feature = features.Feature("test", "primary", "Be brief.", prompt="Q: {question}", temperature=0.1)
+        history = [{"role": "assistant", "content": "earlier"}]
+        self.assertEqual(feature.build(history, question="why?"), {
+            "model": "primary",
+            "temperature": 0.1,
+            "max_tokens": 100,
+            "messages": [
+                {"role": "system", "content": "Be brief."},
+                {"role": "assistant", "content": "earlier"},
+                {"role": "user", "content": "Q: why?"},
+            ],
+        })
+        self.assertEqual(feature.timeout, 5)
+        self.assertEqual(feature.candidate_models(), ["primary", "backup"])
+        self.assertEqual(feature.candidate_models("backup"), ["backup", "primary"])
+        self.assertEqual(feature.routed_models(), ["primary", "peer"])
+
+    def test_payloads_do_not_share_mutable_state(self):
+        feature = features.get_feature("chat")
+        first = feature.build(message="a")
+        first["messages"].append({"role": "user", "content": "extra"})
+        first["model"] = "changed"
+        second = feature.build(message="b")
+        self.assertEqual(second["model"], feature.model)
+        self.assertEqual(len(second["messages"]), 2)
+
+    def test_registry(self):
+        self.assertIs(features.get_feature("chat"), features.get_feature("chat"))
+        self.assertIsNone(features.find_feature("unknown"))
+        with self.assertRaises(KeyError):
+            features.get_feature("unknown")
+        for name, feature in features.load().items():
+            with self.subTest(feature=name):
+                payload = feature.build(**{field: "x" for field in feature.prompt.fields})
+                self.assertEqual(payload["model"], feature.model)
+                self.assertEqual(payload["messages"][0]["role"], "system")
+
+
+class PromptCacheTests(SimpleTestCase):
+    MESSAGES = [
+        {"role": "system", "content": "You are AlphaBot."},
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+        {"role": "user", "content": "new"},
+    ]
+
+    def test_breakpoints_after_system_prompt_and_history(self):
+        marked = openrouter.mark_cache_breakpoints(self.MESSAGES)
+        self.assertEqual([isinstance(m["content"], list) for m in marked], [True, False, True, False])
+        self.assertEqual(marked[2]["content"][0], {"type": "text", "text": "hello", "cache_control": {"type": "ephemeral"}})
+
+    @override_settings(OPENROUTER_PROMPT_CACHE=True, OPENROUTER_CACHE_CONTROL_MODELS=("anthropic/",))
+    def test_only_cache_control_models_are_marked(self):
+        payload = {"model": "deepseek/deepseek-chat", "messages": self.MESSAGES}
+        self.assertIs(openrouter._wire_payload(payload), payload)
+        marked = openrouter._wire_payload(dict(payload, model="anthropic/claude"))
+        self.assertIsInstance(marked["messages"][0]["content"], list)
+        self.assertIsInstance(self.MESSAGES[0]["content"], str)  # The caller's payload is left alone
+
+
+def _reply(content, status=200):
+    return httpx.Response(status, json={"choices": [{"message": {"content": content}}]})
+
+
+@override_settings(SIMILARITY_CACHE_ENABLED=False)
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        response_cache.get_cache().clear()
+
+    def test_key_ignores_spacing_and_optionally_case(self):
+        payload = features.get_feature("content").build(topic="Cats")
+        spaced = features.get_feature("content").build(topic="  Cats ")
+        shouted = features.get_feature("content").build(topic="CATS")
+        self.assertEqual(response_cache.make_key("content", payload), response_cache.make_key("content", spaced))
+        self.assertNotEqual(response_cache.make_key("content", payload), response_cache.make_key("content", shouted))
+        self.assertEqual(
+            response_cache.make_key("content", payload, casefold=True),
+            response_cache.make_key("content", shouted, casefold=True),
+        )
+        other_model = response_cache.make_key("content", dict(payload, model="other/model"))
+        self.assertNotEqual(response_cache.make_key("content", payload), other_model)
+
+    async def test_repeated_input_is_served_from_the_cache(self):
+        with mock.patch("alphabot.resilience.achat_completion", return_value=_reply("Reworded")) as call:
+            self.assertEqual(await paraphrase.aparaphrase("Some text", "key"), "Reworded")
+            self.assertEqual(await paraphrase.aparaphrase("Some \n text", "key"), "Reworded")
+        self.assertEqual(call.call_count, 1)
+        self.assertEqual(response_cache.stats(["paraphraser"]), {"paraphraser": {"hits": 1, "misses": 1}})
+
+    async def test_errors_are_not_cached(self):
+        with mock.patch("alphabot.resilience.achat_completion", return_value=_reply("", status=503)) as call:
+            for _ in range(2):
+                with self.assertRaises(openrouter.OpenRouterError):
+                    await paraphrase.aparaphrase("Some text", "key")
+        self.assertEqual(call.call_count, 2)
+
+
+class SimilarityCacheTests(SimpleTestCase):
+    TEXT = "The quick brown fox jumps over the lazy dog while the farmer watches from the old wooden porch."
+
+    def test_near_duplicates_hit_and_unrelated_texts_miss(self):
+        cache = similarity_cache.SimilarityCache()
+        cache.store("ns", self.TEXT, "stored")
+        self.assertEqual(cache.lookup("ns", self.TEXT.upper().replace(" ", "  "), 0.85), "stored")
+        self.assertEqual(cache.lookup("ns", self.TEXT.replace("old", "new"), 0.75), "stored")
+        self.assertIsNone(cache.lookup("ns", self.TEXT.replace("old", "new"), 0.95))
+        self.assertIsNone(cache.lookup("ns", "Completely unrelated text about databases and caching.", 0.5))
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    def test_namespaces_are_separate(self):
+        cache = similarity_cache.SimilarityCache()
+        cache.store("ns", self.TEXT, "stored")
+        self.assertIsNone(cache.lookup("other", self.TEXT, 0.85))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = similarity_cache.SimilarityCache(max_entries=2)
+        texts = [f"{word} is the topic of this fairly long article" for word in ("alpha", "beta", "gamma")]
+        cache.store("ns", texts[0], 0)
+        cache.store("ns", texts[1], 1)
+        cache.lookup("ns", texts[0], 0.99)
+        cache.store("ns", texts[2], 2)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual([cache.lookup("ns", text, 0.99) for text in texts], [0, None, 2])
+
+    def test_entries_are_shared_only_within_a_prompt_template(self):
+        payload = features.get_feature("content").build(topic="cats")
+        other_model = dict(payload, model="other/model")
+        self.assertEqual(
+            similarity_cache.namespace("content", payload, "cats"),
+            similarity_cache.namespace("content", features.get_feature("content").build(topic="dogs"), "dogs"),
+        )
+        self.assertNotEqual(
+            similarity_cache.namespace("content", payload, "cats"),
+            similarity_cache.namespace("content", other_model, "cats"),
+        )
+
+
+class SingleflightTests(SimpleTestCase):
+    def counting_call(self, result="done", error=None):
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            if error:
+                raise error
+            return result
+
+        return call, calls
+
+    async def test_concurrent_callers_share_one_call(self):
+        call, calls = self.counting_call()
+        collapsed = singleflight.collapsed["test"]
+        results = await asyncio.gather(*(singleflight.do("test", "k", call) for _ in range(5)))
+        self.assertEqual(results, ["done"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(singleflight.collapsed["test"] - collapsed, 4)
+        # Once finished, the next caller makes a fresh call
+        await singleflight.do("test", "k", call)
+        self.assertEqual(len(calls), 2)
+
+    async def test_different_keys_are_not_coalesced(self):
+        call, calls = self.counting_call()
+        await asyncio.gather(singleflight.do("test", "a", call), singleflight.do("test", "b", call))
+        self.assertEqual(len(calls), 2)
+
+    async def test_errors_reach_every_caller(self):
+        call, calls = self.counting_call(error=ValueError("boom"))
+        results = await asyncio.gather(*(singleflight.do("test", "k", call) for _ in range(3)), return_exceptions=True)
+        self.assertEqual([str(result) for result in results], ["boom"] * 3)
+        self.assertEqual(len(calls), 1)
+
+    async def test_cancelled_first_caller_does_not_cancel_the_others(self):
+        call, calls = self.counting_call()
+        first = asyncio.ensure_future(singleflight.do("test", "k", call))
+        second = asyncio.ensure_future(singleflight.do("test", "k", call))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        self.assertEqual(await second, "done")
+        self.assertTrue(first.cancelled())
+
+
+class ParaphraseChunkTests(SimpleTestCase):
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(paraphrase.split_chunks("  aa bb.  ", 10), [("", "aa bb.")])
+        self.assertEqual(paraphrase.split_chunks("\n\n", 10), [])
+
+    def test_paragraphs_are_grouped_up_to_the_limit(self):
+        text = "aa bb.\n\ncc dd.\n\nee ff."
+        self.assertEqual(paraphrase.split_chunks(text, 6), [("", "aa bb.\n\ncc dd."), ("\n\n", "ee ff.")])
+
+    def test_long_paragraph_is_cut_between_sentences(self):
+        self.assertEqual(
+            paraphrase.split_chunks("aa bb. cc dd. ee ff.", 6), [("", "aa bb. cc dd."), (" ", "ee ff.")]
+        )
+
+    def test_long_sentence_is_cut_between_words(self):
+        self.assertEqual(paraphrase.split_chunks("aa bb cc dd ee", 2), [("", "aa bb"), (" ", "cc dd"), (" ", "ee")])
+
+    def test_chunks_join_back_into_the_text(self):
+        text = "First para, with words.\n\n" + " ".join(f"Sentence {i} goes here." for i in range(40)) + "\n\nEnd."
+        chunks = paraphrase.split_chunks(text, 20)
+        self.assertGreater(len(chunks), 5)
+        self.assertEqual("".join(separator + chunk for separator, chunk in chunks), text)
+
+    def test_assemble_keeps_failed_chunks(self):
+        chunks = [("", "aa"), ("\n\n", "bb")]
+        self.assertEqual(paraphrase.assemble(chunks, {0: {"text": "AA"}, 1: {"error": "API Error: 503"}}), "AA\n\nbb")
+
+
+class OutlineTests(SimpleTestCase):
+    def test_no_headings(self):
+        self.assertEqual(articles.parse_outline("", 6), [])
+        self.assertEqual(articles.parse_outline("\n  -  \n#\n", 6), [])
+
+    def test_one_heading(self):
+        self.assertEqual(articles.parse_outline("# Why cats purr", 6), ["Why cats purr"])
+
+    def test_many_headings_are_cleaned_deduplicated_and_capped(self):
+        outline = "1. Introduction\n2) **History**\n- History\nIV. Modern cats\n## Care\n* Diet\nConclusion"
+        self.assertEqual(
+            articles.parse_outline(outline, 5), ["Introduction", "History", "Modern cats", "Care", "Diet"]
+        )
+
+    async def test_outline_needs_at_least_two_headings(self):
+        reply = httpx.Response(200, json={"choices": [{"message": {"content": "Only one heading"}}]})
+        with mock.patch("alphabot.resilience.achat_completion", return_value=reply):
+            with self.assertRaises(articles.ContentGenerationError):
+                await articles.aoutline("cats", "key")
@@ -0,0 +1,127 @@
+import atexit
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import Message
+
+
+logger = logging.getLogger(__name__)
+
+
+def _turn_messages(user, chat_type, user_message, bot_reply):
+    return [
+        Message(user=user, sender="user", text=user_message, chat_type=chat_type),
+        Message(user=user, sender="AlphaBot", text=bot_reply, chat_type=chat_type),
+    ]
+
+
+def _insert(messages):
+    with transaction.atomic():
+        Message.objects.bulk_create(messages, batch_size=500)
+
+
+class WriteBehindBuffer:
+    """Collects chat messages in memory and inserts them in batches from a background thread
+
+    A batch is written once `max_batch` messages are pending or `interval` seconds
+    after the first one arrived. Flushes are serialized so every conversation's
+    messages are inserted in the order they were added.
+    """
+
+    def __init__(self, max_batch, interval):
+        self.max_batch = max_batch
+        self.interval = interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+
+    def add(self, messages):
+        with self._lock:
+            self._pending.extend(messages)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="alphabot-write-behind", daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+
+    def has_pending(self, user_id, chat_type):
+        """True while messages of the conversation are buffered or a flush may still be inserting them"""
+        if self._flush_lock.locked():
+            return True
+        with self._lock:
+            return any(m.user_id == user_id and m.chat_type == chat_type for m in self._pending)
+
+    def _take(self, user_id=None, chat_type=None):
+        with self._lock:
+            if user_id is None:
+                batch, self._pending = self._pending, []
+            else:
+                batch, rest = [], []
+                for message in self._pending:
+                    (batch if message.user_id == user_id and message.chat_type == chat_type else rest).append(message)
+                self._pending = rest
+        return batch
+
+    def flush(self, user_id=None, chat_type=None):
+        """Insert all pending messages, or only one conversation's"""
+        with self._flush_lock:
+            batch = self._take(user_id, chat_type)
+            if not batch:
+                return
+            try:
+                _insert(batch)
+            except Exception:
+                logger.exception("Dropped %d buffered chat messages", len(batch))
+
+    def discard(self, user_id, chat_type):
+        """Forget a conversation's pending messages (the chat was reset)"""
+        with self._flush_lock:
+            self._take(user_id, chat_type)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wakeup.wait()
+                if len(self._pending) < self.max_batch:
+                    self._wakeup.wait_for(lambda: len(self._pending) >= self.max_batch, timeout=self.interval)
+            self.flush()
+            close_old_connections()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBehindBuffer(settings.CHAT_WRITE_BEHIND_BATCH, settings.CHAT_WRITE_BEHIND_INTERVAL)
+            atexit.register(_buffer.flush)
+    return _buffer
+
+
+async def asave_turn(user, chat_type, user_message, bot_reply):
+    """Store a user message and its reply with one INSERT in one transaction, or hand them to the write-behind buffer"""
+    messages = _turn_messages(user, chat_type, user_message, bot_reply)
+    if settings.CHAT_WRITE_BEHIND:
+        get_buffer().add(messages)
+    else:
+        await sync_to_async(_insert)(messages)
+
+
+async def aflush_conversation(user_id, chat_type):
+    """Make buffered messages of a conversation visible before reading its history"""
+    if _buffer is not None and _buffer.has_pending(user_id, chat_type):
+        await sync_to_async(_buffer.flush)(user_id, chat_type)
+
+
+async def adiscard_conversation(user_id, chat_type):
+    if _buffer is not None:
+        await sync_to_async(_buffer.discard)(user_id, chat_type)
@@ -15,6 +15,10 @@ urlpatterns = [
     
     path("cv_gen", views.cv_gen, name="cv_gen"),
     path("api/cv/generate/", views.generate_cv, name="generate_cv"),
+    path("api/cv/<int:cv_id>/", views.cv_detail, name="cv_detail"),
+    path("api/cv/batch/", views.generate_cv_batch, name="generate_cv_batch"),
+    path("api/cv/jobs/<int:job_id>/", views.cv_job_status, name="cv_job_status"),
+    path("api/cv/jobs/<int:job_id>/events/", views.cv_job_events, name="cv_job_events"),
 
     path("content_writer/", views.content_writer, name="content_writer"),
 
@@ -31,4 +35,6 @@ urlpatterns = [
     path("api/coder/chat/", views.coder_chat_api, name="coder_chat"),
     path("api/coder/chat/reset/", views.coder_reset_chat, name="coder_reset_chat"),
     path("api/coder/chat/history/", views.coder_history, name="coder_chat_history"),
+
+    path("metrics", views.metrics_view, name="metrics"),
 ]
\ No newline at end of file
@@ -4,274 +4,234 @@ from django.contrib.auth import authenticate, login, logout
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.core.exceptions import ValidationError
-from django.core.validators import validate_email
 from django.views.decorators.csrf import csrf_exempt
-import os
+from django.urls import reverse
+import asyncio
 import json
-import re
-import requests
-from dotenv import load_dotenv
-from .models import Message
-
-
-# Load environment variables
-load_dotenv()
-
+import time
+import httpx
+from .models import CVJob, GeneratedCV
+from .history import build_history, history_page
+from .page_cache import cache_anonymous_page
+from .ratelimit import rate_limit
+from .summaries import schedule_compaction
+from .cv import clean_cv_data
+from . import archive, articles, cv_batch, cv_jobs, features, metrics, openrouter, paraphrase, resilience, response_cache, similarity_cache, singleflight, turns
+
+
+@cache_anonymous_page
 def index(request):
     return render(request, "alphabot/index.html")
 
 
-
-def cv_gen(request):
-    return render(request, "alphabot/cv_gen.html")
-
-
+def _sse(event, data):
+    """Format one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
+def _sse_response(stream):
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Stop nginx buffering the stream
+    return response
 
-def validate_uk_phone(phone):
-    phone = phone.strip().replace(" ", "").replace("-", "")
-    if phone.startswith("+44"):
-        phone = "0" + phone[3:]
-
-    if not re.match(r"^07\d{9}$", phone):
-        raise ValidationError("Phone must start with 07 and be 11 digits (UK format)")
-    
-def validate_custom_email(email):
-    validate_email(email)
-    if len(email) > 254:
-        raise ValidationError("Email is too long")
 
+async def _stream_chat_reply(user, chat_type, user_message, payload, api_key):
+    """Forward OpenRouter deltas as SSE and save the turn once the stream completes"""
+    parts = []
+    try:
+        async for delta in resilience.astream_chat_completion(chat_type, payload, api_key):
+            parts.append(delta)
+            yield _sse("delta", {"text": delta})
+    except openrouter.OpenRouterError as e:
+        yield _sse("error", {"error": f"Error: {e.status_code} - {e.text}"})
+        return
+    except httpx.HTTPError as e:
+        yield _sse("error", {"error": str(e)})
+        return
+
+    bot_reply = "".join(parts)
+    await turns.asave_turn(user, chat_type, user_message, bot_reply)
+    schedule_compaction(user.id, chat_type)
+    yield _sse("done", {"response": bot_reply})
+
+
+@cache_anonymous_page
+def cv_gen(request):
+    return render(request, "alphabot/cv_gen.html")
 
 
 @login_required
 @csrf_exempt
-def generate_cv(request):
+@rate_limit("cv", admission_control=False)
+async def generate_cv(request):
+    """Queue a CV generation job; the result is delivered via cv_job_status or cv_job_events"""
     if request.method != "POST":
         return JsonResponse({"error": "POST method required"}, status=405)
 
     try:
         data = json.loads(request.body)
-        
-        # Required fields with defaults
-        required_fields = {
-    'fullName': '',
-    'email': '',
-    'phone': '',
-    'summary': '',
-    'skills': '',
-    'experience': '',
-    'education': ''
-}
-
-        for field in required_fields:
-            if field in data:
-                required_fields[field] = data[field].strip()
-            else:
-                return JsonResponse({"error": f"Missing required field: {field}"}, status=400)
-
-     # Validate email and phone
-        validate_custom_email(data['email'])
-        validate_uk_phone(data['phone'])
-
-
-        # Prepare the AI prompt with structured data
-        prompt = f"""
-        Generate a professional CV with these details:
-        
-        Name: {required_fields['fullName']}
-        Email: {required_fields['email']}
-        Phone: {required_fields['phone']}
-        
-        Professional Summary:
-        {data['summary']}
-        
-        Skills:
-        {data['skills']}
-        
-        Work Experience:
-        {data['experience']}
-        
-        Education:
-        {data['education']}
-        
-        Certifications:
-        {data.get('certification', 'N/A')}
-        
-        Requirements:
-        - Use Markdown formatting
-        - Include section headings
-        - Use bullet points for lists
-        - Keep it concise (1-2 pages)
-        - Optimize for ATS systems
-        - Add professional spacing
-        """
-
-        api_key = os.getenv("OPENROUTER_API_KEY")
-        if not api_key:
+        # Regenerating a stored CV only rewrites the sections whose fields changed
+        cv_id = data.pop("cv_id", None) if isinstance(data, dict) else None
+        clean_cv_data(data)
+
+        if not settings.OPENROUTER_API_KEY:
             return JsonResponse({"error": "API configuration error"}, status=500)
 
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": request.build_absolute_uri('/')
-        }
-
-        payload = {
-            "model": "deepseek/deepseek-chat",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": """You are a professional career advisor. 
-ALWAYS respond ONLY in Markdown (do NOT use any HTML tags).
-Use:
-- `#` for headings
-- `**bold**` for job titles, company names, and degrees
-- `*italic*` for dates or locations
-- Bullet points for lists
-
-Example:
-# Professional Summary
-Motivated professional with 5+ years of experience...
-
-# Work Experience
-**Software Engineer** – *Jan 2020 – Present*, **TechCorp**
-- Developed new features for the main product
-- Improved system performance by 30%
-
-# Skills
-- **Python**
-- **Project Management**
-
-Now, generate the CV using the provided details, following this Markdown style strictly.
-"""
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "temperature": 0.3  # Less creative, more factual
-        }
-
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=10  # Add timeout
-        )
+        user = await request.auser()
+        generated_cv = None
+        if cv_id is not None:
+            generated_cv = await GeneratedCV.objects.filter(id=cv_id, user=user).afirst()
+            if generated_cv is None:
+                return JsonResponse({"error": "CV not found"}, status=404)
+
+        job = await cv_jobs.aenqueue(user, data, request.build_absolute_uri('/'), generated_cv)
 
-        if response.status_code != 200:
-            error_msg = f"API Error {response.status_code}"
-            try:
-                error_details = response.json().get('error', {}).get('message', '')
-                if error_details:
-                    error_msg += f": {error_details}"
-            except:
-                pass
-            return JsonResponse({"error": error_msg}, status=500)
-
-        result = response.json()
-        content = result["choices"][0]["message"]["content"]
-        
-        # Calculate success score (simple version)
-        score = calculate_cv_score(data, content)
-        
         return JsonResponse({
-            "cv": content,
-            "score": score,
-            "improvement_suggestions": generate_improvement_suggestions(data, content)
-        })
+            **cv_jobs.job_json(job),
+            "status_url": reverse("cv_job_status", args=[job.id]),
+            "events_url": reverse("cv_job_events", args=[job.id]),
+        }, status=202)
 
     except json.JSONDecodeError:
         return JsonResponse({"error": "Invalid JSON data"}, status=400)
     except ValidationError as e:
-        return JsonResponse({"error": str(e)}, status=400)
-    except requests.Timeout:
-        return JsonResponse({"error": "API timeout"}, status=504)
+        return JsonResponse({"error": e.messages[0]}, status=400)
     except Exception as e:
         return JsonResponse({"error": f"Server error: {str(e)}"}, status=500)
 
-def calculate_cv_score(data, cv_text):
-    """Calculate a success score (0-100) for the CV"""
-    score = 50  # Base score
-    
-    # Safely get values with defaults
-    summary = data.get('summary', '')
-    experience = data.get('experience', '')
-    education = data.get('education', '')
-    skills = data.get('skills', '')
-    
-    # Length checks
-    if len(summary) > 100:
-        score += 5
-    if len(experience) > 300:
-        score += 10
-    if len(education) > 100:
-        score += 5
-        
-    # Content quality checks
-    cv_text_lower = cv_text.lower()
-    if "achieved" in cv_text_lower or "improved" in cv_text_lower:
-        score += 10
-    if any(word in cv_text_lower for word in ["led", "managed", "developed"]):
-        score += 10
-        
-    # Skills check - safely handle missing or empty skills
-    skills_count = len([s for s in skills.split(',') if s.strip()]) if skills else 0
-    score += min(skills_count * 2, 10)  # Max 10 points for skills
-        
-    return min(score, 100)  # Cap at 100
-
-def generate_improvement_suggestions(data, cv_text):
-    """Generate AI-powered improvement suggestions"""
-    suggestions = []
-    
-    # Check for common issues
-    if len(data['summary']) < 50:
-        suggestions.append("Your professional summary could be more detailed")
-    if not any(char.isdigit() for char in data['experience']):
-        suggestions.append("Add quantifiable achievements (e.g., 'Increased sales by 20%')")
-    if "http" not in data.get('linkedin', '') and "http" not in data.get('github', ''):
-        suggestions.append("Consider adding links to your professional profiles")
-        
-    # Formatting suggestions
-    if "\n\n" not in cv_text:
-        suggestions.append("Add more spacing between sections for better readability")
-    if "**" not in cv_text and "*" not in cv_text:
-        suggestions.append("Use bold/italic formatting to highlight key achievements")
-        
-    return suggestions[:5]  # Return top 5 suggestions
-    
+
+async def _cv_batch_stream(user, rows, referer):
+    failed = 0
+    async for result in cv_batch.agenerate_batch(user, rows, referer):
+        failed += "error" in result
+        yield _sse("result", result)
+    yield _sse("done", {"total": len(rows), "failed": failed})
+
+
+@login_required
+@csrf_exempt
+@rate_limit("cv_batch")
+async def generate_cv_batch(request):
+    """Generate CVs for a list of candidates (JSON or CSV); SSE per row with ?stream=1"""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST method required"}, status=405)
+
+    try:
+        rows = cv_batch.parse_batch(request)
+    except ValidationError as e:
+        return JsonResponse({"error": e.messages[0]}, status=400)
+
+    # Reject the whole batch before spending any upstream calls
+    errors = cv_batch.validate_batch(rows)
+    if errors:
+        return JsonResponse({"error": "Invalid candidates", "errors": errors}, status=400)
+
+    if not settings.OPENROUTER_API_KEY:
+        return JsonResponse({"error": "API configuration error"}, status=500)
+
+    user = await request.auser()
+    referer = request.build_absolute_uri('/')
+    if request.GET.get("stream") or "text/event-stream" in request.headers.get("Accept", ""):
+        return _sse_response(_cv_batch_stream(user, rows, referer))
+
+    results = [result async for result in cv_batch.agenerate_batch(user, rows, referer)]
+    return JsonResponse({"results": sorted(results, key=lambda result: result["row"])})
+
+
+@login_required
+async def cv_detail(request, cv_id):
+    user = await request.auser()
+    generated = await GeneratedCV.objects.filter(id=cv_id, user=user).afirst()
+    if generated is None:
+        return JsonResponse({"error": "CV not found"}, status=404)
+    return JsonResponse({
+        "cv_id": generated.id,
+        "input": generated.input_data,
+        "cv": generated.cv,
+        "score": generated.score,
+        "improvement_suggestions": generated.suggestions,
+        "updated_at": generated.updated_at.isoformat(),
+    })
+
+
+async def _get_cv_job(request, job_id):
+    user = await request.auser()
+    return await CVJob.objects.filter(id=job_id, user=user).afirst()
+
+
+@login_required
+async def cv_job_status(request, job_id):
+    job = await _get_cv_job(request, job_id)
+    if job is None:
+        return JsonResponse({"error": "Job not found"}, status=404)
+    return JsonResponse(cv_jobs.job_json(job))
+
+
+async def _cv_job_stream(job):
+    """Emit a status event on every change and the result once the job finishes"""
+    deadline = time.monotonic() + settings.CV_JOB_EVENTS_TIMEOUT
+    status = None
+    while True:
+        if job.status != status:
+            status = job.status
+            event = status if status in cv_jobs.FINISHED else "status"
+            yield _sse(event, cv_jobs.job_json(job))
+            if status in cv_jobs.FINISHED:
+                return
+        if time.monotonic() >= deadline:
+            yield _sse("timeout", cv_jobs.job_json(job))  # The client falls back to polling
+            return
+        await asyncio.sleep(settings.CV_WORKER_POLL_INTERVAL)
+        job = await CVJob.objects.aget(id=job.id)
+
+
+@login_required
+async def cv_job_events(request, job_id):
+    job = await _get_cv_job(request, job_id)
+    if job is None:
+        return JsonResponse({"error": "Job not found"}, status=404)
+    return _sse_response(_cv_job_stream(job))
+
+
+@cache_anonymous_page
 def coder(request):
-    chat_history = request.session.get("chat_history", [])
     return render(request, "alphabot/coder.html")
 
 
 # Chat-related API views
 @csrf_exempt
-def coder_reset_chat(request):
-    if request.user.is_authenticated:
-        Message.objects.filter(user=request.user, chat_type="coder").delete()  # Only coder messages
+async def coder_reset_chat(request):
+    user = await request.auser()
+    if user.is_authenticated:
+        await turns.adiscard_conversation(user.id, "coder")
+        await archive.asoft_reset(user, "coder")  # Only coder messages, purged later by chat_retention
         return JsonResponse({"status": "Chat reset."})
     return JsonResponse({"error": "Unauthorized"}, status=401)
 
 @csrf_exempt
-def coder_history(request):
-    if request.user.is_authenticated:
-        messages = Message.objects.filter(user=request.user, chat_type="coder").order_by("timestamp")  # Only coder messages
-        history = [{"sender": msg.sender, "text": msg.text} for msg in messages]
-        return JsonResponse({"history": history})
+async def coder_history(request):
+    user = await request.auser()
+    if user.is_authenticated:
+        try:
+            limit = int(request.GET.get("limit", 0))
+            page, next_before = await history_page(user, "coder", request.GET.get("before"), limit)  # Only coder messages
+        except ValueError:
+            return JsonResponse({"error": "Invalid cursor or limit"}, status=400)
+        history = [{"sender": msg.sender, "text": msg.text} for msg in page]
+        return JsonResponse({"history": history, "next_before": next_before})
     return JsonResponse({"error": "Unauthorized"}, status=401)
 
 @login_required
 @csrf_exempt
-def coder_chat_api(request):
+@rate_limit("coder")
+async def coder_chat_api(request):
     if request.method == "POST":
         try:
-            if not request.user.is_authenticated:
+            user = await request.auser()
+            if not user.is_authenticated:
                 return JsonResponse({"error": "Unauthorized"}, status=401)
 
             data = json.loads(request.body)
@@ -280,43 +240,30 @@ def coder_chat_api(request):
             if not user_message:
                 return JsonResponse({"error": "Message required"}, status=400)
 
-            api_key = os.getenv("OPENROUTER_API_KEY")
+            api_key = settings.OPENROUTER_API_KEY
             if not api_key:
                 return JsonResponse({"error": "OpenRouter API key not set"}, status=500)
 
-            # Retrieve past chat
-            history = Message.objects.filter(user=request.user, chat_type="coder").order_by("timestamp")
-            history_text = "\n".join([f"{m.sender}: {m.text}" for m in history])
-
-            # Prompt template
-            prompt = f"You are AlphaBot 🤖, a coding assistant. Chat history:\n{history_text}\nUser: {user_message}"
-
-            # Model
-            model = "deepseek/deepseek-chat:free"
-
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": "You are AlphaBot, a coding genius who helps with anything related to coding in python, javascript or something else."},
-                        {"role": "user", "content": prompt}
-                    ]
-                }
-            )
+            # Newest past turns that fit the history token budget
+            history = await build_history(user, "coder")
 
-            if response.status_code == 200:
-                result = response.json()
-                bot_reply = result["choices"][0]["message"]["content"]
-            else:
-                bot_reply = f"Error: {response.status_code} - {response.text}"
+            payload = features.get_feature("coder").build(history, message=user_message)
+
+            # Opt-in SSE mode: the turn is saved once the stream completes
+            if data.get("stream"):
+                return _sse_response(_stream_chat_reply(user, "coder", user_message, payload, api_key))
+
+            response = await resilience.achat_completion("coder", payload, api_key)
+
+            # Upstream failures are reported, not saved into the conversation
+            if response.status_code != 200:
+                return JsonResponse({"error": f"Error: {response.status_code} - {response.text}"}, status=502)
+
+            result = response.json()
+            bot_reply = result["choices"][0]["message"]["content"]
 
-            Message.objects.create(user=request.user, sender="user", text=user_message, chat_type="coder")
-            Message.objects.create(user=request.user, sender="AlphaBot", text=bot_reply, chat_type="coder")
+            await turns.asave_turn(user, "coder", user_message, bot_reply)
+            schedule_compaction(user.id, "coder")
 
             return JsonResponse({"response": bot_reply})
 
@@ -326,12 +273,32 @@ def coder_chat_api(request):
     return JsonResponse({"error": "Invalid method"}, status=405)
 
 
+@cache_anonymous_page
 def content_writer(request):
     return render(request, "alphabot/content_writer.html")
 
+async def _article_stream(topic, api_key):
+    try:
+        headings = await articles.aoutline(topic, api_key)
+    except articles.ContentGenerationError as e:
+        yield _sse("error", {"error": str(e)})
+        return
+    yield _sse("outline", {"title": topic, "sections": headings})
+
+    sections = []
+    async for section in articles.awrite_sections(topic, headings, api_key):
+        sections.append(section)
+        yield _sse("section", {**section, "markdown": articles.section_markdown(section)})
+    yield _sse("done", {
+        "response": articles.assemble(topic, sections),
+        "failed_sections": [section["index"] for section in sections if "error" in section],
+    })
+
+
 @login_required
 @csrf_exempt
-def generate_content(request):
+@rate_limit("content")
+async def generate_content(request):
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
@@ -344,29 +311,48 @@ def generate_content(request):
     if not topic:
         return JsonResponse({"error": "Missing topic"}, status=400)
 
-    api_key = os.getenv("OPENROUTER_API_KEY")
+    api_key = settings.OPENROUTER_API_KEY
     if not api_key:
         return JsonResponse({"error": "Missing OpenRouter API key"}, status=500)
 
+    # Long-form: an outline, then the sections written in parallel
+    if data.get("long"):
+        if data.get("stream"):
+            return _sse_response(_article_stream(topic, api_key))
+        try:
+            headings = await articles.aoutline(topic, api_key)
+        except articles.ContentGenerationError as e:
+            return JsonResponse({"error": str(e)}, status=502)
+        sections = [section async for section in articles.awrite_sections(topic, headings, api_key)]
+        failed = [section["index"] for section in sections if "error" in section]
+        if len(failed) == len(sections):
+            return JsonResponse({"error": sections[0]["error"]}, status=502)
+        return JsonResponse({"response": articles.assemble(topic, sections), "failed_sections": failed})
+
     try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "deepseek/deepseek-chat:free", 
-                "messages": [
-                    {"role": "system", "content": "You are a helpful writing assistant."},
-                    {"role": "user", "content": f"Write a short, informative article on: {topic}"}
-                ]
-            }
+        payload = features.get_feature("content").build(topic=topic)
+
+        # Topics that differ only in case or spacing share one cached article
+        cache_key = response_cache.make_key("content", payload, casefold=True)
+        cached = await response_cache.aget("content", cache_key)
+        if cached is not None:
+            return JsonResponse({"response": cached})
+
+        # Fall back to an article generated for a near-identical topic
+        similar = similarity_cache.lookup("content", payload, topic)
+        if similar is not None:
+            return JsonResponse({"response": similar})
+
+        # Identical concurrent requests share one upstream call
+        response = await singleflight.do(
+            "content", cache_key, lambda: resilience.achat_completion("content", payload, api_key)
         )
 
         if response.status_code == 200:
             result = response.json()
             content = result["choices"][0]["message"]["content"]
+            await response_cache.aset(cache_key, content)
+            similarity_cache.store("content", payload, topic, content)
             return JsonResponse({"response": content})
         else:
             return JsonResponse({"error": f"API Error {response.status_code}: {response.text}"}, status=response.status_code)
@@ -375,11 +361,13 @@ def generate_content(request):
         return JsonResponse({"error": f"Server error: {str(e)}"}, status=500)
 
 
+@cache_anonymous_page
 def script_writer(request):
     return render(request, "alphabot/script_writer.html")
 
 @login_required
-def generate_script(request):
+@rate_limit("script")
+async def generate_script(request):
     if request.method == "POST":
         try:
             data = json.loads(request.body)
@@ -388,23 +376,24 @@ def generate_script(request):
             if not prompt:
                 return JsonResponse({"error": "No prompt provided"}, status=400)
 
-            headers = {
-                "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
-                "Content-Type": "application/json"
-            }
+            api_key = settings.OPENROUTER_API_KEY
+            if not api_key:
+                return JsonResponse({"error": "Missing OpenRouter API key"}, status=500)
+
+            body = features.get_feature("script").build(prompt=prompt)
 
-            body = {
-                "model": "deepseek/deepseek-chat:free",
-                "messages": [
-                    {"role": "system", "content": "You are a professional scriptwriter for YouTube videos and short films."},
-                    {"role": "user", "content": prompt}
-                ]
-            }
+            cache_key = response_cache.make_key("script", body)
+            cached = await response_cache.aget("script", cache_key)
+            if cached is not None:
+                return JsonResponse({"response": cached})
 
-            response = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=body)
+            response = await singleflight.do(
+                "script", cache_key, lambda: resilience.achat_completion("script", body, api_key)
+            )
 
             if response.status_code == 200:
                 reply = response.json()["choices"][0]["message"]["content"]
+                await response_cache.aset(cache_key, reply)
                 return JsonResponse({"response": reply})
             else:
                 return JsonResponse({"error": "OpenRouter API error"}, status=response.status_code)
@@ -414,11 +403,25 @@ def generate_script(request):
     return JsonResponse({"error": "Invalid request"}, status=400)
 
 
+@cache_anonymous_page
 def paraphraser_input(request):
     return render(request, "alphabot/paraphraser_input.html")
 
+async def _paraphrase_stream(chunks, api_key):
+    yield _sse("start", {"chunks": len(chunks)})
+    results = {}
+    async for result in paraphrase.aparaphrase_chunks(chunks, api_key):
+        results[result["index"]] = result
+        yield _sse("chunk", result)
+    yield _sse("done", {
+        "response": paraphrase.assemble(chunks, results),
+        "failed_chunks": sorted(index for index, result in results.items() if "error" in result),
+    })
+
+
 @csrf_exempt
-def paraphraser_api(request):
+@rate_limit("paraphraser")
+async def paraphraser_api(request):
     if request.method == "POST":
         try:
             data = json.loads(request.body)
@@ -427,44 +430,36 @@ def paraphraser_api(request):
             if not original_text:
                 return JsonResponse({"error": "No input provided."}, status=400)
 
-            api_key = os.getenv("OPENROUTER_API_KEY")
+            api_key = settings.OPENROUTER_API_KEY
             if not api_key:
                 return JsonResponse({"error": "Missing OpenRouter API key."}, status=500)
 
-            prompt = f"Paraphrase the following text clearly and concisely without emojis:\n\n{original_text}"
-
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "qwen/qwen2.5-vl-3b-instruct:free",
-                    "messages": [
-                        {"role": "system", "content": "You are AlphaBot, a helpful paraphrasing assistant."},
-                        {"role": "user", "content": prompt}
-                    ]
-                }
-            )
+            # Long documents are paraphrased chunk by chunk, in parallel
+            chunks = paraphrase.split_chunks(original_text, settings.PARAPHRASER_CHUNK_TOKENS)
+            if len(chunks) > settings.PARAPHRASER_MAX_CHUNKS:
+                return JsonResponse({"error": "Text is too long."}, status=400)
 
-            if response.status_code == 200:
-                result = response.json()
-                paraphrased = result["choices"][0]["message"]["content"]
-                return JsonResponse({"response": paraphrased})
-            else:
-                return JsonResponse({"error": f"API Error: {response.status_code} - {response.text}"}, status=500)
+            if len(chunks) > 1:
+                if data.get("stream"):
+                    return _sse_response(_paraphrase_stream(chunks, api_key))
+
+                results = {result["index"]: result async for result in paraphrase.aparaphrase_chunks(chunks, api_key)}
+                failed = sorted(index for index, result in results.items() if "error" in result)
+                if len(failed) == len(chunks):
+                    return JsonResponse({"error": results[0]["error"]}, status=500)
+                return JsonResponse({"response": paraphrase.assemble(chunks, results), "failed_chunks": failed})
+
+            paraphrased = await paraphrase.aparaphrase(original_text, api_key)
+            return JsonResponse({"response": paraphrased})
 
+        except openrouter.OpenRouterError as e:
+            return JsonResponse({"error": f"API Error: {e.status_code} - {e.text}"}, status=500)
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
 
     return JsonResponse({"error": "Only POST method allowed."}, status=405)
 
 
-
-
-
-
 def register_view(request):
     if request.method == "POST":
         username = request.POST["username"]
@@ -507,31 +502,39 @@ def logout_view(request):
     return redirect("index")  
 
 def chat_view(request):
-    chat_history = request.session.get("chat_history", [])
     return render(request, "alphabot/chat.html")
 
 # Chat-related API views
 @csrf_exempt
-def reset_chat(request):
-    if request.user.is_authenticated:
-        Message.objects.filter(user=request.user, chat_type="chat").delete()  # Only chat messages
+async def reset_chat(request):
+    user = await request.auser()
+    if user.is_authenticated:
+        await turns.adiscard_conversation(user.id, "chat")
+        await archive.asoft_reset(user, "chat")  # Only chat messages, purged later by chat_retention
         return JsonResponse({"status": "Chat reset."})
     return JsonResponse({"error": "Unauthorized"}, status=401)
 
 @csrf_exempt
-def chat_history(request):
-    if request.user.is_authenticated:
-        messages = Message.objects.filter(user=request.user, chat_type="chat").order_by("timestamp")  # Only chat messages
-        history = [{"sender": msg.sender, "text": msg.text} for msg in messages]
-        return JsonResponse({"history": history})
+async def chat_history(request):
+    user = await request.auser()
+    if user.is_authenticated:
+        try:
+            limit = int(request.GET.get("limit", 0))
+            page, next_before = await history_page(user, "chat", request.GET.get("before"), limit)  # Only chat messages
+        except ValueError:
+            return JsonResponse({"error": "Invalid cursor or limit"}, status=400)
+        history = [{"sender": msg.sender, "text": msg.text} for msg in page]
+        return JsonResponse({"history": history, "next_before": next_before})
     return JsonResponse({"error": "Unauthorized"}, status=401)
 
 
 @csrf_exempt
-def ai_chat_api(request):
+@rate_limit("chat")
+async def ai_chat_api(request):
     if request.method == "POST":
         try:
-            if not request.user.is_authenticated:
+            user = await request.auser()
+            if not user.is_authenticated:
                 return JsonResponse({"error": "Unauthorized"}, status=401)
 
             data = json.loads(request.body)
@@ -540,43 +543,30 @@ def ai_chat_api(request):
             if not user_message:
                 return JsonResponse({"error": "Message required"}, status=400)
 
-            api_key = os.getenv("OPENROUTER_API_KEY")
+            api_key = settings.OPENROUTER_API_KEY
             if not api_key:
                 return JsonResponse({"error": "OpenRouter API key not set"}, status=500)
 
-            # Retrieve past chat
-            history = Message.objects.filter(user=request.user, chat_type="chat").order_by("timestamp")
-            history_text = "\n".join([f"{m.sender}: {m.text}" for m in history])
-
-            # Prompt template
-            prompt = f"You are AlphaBot 🤖, a friendly and helpful assistant. Chat history:\n{history_text}\nUser: {user_message}"
-
-            # Model
-            model = "meta-llama/llama-4-maverick:free"
-
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": "You are AlphaBot, a friendly assistant who helps with anything. You were created by Alphin a single person"},
-                        {"role": "user", "content": prompt}
-                    ]
-                }
-            )
+            # Newest past turns that fit the history token budget
+            history = await build_history(user, "chat")
 
-            if response.status_code == 200:
-                result = response.json()
-                bot_reply = result["choices"][0]["message"]["content"]
-            else:
-                bot_reply = f"Error: {response.status_code} - {response.text}"
+            payload = features.get_feature("chat").build(history, message=user_message)
+
+            # Opt-in SSE mode: the turn is saved once the stream completes
+            if data.get("stream"):
+                return _sse_response(_stream_chat_reply(user, "chat", user_message, payload, api_key))
+
+            response = await resilience.achat_completion("chat", payload, api_key)
 
-            Message.objects.create(user=request.user, sender="user", text=user_message, chat_type="chat")
-            Message.objects.create(user=request.user, sender="AlphaBot", text=bot_reply, chat_type="chat")
+            # Upstream failures are reported, not saved into the conversation
+            if response.status_code != 200:
+                return JsonResponse({"error": f"Error: {response.status_code} - {response.text}"}, status=502)
+
+            result = response.json()
+            bot_reply = result["choices"][0]["message"]["content"]
+
+            await turns.asave_turn(user, "chat", user_message, bot_reply)
+            schedule_compaction(user.id, "chat")
 
             return JsonResponse({"response": bot_reply})
 
@@ -584,3 +574,11 @@ def ai_chat_api(request):
             return JsonResponse({"error": str(e)}, status=500)
 
     return JsonResponse({"error": "Invalid method"}, status=405)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint for this process"""
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse("Unauthorized", status=401)
+    return HttpResponse(metrics.expose(), content_type="text/plain; version=0.0.4; charset=utf-8")
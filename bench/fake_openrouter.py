@@ -0,0 +1,132 @@
+"""Local stand-in for OpenRouter's /api/v1/chat/completions used by the benchmarks"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenRouterConfig:
+    def __init__(self, latency_ms=300, latency_dist="lognormal", latency_sigma=0.5,
+                 error_rate=0.0, stream_chunks=20, reply_words=120, line_words=12, seed=None):
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist  # fixed, uniform or lognormal
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.stream_chunks = stream_chunks
+        self.reply_words = reply_words
+        self.line_words = line_words  # Replies come as lines, so an outline request gets several headings
+        self.random = random.Random(seed)
+        self._seen_prefixes = set()
+        self._lock = threading.Lock()
+
+    def cached_tokens(self, model, system_prompt):
+        """Prompt caching as providers do it: a system prompt seen before for the model is a cache hit"""
+        key = (model, system_prompt)
+        with self._lock:
+            if key in self._seen_prefixes:
+                return len(system_prompt.split())
+            self._seen_prefixes.add(key)
+        return 0
+
+    def sample_latency(self):
+        """Seconds the fake model 'thinks' before finishing a completion"""
+        median = self.latency_ms / 1000
+        if self.latency_dist == "fixed":
+            return median
+        if self.latency_dist == "uniform":
+            return self.random.uniform(0, 2 * median)
+        return self.random.lognormvariate(0, self.latency_sigma) * median
+
+
+def _text(content):
+    # Messages with cache_control breakpoints carry a list of content parts
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content)
+    return content
+
+
+def _lines(words, per_line):
+    return "\n".join(" ".join(words[i:i + per_line]) for i in range(0, len(words), max(1, per_line)))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # Set on the subclass built by start()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        config = self.config
+
+        if config.random.random() < config.error_rate:
+            status = config.random.choice([429, 500, 503])
+            self._send_json(status, {"error": {"message": f"Injected error {status}"}}, {"Retry-After": "0"})
+            return
+
+        latency = config.sample_latency()
+        texts = [_text(m["content"]) for m in body["messages"]]
+        prompt_tokens = sum(len(text.split()) for text in texts)
+        words = [f"word{i}" for i in range(config.reply_words)]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+            "prompt_tokens_details": {"cached_tokens": config.cached_tokens(body["model"], texts[0])},
+        }
+
+        if body.get("stream"):
+            self._stream(words, latency, usage)
+            return
+
+        time.sleep(latency)
+        self._send_json(200, {
+            "model": body["model"],
+            "choices": [{"message": {"role": "assistant", "content": _lines(words, config.line_words)}}],
+            "usage": usage,
+        })
+
+    def _send_json(self, status, data, headers=None):
+        out = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(out)
+
+    def _stream(self, words, latency, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        # First token after a fifth of the latency, the rest spread over the remainder
+        chunks = max(1, self.config.stream_chunks)
+        per_chunk = max(1, len(words) // chunks)
+        time.sleep(latency * 0.2)
+        for i in range(0, len(words), per_chunk):
+            delta = " ".join(words[i:i + per_chunk]) + " "
+            self._event({"choices": [{"delta": {"content": delta}}]})
+            time.sleep(latency * 0.8 / chunks)
+        self._event({"choices": [{"delta": {}, "finish_reason": "stop"}], "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _event(self, data):
+        self.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+        self.wfile.flush()
+
+
+def start(config, host="127.0.0.1", port=0):
+    """Serve the fake API on a background thread; returns the server (server_address has the port)"""
+    handler = type("FakeOpenRouterHandler", (_Handler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
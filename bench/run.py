@@ -0,0 +1,277 @@
+"""Offline load benchmark for the AlphaBot endpoints
+
+Boots a fake OpenRouter server, points the app at it with a throwaway SQLite
+database and drives every AI endpoint plus the history endpoints through
+Django's ASGI handler with concurrent requests. Prints a summary table and
+writes a JSON report that can be compared between commits:
+
+    python -m bench.run --requests 200 --concurrency 20 --output bench-report.json
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from . import fake_openrouter
+
+
+WORDS = (
+    "python django async cache latency model prompt token stream history budget "
+    "career resume summary skills project deploy server client cloud data query "
+    "index worker queue retry backoff circuit fallback router metric trace video "
+    "script article topic travel health finance music design market energy climate"
+).split()
+
+# Per-request stats for the request currently being driven; sync_to_async copies
+# the context into ORM threads so queries are attributed to the right request
+_current = contextvars.ContextVar("bench_request_stats", default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is not None:
+        stats["queries"] += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def _text(rng, words=8):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _cv_payload(rng):
+    return {
+        "fullName": "Bench Candidate",
+        "email": "bench@example.com",
+        "phone": "07123456789",
+        "summary": _text(rng, 30),
+        "skills": ", ".join(rng.sample(WORDS, 6)),
+        "experience": _text(rng, 60) + " improved throughput by 30%",
+        "education": _text(rng, 20),
+    }
+
+
+# name -> (method, url, payload factory)
+SCENARIOS = {
+    "chat": ("post", "/api/chat/", lambda rng: {"message": _text(rng)}),
+    "chat_stream": ("post", "/api/chat/", lambda rng: {"message": _text(rng), "stream": True}),
+    "coder": ("post", "/api/coder/chat/", lambda rng: {"message": _text(rng)}),
+    "coder_stream": ("post", "/api/coder/chat/", lambda rng: {"message": _text(rng), "stream": True}),
+    "cv": ("post", "/api/cv/generate/", _cv_payload),
+    "content": ("post", "/api/content/generate/", lambda rng: {"topic": _text(rng, 5)}),
+    "content_long": ("post", "/api/content/generate/", lambda rng: {"topic": _text(rng, 5), "long": True}),
+    "content_long_stream": (
+        "post", "/api/content/generate/", lambda rng: {"topic": _text(rng, 5), "long": True, "stream": True}
+    ),
+    "script": ("post", "/api/script/generate/", lambda rng: {"prompt": _text(rng, 12)}),
+    "paraphraser": ("post", "/api/paraphraser/", lambda rng: {"message": _text(rng, 60)}),
+    "chat_history": ("get", "/api/chat/history/", None),
+    "coder_history": ("get", "/api/coder/chat/history/", None),
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _partly_failed(data):
+    # Fan-out endpoints answer 200 and list the parts that could not be generated
+    return bool(data.get("failed_sections") or data.get("failed_chunks"))
+
+
+def _sse_done(body):
+    """Data of a stream's done event, {} when there is none"""
+    marker = b"event: done\ndata: "
+    if marker not in body:
+        return {}
+    return json.loads(body.split(marker, 1)[1].split(b"\n", 1)[0])
+
+
+async def _one_request(client, method, url, payload):
+    if method == "get":
+        response = await client.get(url)
+    else:
+        response = await client.post(url, json.dumps(payload), content_type="application/json")
+
+    if response.status_code == 202:
+        # Queued job (CV generation): wait for the worker via its event stream
+        job = json.loads(response.content)
+        response = await client.get(job["events_url"])
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        return b"event: done" in body
+
+    if response.streaming:
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        return response.status_code < 400 and b"event: error" not in body and not _partly_failed(_sse_done(body))
+    if response.status_code >= 400:
+        return False
+    return response.get("Content-Type") != "application/json" or not _partly_failed(json.loads(response.content))
+
+
+async def run_scenario(clients, name, total, concurrency, distinct, seed):
+    method, url, make_payload = SCENARIOS[name]
+    rng = random.Random(seed)
+    # A pool of `distinct` inputs; fewer inputs than requests exercises the caches
+    payloads = [make_payload(rng) if make_payload else None for _ in range(distinct or total)]
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(i):
+        async with semaphore:
+            stats = {"queries": 0}
+            _current.set(stats)
+            started = time.perf_counter()
+            try:
+                ok = await _one_request(clients[i % len(clients)], method, url, payloads[i % len(payloads)])
+            except Exception:
+                ok = False
+            samples.append((time.perf_counter() - started, ok, stats["queries"]))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(s[0] * 1000 for s in samples)
+    return {
+        "requests": total,
+        "errors": sum(1 for s in samples if not s[1]),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "requests_per_sec": round(total / wall, 2),
+        "db_queries_per_request": round(sum(s[2] for s in samples) / total, 2),
+    }
+
+
+async def run(args):
+    from django.contrib.auth.models import User
+    from django.test import AsyncClient
+
+    clients = []
+    for i in range(args.users):
+        user = await User.objects.acreate(username=f"bench{i}")
+        client = AsyncClient()
+        await client.aforce_login(user)
+        clients.append(client)
+
+    results = {}
+    for index, name in enumerate(args.scenarios):
+        results[name] = await run_scenario(
+            clients, name, args.requests, args.concurrency, args.distinct_inputs, args.seed + index
+        )
+        print(_format_row(name, results[name]), flush=True)
+    return results
+
+
+def _format_row(name, r):
+    return (
+        f"{name:<20} {r['requests_per_sec']:>8} req/s  p50 {r['p50_ms']:>8} ms  p95 {r['p95_ms']:>8} ms  "
+        f"p99 {r['p99_ms']:>8} ms  errors {r['errors']:>4}  db/req {r['db_queries_per_request']}"
+    )
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=5, help="logged-in users requests are spread over")
+    parser.add_argument("--distinct-inputs", type=int, default=0,
+                        help="size of the input pool per scenario (default: every request unique)")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--latency-ms", type=float, default=300, help="median fake model latency")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal shape parameter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls failing with 429/5xx")
+    parser.add_argument("--stream-chunks", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    fake_config = fake_openrouter.FakeOpenRouterConfig(
+        latency_ms=args.latency_ms,
+        latency_dist=args.latency_dist,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        stream_chunks=args.stream_chunks,
+        seed=args.seed,
+    )
+    server = fake_openrouter.start(fake_config)
+    host, port = server.server_address
+
+    workdir = tempfile.mkdtemp(prefix="alphabot-bench-")
+    os.environ["BENCH_DB_PATH"] = os.path.join(workdir, "bench.sqlite3")
+    os.environ["BENCH_OPENROUTER_URL"] = f"http://{host}:{port}/api/v1/chat/completions"
+    os.environ["DJANGO_SETTINGS_MODULE"] = "bench.settings"
+
+    import django
+    from django.core.management import call_command
+    from django.db.backends.signals import connection_created
+
+    django.setup()
+    call_command("migrate", verbosity=0)
+    connection_created.connect(_install_query_counter)
+
+    # CV generation is queued; run a worker in-process so those jobs complete
+    from alphabot import cv_jobs
+    stop_worker = threading.Event()
+    worker = threading.Thread(target=cv_jobs.run_worker, kwargs={"stop": stop_worker}, daemon=True)
+    worker.start()
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        # Let the worker finish and close its loop before the interpreter shuts down
+        stop_worker.set()
+        worker.join()
+        server.shutdown()
+
+    from alphabot import metrics
+    prompt_cache = metrics.prompt_cache_ratios()
+    print("prompt cache hit ratio: " + ", ".join(f"{name} {ratio:.0%}" for name, ratio in prompt_cache.items()))
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+        "prompt_cache_hit_ratio": prompt_cache,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,27 @@
+"""Django settings for the offline benchmarks: SQLite plus the local fake OpenRouter"""
+
+import os
+
+os.environ.setdefault("SECRET_KEY", "benchmark-only")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark-only")
+
+from AI_assistant.settings import *  # noqa: E402,F401,F403
+
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ["BENCH_DB_PATH"],
+        'OPTIONS': {'timeout': 30},
+    }
+}
+
+OPENROUTER_URL = os.environ["BENCH_OPENROUTER_URL"]
+DEBUG = False
+
+# Poll the CV job queue tightly so queue latency does not dominate the cv scenario
+CV_WORKER_POLL_INTERVAL = 0.05
+
+# Per-client quotas sized for the benchmark, which sends hundreds of requests from a
+# handful of users; admission control on upstream calls stays as configured
+RATE_LIMITS = {feature: "100000/m" for feature in RATE_LIMITS}  # noqa: F405